@@ -1,20 +1,31 @@
 import json
 from django.core.management.base import BaseCommand
-from django.conf import settings
-import boto3
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+from core.utils.storage_batch import BatchDeleter
 
 class Command(BaseCommand):
     help = 'Schoont S3 op op basis van het staticfiles manifest'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Toon alleen welke bestanden verwijderd zouden worden.",
+        )
+
     def handle(self, *args, **options):
-        bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-        s3 = boto3.resource('s3')
-        bucket = s3.Bucket(bucket_name)
+        dry_run = options["dry_run"]
+
+        # Static storage (S3, location 'static'); BatchDeleter werkt met namen relatief daaraan
+        storage = staticfiles_storage
+        bucket = storage.bucket
+        prefix = f"{storage.location.strip('/')}/"
 
         # 1. Haal het manifest op van S3
-        manifest_key = 'static/staticfiles.json'
+        manifest_key = f"{prefix}staticfiles.json"
         try:
-            obj = s3.Object(bucket_name, manifest_key)
+            obj = bucket.Object(manifest_key)
             manifest_data = json.loads(obj.get()['Body'].read().decode('utf-8'))
         except Exception as e:
             self.stderr.write(f"Kon manifest niet laden: {e}")
@@ -22,7 +33,7 @@ class Command(BaseCommand):
 
         # Haal de gehashte namen op uit het manifest
         active_files = set(manifest_data.get('paths', {}).values())
-        
+
         # Voeg de originele namen ook toe (voor de zekerheid) en het manifest zelf
         active_files.update(manifest_data.get('paths', {}).keys())
         active_files.add('staticfiles.json')
@@ -31,31 +42,39 @@ class Command(BaseCommand):
         # Alles in deze mappen wordt gespaard omdat ze niet in het manifest staan.
         excluded_prefixes = ("pwa/", "img/")
 
-        self.stdout.write(f"Opschonen van bucket {bucket_name}...")
+        self.stdout.write(f"Opschonen van bucket {bucket.name}{' (dry-run)' if dry_run else ''}...")
+
+        # 3. Verzamelen en in batches verwijderen (DeleteObjects, max 1000 keys per call)
+        with BatchDeleter(storage, dry_run=dry_run) as deleter:
+            for obj in bucket.objects.filter(Prefix=prefix):
+                # Maak het pad relatief aan de 'static/' map op S3
+                relative_path = obj.key[len(prefix):]
+
+                if not relative_path:
+                    continue
 
-        delete_count = 0
-        for obj in bucket.objects.filter(Prefix='static/'):
-            # Maak het pad relatief aan de 'static/' map op S3
-            relative_path = obj.key.replace('static/', '', 1)
+                # Check 1: Staat het in het manifest?
+                if relative_path in active_files:
+                    continue
 
-            if not relative_path:
-                continue
+                # Check 2: Valt het onder de uitgesloten mappen (pwa/img)?
+                if relative_path.startswith(excluded_prefixes):
+                    continue
 
-            # Check 1: Staat het in het manifest?
-            if relative_path in active_files:
-                continue
+                # Check 3: Is het geen 'map' (S3 keys die eindigen op /)
+                if obj.key.endswith('/'):
+                    continue
 
-            # Check 2: Valt het onder de uitgesloten mappen (pwa/img)?
-            if relative_path.startswith(excluded_prefixes):
-                continue
-            
-            # Check 3: Is het geen 'map' (S3 keys die eindigen op /)
-            if obj.key.endswith('/'):
-                continue
+                # Als we hier komen, is het een oud gehasht bestand of troep
+                deleter.add(relative_path)
 
-            # Als we hier komen, is het een oud gehasht bestand of troep
-            self.stdout.write(f"Verwijderen: {obj.key}")
-            obj.delete()
-            delete_count += 1
+        report = deleter.report
+        for name in report["keys"]:
+            self.stdout.write(f"{'Zou verwijderen' if dry_run else 'Verwijderd'}: {prefix}{name}")
+        for name in report["failed"]:
+            self.stderr.write(f"Niet verwijderd: {prefix}{name}")
 
-        self.stdout.write(self.style.SUCCESS(f"Succesvol {delete_count} oude bestanden verwijderd."))
\ No newline at end of file
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {report['deleted']} oude bestanden zouden verwijderd worden."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Succesvol {report['deleted']} oude bestanden verwijderd."))
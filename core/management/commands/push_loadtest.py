@@ -0,0 +1,243 @@
+import base64
+import json
+import time
+from datetime import timedelta
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.models import NativePushToken, PushSubscription
+from core.utils.push import push, webpush_sender
+from core.utils.push.audience import bump_push_audience_version
+from core.utils.push.fake_services import FakeFcm, FakeServiceConfig, FakeWebPushServer
+
+User = get_user_model()
+
+USERNAME_PREFIX = "loadtest-push-"
+GROUP_NAME = "Loadtest push"
+PERMISSIONS = ("can_view_roster", "can_view_news", "can_view_agenda", "can_perform_bestellingen",
+               "can_view_diensten", "can_view_urendoorgeven")
+SCENARIOS = ("roster", "news", "agenda", "laatste_pot", "birthday_others", "per_user")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test voor push: seedt users/PushSubscriptions/NativePushTokens, draait de send_*_push "
+        "functies tegen lokale stand-ins (Web Push server + FCM) en rapporteert de doorvoer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500, help="Aantal test-users.")
+        parser.add_argument("--subs", type=int, default=2000, help="Aantal PushSubscriptions.")
+        parser.add_argument("--tokens", type=int, default=2000, help="Aantal NativePushTokens.")
+        parser.add_argument("--latency-ms", type=float, default=50.0, help="Latency per request van de stand-ins.")
+        parser.add_argument("--jitter-ms", type=float, default=20.0, help="Extra willekeurige latency (0..jitter).")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fractie tijdelijke fouten (503 / Unavailable).")
+        parser.add_argument("--gone-rate", type=float, default=0.0, help="Fractie verlopen ontvangers (410 / Unregistered).")
+        parser.add_argument("--per-user-sample", type=int, default=50, help="Aantal users voor het per_user scenario.")
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Komma-gescheiden, uit: {', '.join(SCENARIOS)}.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed voor de stand-ins.")
+        parser.add_argument("--json", action="store_true", help="Rapport als JSON (voor CI).")
+        parser.add_argument("--keep", action="store_true", help="Geseede data niet opruimen.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("Alleen met DEBUG=True.")
+
+        scenarios = [s.strip() for s in options["scenarios"].split(",") if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Onbekende scenario's: {', '.join(sorted(unknown))}")
+
+        config = FakeServiceConfig(
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            error_rate=options["error_rate"],
+            gone_rate=options["gone_rate"],
+            seed=options["seed"],
+        )
+
+        with FakeWebPushServer(config) as server, FakeFcm(config) as fcm:
+            restore = self._setup_environment(server)
+            try:
+                t0 = time.perf_counter()
+                user_ids = self._seed(server, options["users"], options["subs"], options["tokens"])
+                seed_s = time.perf_counter() - t0
+
+                results = [
+                    self._run(name, user_ids, options["per_user_sample"], server, fcm)
+                    for name in scenarios
+                ]
+            finally:
+                restore()
+                if not options["keep"]:
+                    self._cleanup()
+
+        report = {
+            "config": {k: options[k] for k in ("users", "subs", "tokens", "latency_ms", "jitter_ms", "error_rate", "gone_rate")},
+            "seed_seconds": round(seed_s, 2),
+            "scenarios": results,
+            "webpush_server": server.stats.snapshot(),
+            "fcm": fcm.stats.snapshot(),
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    # -----------------------------
+    # Setup / seed / cleanup
+    # -----------------------------
+    def _setup_environment(self, server: FakeWebPushServer):
+        """
+        Eager Celery (chunk tasks in dit proces), tijdelijke VAPID key indien nodig, en alleen
+        naar de stand-ins sturen: bestaande (echte) subscriptions en native tokens in de database
+        worden overgeslagen, en dus ook nooit als verlopen verwijderd (--gone-rate).
+        """
+        overrides = {"CELERY_TASK_ALWAYS_EAGER": True, "CELERY_TASK_EAGER_PROPAGATES": False}
+        if not getattr(settings, "VAPID_PRIVATE_KEY", None):
+            key = ec.generate_private_key(ec.SECP256R1())
+            overrides["VAPID_PRIVATE_KEY"] = _b64(key.private_numbers().private_value.to_bytes(32, "big"))
+            overrides["VAPID_SUB"] = getattr(settings, "VAPID_SUB", None) or "mailto:loadtest@example.com"
+        overridden = override_settings(**overrides)
+        overridden.enable()
+        webpush_sender._state["pid"] = None   # sessions/JWTs opnieuw opbouwen
+
+        original_send = push.send_webpush_many
+        original_send_native = push._send_native_tokens
+        self._seeded_tokens = set()
+
+        def send_only_to_fake(payload, targets, **kwargs):
+            return original_send(payload, [t for t in targets if server.owns(t.endpoint)], **kwargs)
+
+        def send_only_to_seeded_tokens(payload, tokens, *args, **kwargs):
+            return original_send_native(payload, [t for t in tokens if t in self._seeded_tokens], *args, **kwargs)
+
+        push.send_webpush_many = send_only_to_fake
+        push._send_native_tokens = send_only_to_seeded_tokens
+
+        def restore():
+            push.send_webpush_many = original_send
+            push._send_native_tokens = original_send_native
+            overridden.disable()
+            webpush_sender._state["pid"] = None
+
+        return restore
+
+    def _seed(self, server: FakeWebPushServer, n_users: int, n_subs: int, n_tokens: int) -> list[int]:
+        self._cleanup()
+        n_users = max(1, n_users)
+
+        group, _ = Group.objects.get_or_create(name=GROUP_NAME)
+        group.permissions.set(Permission.objects.filter(content_type__app_label="core", codename__in=PERMISSIONS))
+
+        users = [User(username=f"{USERNAME_PREFIX}{i}", is_active=True) for i in range(n_users)]
+        for u in users:
+            u.set_unusable_password()
+        User.objects.bulk_create(users, batch_size=1000)
+        user_ids = list(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list("id", flat=True))
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=uid, group_id=group.id) for uid in user_ids],
+            batch_size=1000,
+        )
+
+        # één keypaar voor alle subscriptions: encryptie per bericht gebeurt toch per request
+        key = ec.generate_private_key(ec.SECP256R1())
+        p256dh = _b64(key.public_key().public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint))
+        auth = _b64(b"loadtest-auth-16")
+
+        PushSubscription.objects.bulk_create(
+            [
+                PushSubscription(
+                    user_id=user_ids[i % len(user_ids)],
+                    endpoint=server.endpoint(f"loadtest-{i}"),
+                    p256dh=p256dh,
+                    auth=auth,
+                    user_agent="push_loadtest",
+                )
+                for i in range(n_subs)
+            ],
+            batch_size=1000,
+        )
+        tokens = [f"loadtest-{i}" for i in range(n_tokens)]
+        NativePushToken.objects.bulk_create(
+            [
+                NativePushToken(
+                    user_id=user_ids[i % len(user_ids)],
+                    token=token,
+                    platform="android",
+                    user_agent="push_loadtest",
+                )
+                for i, token in enumerate(tokens)
+            ],
+            batch_size=1000,
+        )
+        self._seeded_tokens.update(tokens)
+
+        # bulk_create stuurt geen signals
+        bump_push_audience_version()
+        return user_ids
+
+    def _cleanup(self):
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        Group.objects.filter(name=GROUP_NAME).delete()
+        bump_push_audience_version()
+
+    # -----------------------------
+    # Scenario's
+    # -----------------------------
+    def _run(self, name: str, user_ids: list[int], sample: int, server: FakeWebPushServer, fcm: FakeFcm) -> dict:
+        web_before, fcm_before = server.stats.messages, fcm.stats.messages
+        today = timezone.localdate()
+        iso_year, iso_week, _ = today.isocalendar()
+        monday = today - timedelta(days=today.weekday())
+
+        t0 = time.perf_counter()
+        if name == "roster":
+            push.send_roster_updated_push(iso_year, iso_week, monday.isoformat(), (monday + timedelta(days=4)).isoformat())
+        elif name == "news":
+            push.send_news_upload_push("loadtest")
+        elif name == "agenda":
+            push.send_agenda_upload_push("general")
+        elif name == "laatste_pot":
+            push.send_laatste_pot_push("Loadtest")
+        elif name == "birthday_others":
+            push.send_birthday_push_for_others(user_ids[:1], ["Loadtest"])
+        elif name == "per_user":
+            for uid in user_ids[:sample]:
+                push.send_user_shifts_changed_push(uid, iso_year, iso_week, monday.isoformat(), 1, 0, 0)
+        elapsed = time.perf_counter() - t0
+
+        web = server.stats.messages - web_before
+        native = fcm.stats.messages - fcm_before
+        return {
+            "scenario": name,
+            "seconds": round(elapsed, 3),
+            "webpush": web,
+            "native": native,
+            "per_second": round((web + native) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def _print_report(self, report: dict):
+        cfg = report["config"]
+        self.stdout.write(
+            f"Seed: {cfg['users']} users, {cfg['subs']} subs, {cfg['tokens']} tokens in {report['seed_seconds']}s "
+            f"(latency {cfg['latency_ms']}+{cfg['jitter_ms']}ms, errors {cfg['error_rate']}, gone {cfg['gone_rate']})"
+        )
+        self.stdout.write(f"{'scenario':<16}{'sec':>9}{'webpush':>10}{'native':>10}{'msg/s':>10}")
+        for r in report["scenarios"]:
+            self.stdout.write(
+                f"{r['scenario']:<16}{r['seconds']:>9}{r['webpush']:>10}{r['native']:>10}{r['per_second'] or '-':>10}"
+            )
+        self.stdout.write(f"Web Push server: {report['webpush_server']}")
+        self.stdout.write(f"FCM stand-in:    {report['fcm']}")
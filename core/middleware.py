@@ -1,3 +1,4 @@
+from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import resolve, reverse
 from django.utils.deprecation import MiddlewareMixin
@@ -56,4 +57,22 @@ class Enforce2FAMiddleware(MiddlewareMixin):
             return redirect(f"{setup_url}?next={request.get_full_path()}")
 
         # Voor POST/PUT/etc niets doen; laat de view zelf beslissen
-        return
\ No newline at end of file
+        return
+
+class PdfRenderUnavailableMiddleware(MiddlewareMixin):
+    """
+    PDF export kon niet op tijd gerenderd worden (pdf workers druk/weg, zie
+    core/utils/pdf_export.py): 503 met een korte melding i.p.v. een 500.
+    """
+    def process_exception(self, request, exception):
+        from core.utils.pdf_export import PdfRenderUnavailable
+
+        if not isinstance(exception, PdfRenderUnavailable):
+            return None
+        response = HttpResponse(
+            "De PDF kon nu niet gemaakt worden. Probeer het over een minuut opnieuw.",
+            status=503,
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Retry-After"] = "60"
+        return response
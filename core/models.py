@@ -1084,6 +1084,30 @@ class RosterWeek(models.Model):
     def __str__(self):
         return f"{self.week_slug} ({self.monday})"
     
+class MediaBlob(models.Model):
+    """
+    Gedeelde, content-addressed opslag voor uploads (nieuws, werkafspraken, rooster).
+    Eén bestand + één set previews per hash; owners houdt bij wie de blob gebruikt
+    (bv. "news:12", "werkafspraak:3", "rosterweek:2026-10-19").
+    """
+    file_hash = models.CharField(max_length=32, unique=True)  # sha[:16]
+    file_path = models.CharField(max_length=255)  # bv. "blobs/blob.<hash>.pdf"
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0, db_index=True)
+    owners = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.file_path} ({self.ref_count} refs)"
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.file_path.lower().endswith(".pdf")
+
 class MedicatieReviewAfdeling(models.Model):
     """
     Stamdata: Een afdeling binnen een organisatie en locatie.
@@ -1,11 +1,32 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
 from django.core.cache import caches
 
-SESS_CACHE = caches[getattr(settings, "SESSION_CACHE_ALIAS", "default")]
+logger = logging.getLogger(__name__)
+
+SESS_CACHE_ALIAS = getattr(settings, "SESSION_CACHE_ALIAS", "default")
+SESS_CACHE = caches[SESS_CACHE_ALIAS]
 
+# Versies: per user (eigen groepen/permissies), per groep (permissies van de groep)
+# en globaal (alles). De permset key bevat ze alle drie, dus een groepswijziging is
+# één INCR; permsets van de leden worden bij het volgende gebruik opnieuw opgebouwd.
 PERMVER_KEY = "permver:{user_id}"
+GROUP_PERMVER_KEY = "permver:group:{group_id}"
+GLOBAL_PERMVER_KEY = "permver:global"
+PERMGROUPS_KEY = "permgroups:{user_id}"   # (user versie, [group ids])
 PERMSET_KEY = "permset:{user_id}:{ver}"
 
+# L1: proces-lokale LRU per gunicorn/celery proces, bovenop Redis
+PERM_L1_SIZE = 2048               # max aantal (user_id, versie) permsets per proces
+PERM_L1_VERSION_TTL = 60          # seconden; vangnet als een pub/sub bericht gemist wordt
+PERM_L1_RETRY = 30                # seconden tot een nieuwe poging als de listener niet start
+PERMVER_CHANNEL = "permver:bump"  # pub/sub: "<user_id>", "g:<group_id>" of "*" (alles)
+
 def _perm_ttl():
     return getattr(settings, "PERMISSIONS_CACHE_TTL", settings.SESSION_COOKIE_AGE)
 
@@ -13,27 +34,323 @@ def get_perm_version(user_id: int) -> int:
     v = SESS_CACHE.get(PERMVER_KEY.format(user_id=user_id))
     return int(v) if v else 1
 
-def bump_perm_version(user_id: int) -> int:
-    key = PERMVER_KEY.format(user_id=user_id)
-    if SESS_CACHE.get(key) is None:
-        SESS_CACHE.set(key, 1, timeout=None)
+def _incr_version(key: str) -> int:
+    SESS_CACHE.add(key, 1, timeout=None)
     return int(SESS_CACHE.incr(key))
 
-def delete_permset(user_id: int, ver: int | None = None):
+def bump_perm_version(user_id: int) -> int:
+    ver = _incr_version(PERMVER_KEY.format(user_id=user_id))
+    _l1.invalidate(user_id)
+    _publish_bump(str(user_id))
+    return ver
+
+def bump_group_perm_version(group_id: int) -> int:
+    """
+    Permissies van een groep gewijzigd: één INCR, ongeacht het aantal leden.
+    """
+    ver = _incr_version(GROUP_PERMVER_KEY.format(group_id=group_id))
+    _l1.invalidate_group(group_id)
+    _publish_bump(f"g:{group_id}")
+    return ver
+
+def bump_global_perm_version() -> int:
+    """
+    Alle permsets ongeldig (bijv. een Permission verwijderd).
+    """
+    ver = _incr_version(GLOBAL_PERMVER_KEY)
+    _l1.invalidate()
+    _publish_bump("*")
+    return ver
+
+def _permset_versions(user_ids) -> dict[int, tuple[str, tuple[int, ...]]]:
+    """
+    {user_id: (versie, group_ids)} met versie = "<user>.<global>.<groep>-<ver>...".
+    Eén MGET voor user/global versies + groepslijsten, groepslijsten die ontbreken
+    (of bij een oudere user versie horen) in één query, één MGET voor groepsversies.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+
+    keys = [GLOBAL_PERMVER_KEY]
+    for user_id in user_ids:
+        keys += [PERMVER_KEY.format(user_id=user_id), PERMGROUPS_KEY.format(user_id=user_id)]
+    found = SESS_CACHE.get_many(keys)
+    global_ver = int(found.get(GLOBAL_PERMVER_KEY) or 1)
+
+    user_vers = {u: int(found.get(PERMVER_KEY.format(user_id=u)) or 1) for u in user_ids}
+    groups: dict[int, tuple[int, ...]] = {}
+    for user_id in user_ids:
+        cached = found.get(PERMGROUPS_KEY.format(user_id=user_id))
+        if cached and cached[0] == user_vers[user_id]:
+            groups[user_id] = tuple(cached[1])
+
+    missing = [u for u in user_ids if u not in groups]
+    if missing:
+        from django.contrib.auth import get_user_model
+
+        rows: dict[int, list[int]] = {u: [] for u in missing}
+        for user_id, group_id in get_user_model().groups.through.objects.filter(
+            user_id__in=missing
+        ).values_list("user_id", "group_id"):
+            rows[user_id].append(group_id)
+        for user_id, group_ids in rows.items():
+            groups[user_id] = tuple(sorted(group_ids))
+        SESS_CACHE.set_many(
+            {PERMGROUPS_KEY.format(user_id=u): (user_vers[u], list(groups[u])) for u in missing},
+            timeout=_perm_ttl(),
+        )
+
+    all_groups = sorted({g for group_ids in groups.values() for g in group_ids})
+    group_keys = {g: GROUP_PERMVER_KEY.format(group_id=g) for g in all_groups}
+    found_groups = SESS_CACHE.get_many(list(group_keys.values())) if group_keys else {}
+    group_vers = {g: int(found_groups.get(key) or 1) for g, key in group_keys.items()}
+
+    result = {}
+    for user_id in user_ids:
+        parts = [str(user_vers[user_id]), str(global_ver)]
+        parts += [f"{g}-{group_vers[g]}" for g in groups[user_id]]
+        result[user_id] = (".".join(parts), groups[user_id])
+    return result
+
+def get_permset_version(user_id: int) -> str:
+    return _permset_versions([user_id])[user_id][0]
+
+def delete_permset(user_id: int, ver: str | None = None):
     if ver is None:
-        ver = get_perm_version(user_id)
+        ver = get_permset_version(user_id)
     SESS_CACHE.delete(PERMSET_KEY.format(user_id=user_id, ver=ver))
+    _l1.invalidate(user_id)
 
 def build_permset_for_user(user):
     return set(user.get_all_permissions())
 
 def get_cached_permset(user):
-    ver = get_perm_version(user.id)
-    key = PERMSET_KEY.format(user_id=user.id, ver=ver)
-
-    perms = SESS_CACHE.get(key)
+    ver = _l1.version(user.id)
+    perms = _l1.get(user.id, ver)
     if perms is None:
-        perms = list(build_permset_for_user(user))
-        SESS_CACHE.set(key, perms, timeout=_perm_ttl())
+        key = PERMSET_KEY.format(user_id=user.id, ver=ver)
+        perms = SESS_CACHE.get(key)
+        if perms is None:
+            perms = list(build_permset_for_user(user))
+            SESS_CACHE.set(key, perms, timeout=_perm_ttl())
+        perms = frozenset(perms)
+        _l1.put(user.id, ver, perms)
+
+    return set(perms)
+
+
+# ===== L1: proces-lokale cache =====
+
+def _redis_connection():
+    # alleen met django-redis (PROD); locmem/dummy in DEV -> exception
+    from django_redis import get_redis_connection
+    return get_redis_connection(SESS_CACHE_ALIAS)
+
+
+def _channel() -> str:
+    return SESS_CACHE.make_key(PERMVER_CHANNEL)
+
+
+def _publish_bump(message: str) -> None:
+    try:
+        _redis_connection().publish(_channel(), message)
+    except Exception:
+        pass
+
+
+class _PermL1:
+    """
+    LRU (user_id, versie) -> frozenset(perms) in dit proces, plus de laatst gelezen
+    versie per user. Een versie uit L1 wordt alleen gebruikt zolang de pub/sub
+    listener loopt (die meldt elke bump); anders wordt hij elke keer uit Redis gelezen.
+    Na een fork (gunicorn/celery prefork) begint het child met een lege L1.
+    """
+
+    def __init__(self, size: int = PERM_L1_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._sets: OrderedDict = OrderedDict()
+        self._versions: dict[int, tuple[str, tuple[int, ...], float]] = {}
+        self._gen = 0
+        self._pid = None
+        self._listening = False
+        self._retry_at = 0.0
+
+    def _check_pid(self) -> None:
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._sets.clear()
+            self._versions.clear()
+            self._listening = False
+            self._retry_at = 0.0
+
+    def version(self, user_id: int) -> str:
+        with self._lock:
+            self._check_pid()
+            if self._listening:
+                hit = self._versions.get(user_id)
+                if hit and hit[2] > time.monotonic():
+                    return hit[0]
+            gen = self._gen
+
+        self._ensure_listener()
+        ver, group_ids = _permset_versions([user_id])[user_id]
+        with self._lock:
+            # tussendoor een bump ontvangen? dan deze (mogelijk oude) versie niet onthouden
+            if gen == self._gen:
+                self._versions[user_id] = (ver, group_ids, time.monotonic() + PERM_L1_VERSION_TTL)
+        return ver
+
+    def get(self, user_id: int, ver):
+        with self._lock:
+            self._check_pid()
+            perms = self._sets.get((user_id, ver))
+            if perms is not None:
+                self._sets.move_to_end((user_id, ver))
+            return perms
+
+    def put(self, user_id: int, ver, perms: frozenset) -> None:
+        with self._lock:
+            self._check_pid()
+            self._sets[(user_id, ver)] = perms
+            self._sets.move_to_end((user_id, ver))
+            while len(self._sets) > self.size:
+                self._sets.popitem(last=False)
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        with self._lock:
+            self._gen += 1
+            if user_id is None:
+                self._sets.clear()
+                self._versions.clear()
+                return
+            self._versions.pop(user_id, None)
+            for key in [k for k in self._sets if k[0] == user_id]:
+                del self._sets[key]
+
+    def invalidate_group(self, group_id: int) -> None:
+        # alleen de versies; permsets onder de oude versie verlopen vanzelf uit de LRU
+        with self._lock:
+            self._gen += 1
+            for user_id in [u for u, hit in self._versions.items() if group_id in hit[1]]:
+                del self._versions[user_id]
+
+    # ----- pub/sub listener (daemon thread per proces) -----
+    def _ensure_listener(self) -> None:
+        if self._listening or time.monotonic() < self._retry_at:
+            return
+        with self._lock:
+            if self._listening or time.monotonic() < self._retry_at:
+                return
+            self._retry_at = time.monotonic() + PERM_L1_RETRY
+            try:
+                pubsub = _redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_channel())
+            except Exception:
+                return
+            self._listening = True
+            pid = self._pid
+
+        threading.Thread(target=self._listen, args=(pubsub, pid), name="perm-l1", daemon=True).start()
+
+    def _listen(self, pubsub, pid) -> None:
+        try:
+            for message in pubsub.listen():
+                if os.getpid() != pid:
+                    return
+                data = message.get("data")
+                if isinstance(data, bytes):
+                    data = data.decode()
+                if data == "*":
+                    self.invalidate()
+                elif data.startswith("g:"):
+                    self.invalidate_group(int(data[2:]))
+                elif data:
+                    self.invalidate(int(data))
+        except Exception:
+            logger.warning("Permissie pub/sub listener gestopt", exc_info=True)
+        finally:
+            with self._lock:
+                if self._pid == pid:
+                    # bumps kunnen gemist zijn -> versies weer uit Redis lezen
+                    self._listening = False
+                    self._versions.clear()
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+_l1 = _PermL1()
+
+# ===== Bulk: permsets voor veel users tegelijk (audiences voor push/mail) =====
+
+def build_permsets_for_users(users) -> dict[int, set[str]]:
+    """
+    Zelfde resultaat als build_permset_for_user, maar voor alle users in vaste queries
+    (user_permissions + groups + group permissions) i.p.v. per user.
+    Inactieve users krijgen een lege set (zoals ModelBackend); superusers niet meegeven.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+
+    User = get_user_model()
+    perms: dict[int, set[str]] = {u.id: set() for u in users}
+    active_ids = [u.id for u in users if u.is_active]
+    if not active_ids:
+        return perms
+
+    for user_id, app_label, codename in User.user_permissions.through.objects.filter(
+        user_id__in=active_ids
+    ).values_list("user_id", "permission__content_type__app_label", "permission__codename"):
+        perms[user_id].add(f"{app_label}.{codename}")
+
+    user_groups: dict[int, list[int]] = {}
+    for user_id, group_id in User.groups.through.objects.filter(user_id__in=active_ids).values_list("user_id", "group_id"):
+        user_groups.setdefault(group_id, []).append(user_id)
+
+    if user_groups:
+        for group_id, app_label, codename in Group.permissions.through.objects.filter(
+            group_id__in=list(user_groups)
+        ).values_list("group_id", "permission__content_type__app_label", "permission__codename"):
+            for user_id in user_groups[group_id]:
+                perms[user_id].add(f"{app_label}.{codename}")
+
+    return perms
+
+
+def get_cached_permsets(users) -> dict[int, set[str]]:
+    """
+    Permsets voor een lijst users: MGETs voor de versies (zie _permset_versions), één
+    MGET voor de permsets, en voor de missers één bulk build + set_many.
+    Geen round-trips per user.
+    Superusers worden overgeslagen (can() laat ze altijd door).
+    """
+    by_id = {u.id: u for u in users if not u.is_superuser}
+    if not by_id:
+        return {}
+
+    versions = _permset_versions(by_id)
+    set_keys = {user_id: PERMSET_KEY.format(user_id=user_id, ver=ver) for user_id, (ver, _g) in versions.items()}
+
+    found_sets = SESS_CACHE.get_many(list(set_keys.values()))
+    result = {user_id: set(found_sets[key]) for user_id, key in set_keys.items() if key in found_sets}
+
+    missing = [u for user_id, u in by_id.items() if user_id not in result]
+    if missing:
+        built = build_permsets_for_users(missing)
+        SESS_CACHE.set_many({set_keys[user_id]: list(p) for user_id, p in built.items()}, timeout=_perm_ttl())
+        result.update(built)
+
+    return result
+
 
-    return set(perms)
\ No newline at end of file
+def user_ids_with_perm(users, perm: str) -> set[int]:
+    """
+    Welke van deze users hebben perm ("app.codename")? Superusers altijd.
+    """
+    users = list(users)
+    permsets = get_cached_permsets(users)
+    return {u.id for u in users if u.is_superuser or perm in permsets.get(u.id, ())}
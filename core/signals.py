@@ -5,10 +5,20 @@ from django.db.models.signals import post_save, m2m_changed, post_delete
 from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from core.models import Shift, Task, Location, UserProfile, AgendaItem, NotificationPreferences, Dagdeel
-from core.permissions_cache import bump_perm_version, delete_permset, get_cached_permset
+from core.models import (
+    Shift, Task, Location, UserProfile, AgendaItem, NotificationPreferences, Dagdeel,
+    PushSubscription, NativePushToken,
+)
+from core.permissions_cache import (
+    bump_perm_version,
+    bump_group_perm_version,
+    bump_global_perm_version,
+    delete_permset,
+    get_cached_permset,
+)
+from core.utils.push.audience import bump_push_audience_on_commit
 
 User = get_user_model()
 
@@ -60,24 +70,95 @@ def drop_permissions_cache_on_logout(sender, request, user, **kwargs):
     if user and getattr(user, "is_authenticated", False):
         delete_permset(user.id)
 
+def _bump_push_audiences():
+    # na commit, zodat een audience nooit "tussen" de transaction door wordt opgebouwd
+    bump_push_audience_on_commit()
+
+def _bump_users_for_m2m(instance, action, reverse, pk_set):
+    """
+    user.groups / user.user_permissions gewijzigd: vanaf de user kant is instance de user,
+    vanaf de andere kant (group.user_set.add(...)) staan de users in pk_set.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump_perm_version(instance.id)
+            _bump_push_audiences()
+        return
+
+    if action == "pre_clear":
+        # bij clear is pk_set leeg -> leden vooraf onthouden
+        instance._perm_clear_user_ids = list(instance.user_set.values_list("id", flat=True))
+        return
+    if action == "post_clear":
+        user_ids = getattr(instance, "_perm_clear_user_ids", [])
+    elif action in ("post_add", "post_remove"):
+        user_ids = pk_set or []
+    else:
+        return
+    for uid in user_ids:
+        bump_perm_version(uid)
+    _bump_push_audiences()
+
+
 @receiver(m2m_changed, sender=User.groups.through)
-def invalidate_on_user_groups_change(sender, instance, action, **kwargs):
-    if action in ("post_add", "post_remove", "post_clear"):
-        bump_perm_version(instance.id)
+def invalidate_on_user_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    _bump_users_for_m2m(instance, action, reverse, pk_set)
 
 
 @receiver(m2m_changed, sender=User.user_permissions.through)
-def invalidate_on_user_permissions_change(sender, instance, action, **kwargs):
-    if action in ("post_add", "post_remove", "post_clear"):
-        bump_perm_version(instance.id)
+def invalidate_on_user_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    _bump_users_for_m2m(instance, action, reverse, pk_set)
 
 
 @receiver(m2m_changed, sender=Group.permissions.through)
-def invalidate_on_group_permissions_change(sender, instance, action, **kwargs):
-    if action in ("post_add", "post_remove", "post_clear"):
-        user_ids = list(instance.user_set.values_list("id", flat=True))
-        for uid in user_ids:
-            bump_perm_version(uid)
+def invalidate_on_group_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    _bump_push_audiences()
+    if not reverse:
+        # één INCR op de groepsversie; permsets van de leden verlopen daarmee vanzelf
+        bump_group_perm_version(instance.id)
+        return
+    # permission.group_set.add(...): pk_set zijn groepen (bij clear onbekend -> alles)
+    if pk_set:
+        for group_id in pk_set:
+            bump_group_perm_version(group_id)
+    else:
+        bump_global_perm_version()
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_on_group_delete(sender, instance, **kwargs):
+    # lidmaatschappen verdwijnen zonder m2m_changed -> groepsversie ophogen
+    bump_group_perm_version(instance.id)
+    _bump_push_audiences()
+
+
+@receiver(post_delete, sender=Permission)
+def invalidate_on_permission_delete(sender, instance, **kwargs):
+    bump_global_perm_version()
+    _bump_push_audiences()
+
+# === Push audiences (core/utils/push/audience.py) ===
+
+# Geen post_delete op PushSubscription/NativePushToken: dat zet de fast delete uit
+# (rijen ophalen + een bump per rij). Delete paden roepen zelf één keer
+# bump_push_audience_on_commit() aan; bij het verwijderen van een user doet post_delete(User) het.
+@receiver(post_save, sender=NotificationPreferences)
+@receiver(post_delete, sender=NotificationPreferences)
+@receiver(post_save, sender=PushSubscription)
+@receiver(post_save, sender=NativePushToken)
+@receiver(post_delete, sender=User)
+def invalidate_push_audiences(sender, instance, **kwargs):
+    _bump_push_audiences()
+
+
+@receiver(post_save, sender=User)
+def invalidate_push_audiences_on_user_save(sender, instance, update_fields=None, **kwargs):
+    # is_active / is_superuser bepalen mee wie iets mag; een login (alleen last_login) niet
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    _bump_push_audiences()
 
 # === Invalidate agenda caching ===
 
@@ -104,6 +104,50 @@ document.addEventListener("DOMContentLoaded", function () {
       });
     }
 
+  // pages: [{src, srcset, width, height}] (of oude vorm: alleen urls)
+  function appendPdfPages(host, pages, waits) {
+    var shown = host.querySelectorAll("img[data-pdf-page]").length;
+    var loader = host.querySelector("[data-loader]");
+    pages.slice(shown).forEach(function (page) {
+      if (typeof page === "string") page = { src: page };
+      var img = document.createElement("img");
+      img.src = page.src;
+      if (page.srcset) {
+        img.srcset = page.srcset;
+        img.sizes = "(max-width: 800px) 100vw, 800px";
+      }
+      if (page.width && page.height) {
+        img.width = page.width;
+        img.height = page.height;
+      }
+      img.alt = "Werkafspraak PDF pagina";
+      img.setAttribute("data-pdf-page", "1");
+      host.insertBefore(img, loader);
+      if (waits) waits.push(waitForImage(img));
+    });
+  }
+
+  function pollPdfPages(host, itemId, delay) {
+    setTimeout(async function () {
+      try {
+        var resp = await fetch("/werkafspraken/media/" + itemId + "/", {
+          headers: { "X-Requested-With": "XMLHttpRequest" },
+        });
+        if (resp.ok) {
+          var data = await resp.json();
+          appendPdfPages(host, (data && (data.pages || data.urls)) || []);
+          if (!data || !data.pending) {
+            hideLoading(host);
+            return;
+          }
+        }
+      } catch (err) {
+        // netwerkfout: later opnieuw proberen
+      }
+      pollPdfPages(host, itemId, Math.min(delay * 1.5, 5000));
+    }, delay);
+  }
+
   // === Lazy media loader (zoals news, maar endpoint /werkafspraken/media/<id>/) ===
   async function loadMediaIfNeeded(liEl) {
     var host = liEl.querySelector("[data-media-host]");
@@ -144,13 +188,7 @@ document.addEventListener("DOMContentLoaded", function () {
       }
 
       if (data.type === "pdf" && Array.isArray(data.urls)) {
-        data.urls.forEach(function (url) {
-          var img = document.createElement("img");
-          img.src = url;
-          img.alt = "Werkafspraak PDF pagina";
-          host.appendChild(img);
-          waits.push(waitForImage(img));
-        });
+        appendPdfPages(host, data.pages || data.urls, waits);
       }
 
       if (waits.length) {
@@ -159,6 +197,12 @@ document.addEventListener("DOMContentLoaded", function () {
 
       hideLoading(host);
       host.dataset.loaded = "1";
+
+      // Render loopt nog op de achtergrond: nieuwe pagina's ophalen zodra ze klaar zijn
+      if (data.type === "pdf" && data.pending) {
+        showLoading(host, "PDF wordt verwerkt...");
+        pollPdfPages(host, itemId, 1000);
+      }
     } catch (err) {
       hideLoading(host);
       showError(host, "Kon media niet laden.");
@@ -102,6 +102,88 @@
     }
   });
 
+  // -------- Progressieve previews (render loopt nog op de achtergrond) --------
+  const pagesEl   = root.querySelector('#rosterPages');
+  const pendingEl = root.querySelector('#rosterPending');
+  const statusUrl = pagesEl?.dataset.statusUrl;
+
+  // page: {src, srcset, zoom, width, height}
+  function addPage(page, n) {
+    const wrap = document.createElement('div');
+    wrap.className = 'page';
+    const link = document.createElement('a');
+    link.href = page.zoom || page.src;
+    link.target = '_blank';
+    link.rel = 'noopener';
+    const img = document.createElement('img');
+    img.src = page.src;
+    if (page.srcset) {
+      img.srcset = page.srcset;
+      img.sizes = '(max-width: 1000px) 100vw, 1000px';
+    }
+    if (page.width && page.height) {
+      img.width = page.width;
+      img.height = page.height;
+    }
+    if (page.lqip) {
+      img.classList.add('has-lqip');
+      img.style.backgroundImage = `url('${page.lqip}')`;
+    }
+    img.loading = 'lazy';
+    img.alt = `Pagina ${n}`;
+    link.appendChild(img);
+    wrap.appendChild(link);
+    pagesEl.appendChild(wrap);
+  }
+
+  async function pollPreviews(delay) {
+    try {
+      const resp = await fetch(statusUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+      if (resp.ok) {
+        const data = await resp.json();
+        const pages = Array.isArray(data.pages) ? data.pages : (data.urls || []).map((src) => ({ src }));
+        const shown = pagesEl.querySelectorAll('.page').length;
+        pages.slice(shown).forEach((page, i) => addPage(page, shown + i + 1));
+        if (!data.pending) {
+          pendingEl?.remove();
+          return;
+        }
+      }
+    } catch (e) {
+      // netwerkfout: gewoon later opnieuw proberen
+    }
+    setTimeout(() => pollPreviews(Math.min(delay * 1.5, 5000)), delay);
+  }
+
+  if (pagesEl && statusUrl) {
+    setTimeout(() => pollPreviews(1000), 700);
+  }
+
+  // -------- Prefetch: eerste pagina van vorige/volgende week (als de browser idle is) --------
+  function prefetchAdjacentWeeks() {
+    const dataEl = document.getElementById('rosterPrefetch');
+    if (!dataEl) return;
+    let pages = [];
+    try { pages = JSON.parse(dataEl.textContent) || []; } catch (e) { return; }
+    pages.forEach((page) => {
+      // Zelfde srcset/sizes als de viewer, zodat de browser dezelfde tier ophaalt
+      const img = new Image();
+      if (page.srcset) {
+        img.sizes = '(max-width: 1000px) 100vw, 1000px';
+        img.srcset = page.srcset;
+      }
+      img.src = page.src;
+    });
+  }
+
+  window.addEventListener('load', () => {
+    if ('requestIdleCallback' in window) {
+      requestIdleCallback(prefetchAdjacentWeeks, { timeout: 3000 });
+    } else {
+      setTimeout(prefetchAdjacentWeeks, 1000);
+    }
+  });
+
   // -------- Uploader --------
   const dz        = root.querySelector('#dropzone');
   const input     = root.querySelector('#rosterFile');
@@ -3,6 +3,10 @@
 from .emails import *   # noqa
 # Push
 from .push import *     # noqa
+# PDF previews (eigen queue)
+from .previews import *  # noqa
+# Export PDF's (eigen queue, warme WeasyPrint)
+from .pdf import *  # noqa
 # Email dispatcher ivm rate limit
 from .email_dispatcher import *
 # Beat
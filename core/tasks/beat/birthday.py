@@ -1,13 +1,13 @@
 # core/tasks/beat/birthday.py
 from __future__ import annotations
-from celery import shared_task
+from celery import group, shared_task
 from django.utils import timezone
 from datetime import date
 
 from core.models import UserProfile
 from core.utils.push.push import send_birthday_push_for_user, send_birthday_push_for_others
 from core.views._helpers import wants_email
-from core.tasks.email_dispatcher import email_dispatcher_task
+from core.tasks.email_dispatcher import email_batch_signatures
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
 def send_birthday_reminder(self):
@@ -37,22 +37,23 @@ def send_birthday_reminder(self):
     birthday_user_ids = [profile.user_id for profile in birthday_profiles]
 
     # Persoonlijk naar elke jarige
+    mail_jobs = []
     for profile in birthday_profiles:
         prefs = getattr(profile, "notif_prefs", None)
 
         if wants_email(profile.user, "email_birthday_self", prefs=prefs) and profile.user.email:
-            email_dispatcher_task.apply_async(
-                args=[{
-                    "type": "birthday",
-                    "payload": {
-                        "to_email": profile.user.email,
-                        "first_name": profile.user.first_name or "Collega",
-                    }
-                }],
-                queue="mail",
-            )
+            mail_jobs.append({
+                "type": "birthday",
+                "payload": {
+                    "to_email": profile.user.email,
+                    "first_name": profile.user.first_name or "Collega",
+                }
+            })
 
         send_birthday_push_for_user(profile.user_id, profile.user.first_name.capitalize())
 
+    if mail_jobs:
+        group(email_batch_signatures(mail_jobs)).apply_async()
+
     # Eén keer naar alle anderen (exclude alle jarigen)
     send_birthday_push_for_others(birthday_user_ids=birthday_user_ids, birthday_names=birthday_names)
\ No newline at end of file
@@ -16,6 +16,24 @@ def cleanup_baxter_snapshots_task() -> int:
     deleted, _ = BaxterProductieSnapshotPunt.objects.filter(timestamp__date__lt=today).delete()
     return deleted
 
+@shared_task(ignore_result=True)
+def cleanup_unreferenced_blobs_task() -> int:
+    from core.utils.blobs import sweep_unreferenced_blobs
+
+    return sweep_unreferenced_blobs()
+
+@shared_task(ignore_result=True)
+def cleanup_pdf_cache_task() -> int:
+    from core.utils.pdf_cache import evict_pdf_cache, purge_legacy_pdf_cache_dir
+
+    return evict_pdf_cache() + purge_legacy_pdf_cache_dir()
+
+@shared_task(ignore_result=True)
+def roster_housekeeping_task() -> dict:
+    from core.utils.beat.roster import cleanup_roster_weeks
+
+    return cleanup_roster_weeks()
+
 @shared_task(ignore_result=True)
 def weekly_cleanup_task() -> dict:
     from core.utils.beat.cleanup import (
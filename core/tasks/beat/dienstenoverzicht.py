@@ -1,15 +1,16 @@
 # core/tasks/beat/dienstenoverzicht.py
 from __future__ import annotations
 
+from collections import defaultdict
 from datetime import date, timedelta
 
-from celery import shared_task
+from celery import group, shared_task
 from django.utils import timezone, translation
 
 from core.models import Shift, UserProfile
-from core.views._helpers import can, wants_email
-from core.utils.dagdelen import get_period_meta
-from core.tasks.email_dispatcher import email_dispatcher_task
+from core.views._helpers import users_who_can, wants_email
+from core.utils.dagdelen import get_period_metas
+from core.tasks.email_dispatcher import email_batch_signatures
 
 def _monday_of_week(d: date) -> date:
     return d - timedelta(days=d.weekday())
@@ -22,6 +23,53 @@ ROW_BG = {
     "blue":  "#EEF4FF",
 }
 
+def _shift_row(s: Shift, meta: dict, show_day: bool) -> dict:
+    loc = s.task.location if s.task and s.task.location else None
+    return {
+        "date": s.date.isoformat(),  # <-- JSON-safe
+        "period": s.period,
+        "period_label": meta["label"],
+        "period_time": meta["time_str"],
+        "location": loc.name if loc else "",
+        "task": s.task.name if s.task else "",
+        "show_day": show_day,
+        "is_assigned": True,
+        "row_bg": ROW_BG.get((getattr(loc, "color", "") or "").strip(), ""),
+    }
+
+
+def _overzicht_rows(shifts: list[Shift], days: list[date], metas: dict) -> tuple[list[dict], list[dict]]:
+    """
+    rows + location_rows voor één user. ma..za, per dag ochtend/middag/vooravond
+    alleen als de shift bestaat; de dagnaam alleen op de eerste row van die dag.
+    """
+    shift_map = {(s.date, s.period): s for s in shifts}
+
+    rows: list[dict] = []
+    for d in days:
+        day_periods = [p for p in ("morning", "afternoon", "evening") if (d, p) in shift_map]
+        for idx, p in enumerate(day_periods):
+            rows.append(_shift_row(shift_map[(d, p)], metas[p], show_day=(idx == 0)))
+
+    # Unieke locaties die in deze shifts voorkomen (met adres + tint)
+    loc_seen: dict[int, object] = {}
+    for s in shifts:
+        loc = getattr(getattr(s, "task", None), "location", None)
+        if not loc:
+            continue
+        loc_seen[loc.id] = loc
+
+    location_rows: list[dict] = []
+    for loc in sorted(loc_seen.values(), key=lambda x: (x.name or "").lower()):
+        c = (getattr(loc, "color", "") or "").strip()
+        location_rows.append({
+            "name": (loc.name or "").strip(),
+            "address": (loc.address or "").strip(),
+            "row_bg": ROW_BG.get(c, ""),
+        })
+    return rows, location_rows
+
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
 def send_weekly_diensten_overzicht(self):
     """
@@ -31,6 +79,10 @@ def send_weekly_diensten_overzicht(self):
     - permissie can_view_diensten
     - preference email_diensten_overzicht aan staat
     - user minstens 1 shift heeft in de week erna
+
+    Set-based: één Shift query voor iedereen, één profiel query, één Dagdeel query en de
+    permissies in bulk; het aantal queries is onafhankelijk van het aantal medewerkers.
+    De mails gaan als één Celery group naar de mail queue.
     """
     translation.activate("nl")
 
@@ -38,135 +90,47 @@ def send_weekly_diensten_overzicht(self):
     next_monday = _monday_of_week(today) + timedelta(weeks=1)
     week_end = next_monday + timedelta(days=5)  # ma..za
     days = [next_monday + timedelta(days=i) for i in range(6)]
-    saturday = next_monday + timedelta(days=5)
 
     iso_year, iso_week, _ = next_monday.isocalendar()
     header_title = f"Week {iso_week} – {iso_year}"
 
-    profiles = (
+    # Alle diensten van de week erna, per user
+    shifts_by_user: dict[int, list[Shift]] = defaultdict(list)
+    for s in (
+        Shift.objects
+        .filter(date__in=days, user__is_active=True)
+        .select_related("task", "task__location")
+        .order_by("user_id", "date", "period")
+    ):
+        shifts_by_user[s.user_id].append(s)
+
+    # Geen diensten? niks sturen.
+    if not shifts_by_user:
+        return
+
+    profiles = list(
         UserProfile.objects
         .select_related("user", "notif_prefs")
-        .filter(user__is_active=True)
+        .filter(user_id__in=shifts_by_user.keys())
+        .exclude(user__email="")
     )
 
+    # consistent met je app: alleen als user dit onderdeel mag zien (in bulk, niet per user)
+    allowed = users_who_can([p.user for p in profiles], "can_view_diensten")
+    metas = get_period_metas()
+
+    jobs = []
     for profile in profiles:
         user = profile.user
-        if not user or not user.email:
-            continue
-
-        # consistent met je app: alleen als user dit onderdeel mag zien
-        if not can(user, "can_view_diensten"):
+        if user.id not in allowed:
             continue
 
         prefs = getattr(profile, "notif_prefs", None)
         if not wants_email(user, "email_diensten_overzicht", prefs=prefs):
             continue
 
-        shifts_qs = (
-            Shift.objects
-            .filter(user=user, date__in=days)
-            .select_related("task", "task__location")
-            .order_by("date", "period")
-        )
-
-        # Geen diensten? niks sturen.
-        if not shifts_qs.exists():
-            continue
-
-        shifts = list(shifts_qs)
-        shift_map = {(s.date, s.period): s for s in shifts}
-        show_saturday = any(s.date == saturday for s in shifts)
-
-        def has_evening(d: date) -> bool:
-            return (d, "evening") in shift_map
-
-        def row_bg_for_shift(s: Shift | None) -> str:
-            loc = getattr(getattr(s, "task", None), "location", None)
-            c = (getattr(loc, "color", "") or "").strip()
-            return ROW_BG.get(c, "")
-
-        rows: list[dict] = []
-
-        # ma..vr: morning + afternoon alleen als shift bestaat, evening alleen als bestaat
-        for d in days[:5]:
-            day_rows: list[dict] = []
-
-            for p in ("morning", "afternoon"):
-                s = shift_map.get((d, p))
-                if not s:
-                    continue
-
-                meta = get_period_meta(p)
-                day_rows.append({
-                    "date": d.isoformat(),  # <-- JSON-safe
-                    "period": p,
-                    "period_label": meta["label"],
-                    "period_time": meta["time_str"],
-                    "location": s.task.location.name if s.task and s.task.location else "",
-                    "task": s.task.name if s.task else "",
-                    "show_day": False,          # vullen we hieronder
-                    "is_assigned": True,
-                    "row_bg": row_bg_for_shift(s),
-                })
-
-            if has_evening(d):
-                s = shift_map.get((d, "evening"))
-                if s:
-                    meta = get_period_meta("evening")
-                    day_rows.append({
-                        "date": d.isoformat(),  # <-- JSON-safe
-                        "period": "evening",
-                        "period_label": meta["label"],
-                        "period_time": meta["time_str"],
-                        "location": s.task.location.name if s.task and s.task.location else "",
-                        "task": s.task.name if s.task else "",
-                        "show_day": False,
-                        "is_assigned": True,
-                        "row_bg": row_bg_for_shift(s),
-                    })
-
-            # show_day alleen op de eerste row van die dag (geen dubbele dag-namen)
-            for idx, r in enumerate(day_rows):
-                r["show_day"] = (idx == 0)
-                rows.append(r)
-
-        # zaterdag: alleen als er shifts zijn, net als je view
-        if show_saturday:
-            d = saturday
-            sat_periods = [p for p in ("morning", "afternoon", "evening") if (d, p) in shift_map]
-            for idx, p in enumerate(sat_periods):
-                s = shift_map[(d, p)]
-                meta = get_period_meta(p)
-                rows.append({
-                    "date": d.isoformat(),  # <-- JSON-safe
-                    "period": p,
-                    "period_label": meta["label"],
-                    "period_time": meta["time_str"],
-                    "location": s.task.location.name if s.task and s.task.location else "",
-                    "task": s.task.name if s.task else "",
-                    "show_day": (idx == 0),
-                    "is_assigned": True,
-                    "row_bg": row_bg_for_shift(s),
-                })
-
-        # Unieke locaties die in deze shifts voorkomen (met adres + tint)
-        loc_seen: dict[int, object] = {}
-        for s in shifts:
-            loc = getattr(getattr(s, "task", None), "location", None)
-            if not loc:
-                continue
-            loc_seen[loc.id] = loc
-
-        location_rows: list[dict] = []
-        for loc in sorted(loc_seen.values(), key=lambda x: (x.name or "").lower()):
-            c = (getattr(loc, "color", "") or "").strip()
-            location_rows.append({
-                "name": (loc.name or "").strip(),
-                "address": (loc.address or "").strip(),
-                "row_bg": ROW_BG.get(c, ""),
-            })
-
-        job = {
+        rows, location_rows = _overzicht_rows(shifts_by_user[user.id], days, metas)
+        jobs.append({
             "type": "diensten_overzicht",
             "payload": {
                 "to_email": user.email,
@@ -177,6 +141,7 @@ def send_weekly_diensten_overzicht(self):
                 "rows": rows,
                 "location_rows": location_rows,
             },
-        }
+        })
 
-        email_dispatcher_task.apply_async(args=[job], queue="mail")
\ No newline at end of file
+    if jobs:
+        group(email_batch_signatures(jobs)).apply_async()
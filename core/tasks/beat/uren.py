@@ -11,7 +11,7 @@ from datetime import date
 
 from core.views._helpers import wants_email
 from core.models import Shift, UrenRegel, UserProfile
-from core.tasks.email_dispatcher import email_dispatcher_task
+from core.tasks.email_dispatcher import email_batch_signatures, email_dispatcher_task
 from core.tasks.beat.cleanup import cleanup_uren_export_task
 from core.utils.beat.uren import export_uren_month_to_storage
 from core.utils.push.push import send_uren_reminder_push
@@ -41,6 +41,7 @@ def monthly_uren_export_task(self):
             "to_email": to_email,
             "month_first": res.month.isoformat(),
             "xlsx_path": res.xlsx_storage_path,
+            "xlsx_sha256": res.xlsx_sha256,
             "filename": res.filename,
             "contact_email": contact_email,
             "logo_path": logo_path,
@@ -113,6 +114,7 @@ def send_uren_reminder():
     # Maak mapping user_id -> profile (zodat we prefs/email niet opnieuw hoeven te query’en)
     profiles_by_user_id = {p.user_id: p for p in users_qs}
 
+    mail_jobs = []
     for uid in users_to_remind:
         prof = profiles_by_user_id.get(uid)
         if not prof:
@@ -126,12 +128,14 @@ def send_uren_reminder():
         send_uren_reminder_push(user.id, last_month_first)
 
         if user.email and wants_email(user, "email_uren_reminder", prefs=prefs):
-            job = {
+            mail_jobs.append({
                 "type": "uren_reminder",
                 "payload": {
                     "to_email": user.email,
                     "first_name": user.first_name or "",
                     "month_first": last_month_first.isoformat(),
                 },
-            }
-            email_dispatcher_task.delay(job)
\ No newline at end of file
+            })
+
+    if mail_jobs:
+        group(email_batch_signatures(mail_jobs)).apply_async()
\ No newline at end of file
@@ -1,19 +1,44 @@
 # core/tasks/email_dispatcher.py
+import logging
+import smtplib
+import time
+
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from django.core.files.storage import default_storage
 
-@shared_task(
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_backoff=60,
-    max_retries=3,
-    rate_limit="10/s",
-    acks_late=False,  # voorkomt dubbele mails door worker-crash na verzenden
-)
-def email_dispatcher_task(self, job: dict):
+from core.utils.emails.attachments import read_attachment
+
+logger = logging.getLogger(__name__)
+
+# Batch: max aantal mails per task en per seconde (zelfde tempo als rate_limit hieronder)
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_PER_SECOND = 10
+EMAIL_BATCH_RETRY_COUNTDOWN = 60    # seconden, verdubbelt per poging
+# Eigen tijdslimiet per batch (de globale 50/60s is voor 1 mail): 50 mails is al 5s
+# pacing plus de SMTP tijd per mail. Bij de soft limit gaat de rest naar de retry.
+EMAIL_BATCH_SOFT_TIME_LIMIT = 60 * 4
+EMAIL_BATCH_TIME_LIMIT = 60 * 5
+
+
+def _send_with_fallback(send, p: dict, **kwargs):
     """
-    job = {"type": "...", "payload": {...}}
-    1 task-call = 1 email (max 1 succesvolle verzending).
+    Probeer primary (p["to_email"]), bij een fout het fallback e-mailadres (p["fallback_email"]).
+    """
+    try:
+        send(to_email=p["to_email"], **kwargs)
+    except Exception:
+        fallback = p.get("fallback_email")
+        if fallback and fallback != p["to_email"]:
+            send(to_email=fallback, **kwargs)
+        else:
+            raise
+
+
+def _dispatch_job(job: dict, connection=None):
+    """
+    Verstuurt 1 job (1 email, max 1 succesvolle verzending).
+    connection=None: Django opent/sluit zelf een verbinding voor deze ene mail.
     """
     job_type = job["type"]
     p = job.get("payload", {})
@@ -43,48 +68,33 @@ def email_dispatcher_task(self, job: dict):
             to_email=p["to_email"],
             first_name=p.get("first_name", "Collega"),
             item_naam=p["item_naam"],
+            connection=connection,
         )
         return
 
     if job_type == "nazending_single":
         from core.utils.emails.nazending_mail import send_single_nazending_email
 
-        # PDF uit storage lezen (lokaal of S3)
-        with default_storage.open(p["pdf_path"], "rb") as f:
-            pdf_content = f.read()
+        # PDF uit storage lezen (lokaal of S3), 1x per worker
+        pdf_content = read_attachment(p["pdf_path"], p.get("pdf_sha256"))
 
-        # fallback e-mailadres: probeer primary, anders email2
-        try:
-            send_single_nazending_email(
-                to_email=p["to_email"],
-                name=p["name"],
-                pdf_content=pdf_content,
-                filename=p["filename"],
-                logo_path=p["logo_path"],
-                contact_email=p["contact_email"],
-            )
-        except Exception:
-            fallback = p.get("fallback_email")
-            if fallback and fallback != p["to_email"]:
-                send_single_nazending_email(
-                    to_email=fallback,
-                    name=p["name"],
-                    pdf_content=pdf_content,
-                    filename=p["filename"],
-                    logo_path=p["logo_path"],
-                    contact_email=p["contact_email"],
-                )
-            else:
-                raise
+        _send_with_fallback(
+            send_single_nazending_email, p,
+            name=p["name"],
+            pdf_content=pdf_content,
+            filename=p["filename"],
+            logo_path=p["logo_path"],
+            contact_email=p["contact_email"],
+            connection=connection,
+        )
         return
-    
+
     if job_type == "uren_overzicht":
         from datetime import date
         from core.utils.emails.uren_overzicht import send_uren_overzicht_email
 
-        # XLSX uit storage lezen (lokaal of S3)
-        with default_storage.open(p["xlsx_path"], "rb") as f:
-            xlsx_content = f.read()
+        # XLSX uit storage lezen (lokaal of S3), 1x per worker
+        xlsx_content = read_attachment(p["xlsx_path"], p.get("xlsx_sha256"))
 
         month_first = date.fromisoformat(p["month_first"])
 
@@ -95,9 +105,10 @@ def email_dispatcher_task(self, job: dict):
             filename=p["filename"],
             contact_email=p["contact_email"],
             logo_path=p.get("logo_path"),
+            connection=connection,
         )
         return
-    
+
     if job_type == "uren_reminder":
         from datetime import date
         from core.utils.emails.urenreminder import send_uren_reminder_email
@@ -108,18 +119,20 @@ def email_dispatcher_task(self, job: dict):
             to_email=p["to_email"],
             first_name=p.get("first_name", ""),
             reminder_date=reminder_month_first,
+            connection=connection,
         )
         return
-    
+
     if job_type == "birthday":
         from core.utils.emails.birthday_email import send_birthday_email
 
         send_birthday_email(
             to_email=p["to_email"],
             first_name=p.get("first_name", "Collega"),
+            connection=connection,
         )
         return
-    
+
     if job_type == "diensten_overzicht":
         from datetime import date
         from core.utils.emails.email_dienstenoverzicht import send_diensten_overzicht_email
@@ -132,144 +145,176 @@ def email_dispatcher_task(self, job: dict):
             week_end=date.fromisoformat(p["week_end"]),
             rows=p["rows"],
             location_rows=p["location_rows"],
+            connection=connection,
         )
         return
-    
+
     if job_type == "stshalfjes_single":
         from core.utils.emails.stshalfjes_email import send_single_stshalfjes_email, delete_stshalfjes_by_ids
 
-        with default_storage.open(p["pdf_path"], "rb") as f:
-            pdf_content = f.read()
+        pdf_content = read_attachment(p["pdf_path"], p.get("pdf_sha256"))
 
-        try:
-            send_single_stshalfjes_email(
-                to_email=p["to_email"],
-                name=p["name"],
-                pdf_content=pdf_content,
-                filename=p["filename"],
-                logo_path=p["logo_path"],
-                contact_email=p["contact_email"],
-            )
-        except Exception:
-            fallback = p.get("fallback_email")
-            if fallback and fallback != p["to_email"]:
-                send_single_stshalfjes_email(
-                    to_email=fallback,
-                    name=p["name"],
-                    pdf_content=pdf_content,
-                    filename=p["filename"],
-                    logo_path=p["logo_path"],
-                    contact_email=p["contact_email"],
-                )
-            else:
-                raise
+        _send_with_fallback(
+            send_single_stshalfjes_email, p,
+            name=p["name"],
+            pdf_content=pdf_content,
+            filename=p["filename"],
+            logo_path=p["logo_path"],
+            contact_email=p["contact_email"],
+            connection=connection,
+        )
         item_ids = p.get("item_ids") or []
         if item_ids:
-            delete_stshalfjes_by_ids(item_ids)
-        return 
-    
+            # mail is al verstuurd: een fout bij opruimen mag geen tweede mail opleveren
+            try:
+                delete_stshalfjes_by_ids(item_ids)
+            except Exception:
+                logger.exception("STS-halfjes %s niet verwijderd na mail aan %s", item_ids, p["to_email"])
+        return
+
     if job_type == "no_delivery_single":
         from core.utils.emails.no_delivery_email import send_single_no_delivery_email
 
-        with default_storage.open(p["pdf_path"], "rb") as f:
-            pdf_content = f.read()
-
-        try:
-            send_single_no_delivery_email(
-                to_email=p["to_email"],
-                name=p["name"],
-                pdf_content=pdf_content,
-                filename=p["filename"],
-                logo_path=p["logo_path"],
-                contact_email=p["contact_email"],
-                week=p["week"],
-                dag_label=p["dag_label"],
-            )
-        except Exception:
-            fallback = p.get("fallback_email")
-            if fallback and fallback != p["to_email"]:
-                send_single_no_delivery_email(
-                    to_email=fallback,
-                    name=p["name"],
-                    pdf_content=pdf_content,
-                    filename=p["filename"],
-                    logo_path=p["logo_path"],
-                    contact_email=p["contact_email"],
-                    week=p["week"],
-                    dag_label=p["dag_label"],
-                )
-            else:
-                raise
+        pdf_content = read_attachment(p["pdf_path"], p.get("pdf_sha256"))
 
+        _send_with_fallback(
+            send_single_no_delivery_email, p,
+            name=p["name"],
+            pdf_content=pdf_content,
+            filename=p["filename"],
+            logo_path=p["logo_path"],
+            contact_email=p["contact_email"],
+            week=p["week"],
+            dag_label=p["dag_label"],
+            connection=connection,
+        )
         return
-    
+
     if job_type == "voorraad_single":
         from core.utils.emails.voorraad_mail import send_single_voorraad_email
 
-        with default_storage.open(p["html_path"], "rb") as f:
-            html_bytes = f.read()
+        html_bytes = read_attachment(p["html_path"], p.get("html_sha256"))
 
-        try:
-            send_single_voorraad_email(
-                to_email=p["to_email"],
-                name=p["name"],
-                html_bytes=html_bytes,
-                filename=p["filename"],
-                logo_path=p["logo_path"],
-                contact_email=p["contact_email"],
-            )
-        except Exception:
-            fallback = p.get("fallback_email")
-            if fallback and fallback != p["to_email"]:
-                send_single_voorraad_email(
-                    to_email=fallback,
-                    name=p["name"],
-                    html_bytes=html_bytes,
-                    filename=p["filename"],
-                    logo_path=p["logo_path"],
-                    contact_email=p["contact_email"],
-                )
-            else:
-                raise
+        _send_with_fallback(
+            send_single_voorraad_email, p,
+            name=p["name"],
+            html_bytes=html_bytes,
+            filename=p["filename"],
+            logo_path=p["logo_path"],
+            contact_email=p["contact_email"],
+            connection=connection,
+        )
         return
 
-    
     if job_type == "omzettingslijst_single":
         from core.utils.emails.omzettingslijst_email import send_single_omzettingslijst_email
 
-        with default_storage.open(p["pdf_path"], "rb") as f:
-            pdf_content = f.read()
+        pdf_content = read_attachment(p["pdf_path"], p.get("pdf_sha256"))
 
-        try:
-            send_single_omzettingslijst_email(
-                to_email=p["to_email"],
-                name=p["name"],
-                pdf_content=pdf_content,
-                filename=p["filename"],
-                logo_path=p["logo_path"],
-                contact_email=p["contact_email"],
-                week=p["week"],
-                dag_label=p["dag_label"],
-            )
-        except Exception:
-            fallback = p.get("fallback_email")
-            if fallback and fallback != p["to_email"]:
-                send_single_omzettingslijst_email(
-                    to_email=fallback,
-                    name=p["name"],
-                    pdf_content=pdf_content,
-                    filename=p["filename"],
-                    logo_path=p["logo_path"],
-                    contact_email=p["contact_email"],
-                    week=p["week"],
-                    dag_label=p["dag_label"],
-                )
-            else:
-                raise
+        _send_with_fallback(
+            send_single_omzettingslijst_email, p,
+            name=p["name"],
+            pdf_content=pdf_content,
+            filename=p["filename"],
+            logo_path=p["logo_path"],
+            contact_email=p["contact_email"],
+            week=p["week"],
+            dag_label=p["dag_label"],
+            connection=connection,
+        )
         return
 
     raise ValueError(f"Unknown job type: {job_type}")
 
+
+def _dispatch_batch(jobs: list[dict]) -> tuple[list[dict], Exception | None]:
+    """
+    Verstuurt de jobs na elkaar over de persistente SMTP verbinding van deze worker.
+    Elke job behoudt zijn eigen fallback-logica. Geeft (mislukte jobs, laatste fout) terug.
+    Soft time limit: stopt direct; de job die bezig was en de rest tellen dan als mislukt.
+    """
+    from core.utils.emails.smtp import close_smtp_connection, get_smtp_connection
+
+    failed, last_exc = [], None
+    interval = 1.0 / EMAIL_BATCH_PER_SECOND
+    next_at = 0.0
+
+    for n, job in enumerate(jobs):
+        try:
+            wait = next_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_at = time.monotonic() + interval
+
+            for attempt in (1, 2):
+                try:
+                    _dispatch_job(job, connection=get_smtp_connection())
+                    break
+                except SoftTimeLimitExceeded:
+                    raise
+                except Exception as exc:
+                    # verbinding kan in een onbekende staat zijn -> volgende job krijgt een nieuwe
+                    close_smtp_connection()
+                    if attempt == 1 and isinstance(exc, smtplib.SMTPServerDisconnected):
+                        continue
+                    to_email = job.get("payload", {}).get("to_email")
+                    logger.warning("Batch mail %s aan %s mislukt", job.get("type"), to_email, exc_info=True)
+                    failed.append(job)
+                    last_exc = exc
+                    break
+        except SoftTimeLimitExceeded as exc:
+            close_smtp_connection()
+            logger.warning("Batch mail: tijdslimiet bereikt, %d van %d mails naar de retry", len(jobs) - n, len(jobs))
+            return failed + jobs[n:], exc
+
+    return failed, last_exc
+
+
+def email_batch_signatures(jobs: list[dict], batch_size: int = EMAIL_BATCH_SIZE) -> list:
+    """
+    Fan-out: jobs in batches van batch_size, 1 signature (queue "mail") per batch,
+    met de batch tijdslimieten (retries nemen die over).
+    """
+    return [
+        email_dispatcher_task.s({"type": "batch", "payload": {"jobs": jobs[i:i + batch_size]}}).set(
+            queue="mail",
+            soft_time_limit=EMAIL_BATCH_SOFT_TIME_LIMIT,
+            time_limit=EMAIL_BATCH_TIME_LIMIT,
+        )
+        for i in range(0, len(jobs), batch_size)
+    ]
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=60,
+    max_retries=3,
+    rate_limit="10/s",
+    acks_late=False,  # voorkomt dubbele mails door worker-crash na verzenden
+)
+def email_dispatcher_task(self, job: dict):
+    """
+    job = {"type": "...", "payload": {...}}
+    1 task-call = 1 email (max 1 succesvolle verzending).
+
+    job = {"type": "batch", "payload": {"jobs": [job, ...]}}
+    Alle jobs over 1 SMTP verbinding; per ontvanger max 1 succesvolle verzending:
+    een retry bevat alleen de jobs die nog niet gelukt zijn (ook na de soft time limit,
+    zie email_batch_signatures).
+    """
+    if job["type"] != "batch":
+        _dispatch_job(job)
+        return
+
+    failed, exc = _dispatch_batch(job.get("payload", {}).get("jobs") or [])
+    if failed:
+        raise self.retry(
+            args=[{"type": "batch", "payload": {"jobs": failed}}],
+            exc=exc,
+            countdown=EMAIL_BATCH_RETRY_COUNTDOWN * (2 ** self.request.retries),
+        )
+
 @shared_task(bind=True)
 def cleanup_storage_file_task(self, results, path: str):
     """
@@ -279,4 +324,4 @@ def cleanup_storage_file_task(self, results, path: str):
         if default_storage.exists(path):
             default_storage.delete(path)
     except Exception:
-        pass
\ No newline at end of file
+        pass
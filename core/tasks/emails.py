@@ -1,6 +1,7 @@
 # core/tasks/emails.py
 from celery import shared_task, chord, group
-from core.tasks.email_dispatcher import email_dispatcher_task
+from core.tasks.email_dispatcher import email_dispatcher_task, email_batch_signatures
+from core.utils.emails.attachments import content_sha256
 
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
 def send_invite_email_task(self, user_id: int):
@@ -28,7 +29,7 @@ def send_nazendingen_pdf_task(self, organization_ids):
 
     from core.models import Nazending, Organization
     from core.views._helpers import _static_abs_path, _render_pdf
-    from core.tasks.email_dispatcher import email_dispatcher_task, cleanup_storage_file_task
+    from core.tasks.email_dispatcher import email_batch_signatures, cleanup_storage_file_task
 
     contact_email = "baxterezorg@apotheekjansen.com"
     nazendingen = (
@@ -59,29 +60,31 @@ def send_nazendingen_pdf_task(self, organization_ids):
     ts = timezone.now().strftime("%Y%m%d_%H%M%S")
     pdf_path = f"tmp/nazendingen/{ts}_{filename}"
     pdf_path = default_storage.save(pdf_path, ContentFile(pdf_bytes))
+    pdf_sha256 = content_sha256(pdf_bytes)
 
     orgs = Organization.objects.filter(id__in=organization_ids)
 
-    mail_sigs = []
+    mail_jobs = []
     for org in orgs:
         primary = org.email or org.email2
         if not primary:
             continue
 
-        sig = email_dispatcher_task.s({
+        mail_jobs.append({
             "type": "nazending_single",
             "payload": {
                 "to_email": primary,
                 "fallback_email": org.email2 if org.email2 and org.email2 != primary else None,
                 "name": org.name,
                 "pdf_path": pdf_path,
+                "pdf_sha256": pdf_sha256,
                 "filename": filename,
                 "logo_path": logo_path,
                 "contact_email": contact_email,
             }
-        }).set(queue="mail")
+        })
 
-        mail_sigs.append(sig)
+    mail_sigs = email_batch_signatures(mail_jobs)
 
     if not mail_sigs:
         cleanup_storage_file_task.apply_async(args=[[], pdf_path], queue="default")
@@ -101,7 +104,7 @@ def send_voorraad_html_task(self, organization_ids):
     from celery import chord, group
 
     from core.models import VoorraadItem, Organization
-    from core.tasks.email_dispatcher import email_dispatcher_task, cleanup_storage_file_task
+    from core.tasks.email_dispatcher import email_batch_signatures, cleanup_storage_file_task
 
     contact_email = "baxterezorg@apotheekjansen.com"
     items = VoorraadItem.objects.all().order_by("naam", "zi_nummer")
@@ -134,32 +137,35 @@ def send_voorraad_html_task(self, organization_ids):
     filename = f"Baxtervoorraad_ApoJansen_{timezone.now().strftime('%d-%m-%Y')}.html"
     ts = timezone.now().strftime("%Y%m%d_%H%M%S")
     html_path = f"tmp/voorraad/{ts}_{filename}"
-    html_path = default_storage.save(html_path, ContentFile(html.encode("utf-8")))
+    html_bytes = html.encode("utf-8")
+    html_path = default_storage.save(html_path, ContentFile(html_bytes))
+    html_sha256 = content_sha256(html_bytes)
 
     logo_path = os.path.join(settings.BASE_DIR, "core", "static", "img", "app_icon_trans-512x512.png")
 
     orgs = Organization.objects.filter(id__in=organization_ids)
 
-    mail_sigs = []
+    mail_jobs = []
     for org in orgs:
         primary = org.email or org.email2
         if not primary:
             continue
 
-        sig = email_dispatcher_task.s({
+        mail_jobs.append({
             "type": "voorraad_single",
             "payload": {
                 "to_email": primary,
                 "fallback_email": org.email2 if org.email2 and org.email2 != primary else None,
                 "name": org.name,
                 "html_path": html_path,
+                "html_sha256": html_sha256,
                 "filename": filename,
                 "logo_path": logo_path,
                 "contact_email": contact_email,
             }
-        }).set(queue="mail")
+        })
 
-        mail_sigs.append(sig)
+    mail_sigs = email_batch_signatures(mail_jobs)
 
     if not mail_sigs:
         cleanup_storage_file_task.apply_async(args=[[], html_path], queue="default")
@@ -176,21 +182,20 @@ def send_laatste_pot_email_task(self, item_naam: str):
     users = User.objects.filter(is_active=True)
     recipients = [u for u in users if can(u, "can_perform_bestellingen")]
 
-    for user in recipients:
-        if not user.email:
-            continue
-
-        email_dispatcher_task.apply_async(
-            args=[{
-                "type": "laatste_pot",
-                "payload": {
-                    "to_email": user.email,
-                    "first_name": user.first_name or "Collega",
-                    "item_naam": item_naam,
-                }
-            }],
-            queue="mail",
-        )
+    jobs = [
+        {
+            "type": "laatste_pot",
+            "payload": {
+                "to_email": user.email,
+                "first_name": user.first_name or "Collega",
+                "item_naam": item_naam,
+            }
+        }
+        for user in recipients
+        if user.email
+    ]
+    if jobs:
+        group(email_batch_signatures(jobs)).apply_async()
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
 def cleanup_storage_files_task(self, results, paths):
     """
@@ -219,7 +224,7 @@ def send_stshalfjes_pdf_task(self, organization_ids):
     from core.models import STSHalfje, Organization
     from core.views._helpers import _static_abs_path, _render_pdf
 
-    from core.tasks.email_dispatcher import email_dispatcher_task
+    from core.tasks.email_dispatcher import email_batch_signatures
 
     contact_email = "baxterezorg@apotheekjansen.com"
 
@@ -235,7 +240,7 @@ def send_stshalfjes_pdf_task(self, organization_ids):
     # Inline logo voor mail (filesystem pad)
     logo_path = os.path.join(settings.BASE_DIR, "core", "static", "img", "app_icon_trans-512x512.png")
 
-    mail_sigs = []
+    mail_jobs = []
     tmp_paths = []
 
     for org in orgs:
@@ -278,23 +283,25 @@ def send_stshalfjes_pdf_task(self, organization_ids):
 
         pdf_path = f"tmp/stshalfjes/{ts}_{org.id}_{filename}"
         pdf_path = default_storage.save(pdf_path, ContentFile(pdf_bytes))
+        pdf_sha256 = content_sha256(pdf_bytes)
         tmp_paths.append(pdf_path)
 
-        sig = email_dispatcher_task.s({
+        mail_jobs.append({
             "type": "stshalfjes_single",
             "payload": {
                 "to_email": primary,
                 "fallback_email": org.email2 if org.email2 and org.email2 != primary else None,
                 "name": org.name,
                 "pdf_path": pdf_path,
+                "pdf_sha256": pdf_sha256,
                 "filename": filename,
                 "logo_path": logo_path,
                 "contact_email": contact_email,
                 "item_ids": item_ids,
             }
-        }).set(queue="mail")
+        })
 
-        mail_sigs.append(sig)
+    mail_sigs = email_batch_signatures(mail_jobs)
 
     # Niks te mailen? cleanup meteen
     if not mail_sigs:
@@ -317,7 +324,7 @@ def send_no_delivery_pdf_task(self, no_delivery_list_ids):
 
     from core.models import NoDeliveryList
     from core.views._helpers import _static_abs_path, _render_pdf
-    from core.tasks.email_dispatcher import email_dispatcher_task
+    from core.tasks.email_dispatcher import email_batch_signatures
 
     contact_email = "baxterezorg@apotheekjansen.com"
 
@@ -339,7 +346,7 @@ def send_no_delivery_pdf_task(self, no_delivery_list_ids):
         .order_by("-updated_at", "-created_at")
     )
 
-    mail_sigs = []
+    mail_jobs = []
     tmp_paths = []
 
     for lst in lists:
@@ -391,24 +398,26 @@ def send_no_delivery_pdf_task(self, no_delivery_list_ids):
 
         pdf_path = f"tmp/no_delivery/{ts}_{lst.id}_{filename}"
         pdf_path = default_storage.save(pdf_path, ContentFile(pdf_bytes))
+        pdf_sha256 = content_sha256(pdf_bytes)
         tmp_paths.append(pdf_path)
 
-        sig = email_dispatcher_task.s({
+        mail_jobs.append({
             "type": "no_delivery_single",
             "payload": {
                 "to_email": primary,
                 "fallback_email": org.email2 if org.email2 and org.email2 != primary else None,
                 "name": org.name,
                 "pdf_path": pdf_path,
+                "pdf_sha256": pdf_sha256,
                 "filename": filename,
                 "logo_path": logo_path,
                 "contact_email": contact_email,
                 "week": int(lst.week),
                 "dag_label": dag_label,
             }
-        }).set(queue="mail")
+        })
 
-        mail_sigs.append(sig)
+    mail_sigs = email_batch_signatures(mail_jobs)
 
     if not mail_sigs:
         cleanup_storage_files_task.apply_async(args=[[], tmp_paths], queue="default")
@@ -429,7 +438,7 @@ def send_omzettingslijst_pdf_task(self, omzettingslijst_ids):
 
     from core.models import Omzettingslijst
     from core.views._helpers import _static_abs_path, _render_pdf
-    from core.tasks.email_dispatcher import email_dispatcher_task
+    from core.tasks.email_dispatcher import email_batch_signatures
     from core.tasks import cleanup_storage_files_task  # als die in dezelfde module staat
 
     contact_email = "baxterezorg@apotheekjansen.com"
@@ -456,7 +465,7 @@ def send_omzettingslijst_pdf_task(self, omzettingslijst_ids):
         .order_by("-updated_at", "-created_at")
     )
 
-    mail_sigs = []
+    mail_jobs = []
     tmp_paths = []
 
     from datetime import date
@@ -505,24 +514,26 @@ def send_omzettingslijst_pdf_task(self, omzettingslijst_ids):
 
         pdf_path = f"tmp/omzettingslijst/{ts}_{lst.id}_{filename}"
         pdf_path = default_storage.save(pdf_path, ContentFile(pdf_bytes))
+        pdf_sha256 = content_sha256(pdf_bytes)
         tmp_paths.append(pdf_path)
 
-        sig = email_dispatcher_task.s({
+        mail_jobs.append({
             "type": "omzettingslijst_single",
             "payload": {
                 "to_email": primary,
                 "fallback_email": org.email2 if org.email2 and org.email2 != primary else None,
                 "name": org.name,
                 "pdf_path": pdf_path,
+                "pdf_sha256": pdf_sha256,
                 "filename": filename,
                 "logo_path": logo_path,
                 "contact_email": contact_email,
                 "week": int(lst.week),
                 "dag_label": dag_label,
             }
-        }).set(queue="mail")
+        })
 
-        mail_sigs.append(sig)
+    mail_sigs = email_batch_signatures(mail_jobs)
 
     if not mail_sigs:
         cleanup_storage_files_task.apply_async(args=[[], tmp_paths], queue="default")
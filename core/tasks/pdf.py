@@ -0,0 +1,65 @@
+# core/tasks/pdf.py
+from __future__ import annotations
+
+import logging
+
+from celery import shared_task
+from celery.signals import celeryd_init, worker_process_init
+
+logger = logging.getLogger(__name__)
+
+PDF_QUEUE = "pdf"
+_warm_on_start = False
+
+
+@celeryd_init.connect
+def _mark_pdf_worker(sender=None, options=None, **kwargs):
+    # alleen workers die de "pdf" queue consumeren houden WeasyPrint warm
+    global _warm_on_start
+    queues = (options or {}).get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    _warm_on_start = PDF_QUEUE in [q.strip() for q in queues]
+
+
+@worker_process_init.connect
+def _warm_pdf_worker(**kwargs):
+    if _warm_on_start:
+        from core.utils.pdf_export import warm_pdf_renderer
+        warm_pdf_renderer()
+
+
+@shared_task(bind=True, acks_late=False)
+def render_pdf_task(self, job_id: str, html: str, base_url: str):
+    """
+    Rendert een export-PDF voor een wachtende webrequest (zie core/utils/pdf_export.py).
+    Geen retries: de view wacht maar PDF_RENDER_TIMEOUT seconden. Heeft hij het
+    opgegeven (cancel key), dan wordt er niet (meer) gerenderd of neergezet.
+    """
+    from core.utils.pdf_export import (
+        PDF_RENDER_RESULT_TTL,
+        _redis_connection,
+        cancel_key,
+        render_pdf_local,
+        result_key,
+    )
+
+    r = _redis_connection()
+    if r.exists(cancel_key(job_id)):
+        return
+
+    try:
+        pdf = render_pdf_local(html, base_url=base_url)
+    except Exception:
+        logger.exception("PDF render %s mislukt", job_id)
+        pdf = b""
+
+    if r.exists(cancel_key(job_id)):
+        logger.info("PDF render %s klaar na de timeout van de view, niet neergezet", job_id)
+        return
+
+    key = result_key(job_id)
+    pipe = r.pipeline()
+    pipe.rpush(key, pdf)
+    pipe.expire(key, PDF_RENDER_RESULT_TTL)
+    pipe.execute()
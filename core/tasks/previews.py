@@ -0,0 +1,133 @@
+# core/tasks/previews.py
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import date, timedelta
+from pathlib import Path
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+
+ROSTER_PUSH_SENT_KEY = "pdfpreview:roster_push:{task_id}"
+
+
+def _send_roster_push_once(monday_iso: str, task_id: str) -> None:
+    """
+    Rooster-push zodra de eerste pagina zichtbaar is.
+    cache.add op het task id voorkomt dubbele pushes bij een retry van de render.
+    """
+    from core.tasks.push import send_roster_updated_push_task
+
+    if not cache.add(ROSTER_PUSH_SENT_KEY.format(task_id=task_id), 1, timeout=60 * 60 * 24):
+        return
+
+    monday = date.fromisoformat(monday_iso)
+    iso_year, iso_week, _ = monday.isocalendar()
+    send_roster_updated_push_task.delay(
+        iso_year,
+        iso_week,
+        monday.isoformat(),
+        (monday + timedelta(days=4)).isoformat(),
+    )
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=30,
+    max_retries=2,
+    time_limit=60 * 10,
+    soft_time_limit=60 * 9,
+)
+def render_pdf_previews_task(
+    self,
+    rel_path: str,
+    cache_rel: str,
+    file_hash: str,
+    roster_monday: str | None = None,
+    reuse_cache_rel: str | None = None,
+    reuse_hash: str | None = None,
+    discard_reuse: bool = False,
+):
+    """
+    Rendert PDF previews pagina voor pagina op de "previews" queue.
+    Na elke pagina wordt de render-status in Redis bijgewerkt, zodat de viewer
+    (rooster/nieuws/werkafspraken) pagina's toont zodra ze klaar zijn.
+
+    reuse_cache_rel/reuse_hash: vorige versie; alleen gewijzigde pagina's worden gerenderd.
+    """
+    from core.models import RosterWeek
+    from core.views._upload_helpers import (
+        storage_local_path,
+        render_pdf_to_previews,
+        delete_pdf_previews,
+        set_preview_state,
+        clear_preview_state,
+    )
+
+    cache_root = Path(settings.CACHE_DIR) / cache_rel if cache_rel else Path(settings.CACHE_DIR)
+    reuse_from = None
+    if reuse_hash:
+        reuse_root = Path(settings.CACHE_DIR) / reuse_cache_rel if reuse_cache_rel else Path(settings.CACHE_DIR)
+        reuse_from = (reuse_root, reuse_hash)
+
+    def _on_page(page_no: int, n_pages: int, ext: str) -> None:
+        set_preview_state(
+            cache_root=cache_root,
+            file_hash=file_hash,
+            status="rendering",
+            pages_done=page_no,
+            n_pages=n_pages,
+            ext=ext,
+        )
+        if page_no == 1 and roster_monday:
+            _send_roster_push_once(roster_monday, self.request.id or file_hash)
+
+    with ExitStack() as stack:
+        # PDF als bestand op disk (PROD: temp download), de renderer leest pagina's van disk
+        try:
+            pdf_path = stack.enter_context(storage_local_path(rel_path))
+        except FileNotFoundError:
+            # Bron is inmiddels vervangen/verwijderd -> niets te doen
+            clear_preview_state(cache_root=cache_root, file_hash=file_hash)
+            return
+
+        try:
+            h, n_pages, ext = render_pdf_to_previews(
+                pdf_path,
+                cache_root=cache_root,
+                file_hash=file_hash,
+                on_page=_on_page,
+                reuse_from=reuse_from,
+                source_rel=rel_path,
+            )
+        except Exception:
+            if self.request.retries >= self.max_retries:
+                clear_preview_state(cache_root=cache_root, file_hash=file_hash)
+            raise
+
+    # Alle weken met deze PDF: dezelfde blob kan voor een tweede week geüpload zijn
+    # terwijl deze render nog liep (die upload queued dan geen eigen render)
+    RosterWeek.objects.filter(file_hash=h).update(
+        n_pages=n_pages,
+        preview_ext=ext,
+    )
+
+    # Vorige versie is overbodig geworden (oude rooster-cache in de weekmap)
+    if reuse_from and discard_reuse:
+        delete_pdf_previews(cache_root=reuse_from[0], file_hash=reuse_from[1])
+
+    clear_preview_state(cache_root=cache_root, file_hash=file_hash)
+
+
+@shared_task(time_limit=60 * 2, soft_time_limit=60 * 2 - 10)
+def render_zoom_preview_task(cache_rel: str, file_hash: str, page_no: int):
+    """
+    Zoom tier van één pagina, aangevraagd via de zoom link in de viewer.
+    Tot hij klaar is krijgt de viewer de screen tier.
+    """
+    from core.views._upload_helpers import render_zoom_preview
+
+    cache_root = Path(settings.CACHE_DIR) / cache_rel if cache_rel else Path(settings.CACHE_DIR)
+    render_zoom_preview(cache_root=cache_root, file_hash=file_hash, page_no=page_no)
@@ -42,7 +42,75 @@ def send_user_shifts_changed_push_task(
         removed_count=removed_count,
     )
 
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
+def flush_user_shifts_changed_push_task(self, user_id: int, iso_year: int, iso_week: int):
+    # gebundelde dienstwijzigingen (zie core/utils/push/shift_buffer.py)
+    from core.utils.push.shift_buffer import flush_user_shifts_changed
+    flush_user_shifts_changed(user_id=user_id, iso_year=iso_year, iso_week=iso_week)
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=60, max_retries=3)
 def send_test_push_task(self, user_id: int):
     from core.utils.push.push import send_test_push
-    send_test_push(user_id=user_id)
\ No newline at end of file
+    send_test_push(user_id=user_id)
+
+# ===== Fan-out: chunk tasks van een broadcast (zie dispatch_push_broadcast) =====
+PUSH_CHUNK_DONE_KEY = "push:chunk:{broadcast_id}:{kind}:{chunk_no}"
+PUSH_CHUNK_DONE_TTL = 60 * 60 * 24
+PUSH_CHUNK_RETRY_COUNTDOWN = 30     # seconden, verdubbelt per poging
+
+
+# provider in de metrics als de laatste poging een exception gaf (dan is niets per provider geteld)
+PUSH_CHUNK_FAILED_PROVIDER = {"web": "web", "native": "fcm"}
+
+
+def _finish_push_chunk(kind: str, done_key: str, broadcast_id: str, failed: int = 0) -> None:
+    from django.core.cache import cache
+    from core.utils.push import metrics as push_metrics
+
+    if failed:
+        push_metrics.record_sends(
+            broadcast_id, {PUSH_CHUNK_FAILED_PROVIDER[kind]: push_metrics.ProviderStats(failed=failed)}
+        )
+    cache.set(done_key, 1, timeout=PUSH_CHUNK_DONE_TTL)
+    push_metrics.chunk_done(broadcast_id)
+
+
+def _run_push_chunk(task, kind: str, send, broadcast_id: str, chunk_no: int, payload: dict, ids: list[int]):
+    """
+    Idempotent per (broadcast, chunk): een chunk die al klaar is wordt niet opnieuw verstuurd.
+    Ontvangers met een tijdelijke fout worden (alleen zij) opnieuw geprobeerd.
+    Na de laatste poging telt de sender wat nog over is als "failed" en is de chunk klaar,
+    ook als die poging zelf een exception gaf (anders blijft de broadcast "bezig").
+    """
+    from django.core.cache import cache
+
+    done_key = PUSH_CHUNK_DONE_KEY.format(broadcast_id=broadcast_id, kind=kind, chunk_no=chunk_no)
+    if cache.get(done_key):
+        return
+
+    last_attempt = task.request.retries >= task.max_retries
+    try:
+        retry_ids = send(payload, ids, broadcast_id=broadcast_id, last_attempt=last_attempt)
+    except Exception:
+        if last_attempt:
+            _finish_push_chunk(kind, done_key, broadcast_id, failed=len(ids))
+        raise
+
+    if retry_ids and not last_attempt:
+        raise task.retry(
+            args=[broadcast_id, chunk_no, payload, retry_ids],
+            countdown=PUSH_CHUNK_RETRY_COUNTDOWN * (2 ** task.request.retries),
+        )
+    _finish_push_chunk(kind, done_key, broadcast_id)
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=30, max_retries=4, acks_late=True)
+def send_webpush_chunk_task(self, broadcast_id: str, chunk_no: int, payload: dict, sub_ids: list[int]):
+    from core.utils.push.push import send_webpush_chunk
+    _run_push_chunk(self, "web", send_webpush_chunk, broadcast_id, chunk_no, payload, sub_ids)
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=30, max_retries=4, acks_late=True)
+def send_native_chunk_task(self, broadcast_id: str, chunk_no: int, payload: dict, token_ids: list[int]):
+    from core.utils.push.push import send_native_chunk
+    _run_push_chunk(self, "native", send_native_chunk, broadcast_id, chunk_no, payload, token_ids)
@@ -4,12 +4,13 @@ from django.views.generic import RedirectView
 from django.conf import settings
 
 from core.views.home import home
-from core.views.roster import rooster
+from core.views.roster import rooster, rooster_previews
+from core.views.previews import pdf_preview_zoom
 from core.views.voorraad import medications_view, email_voorraad_html, export_voorraad_html
 from core.views.nazendingen import nazendingen_view, medications_search_api, export_nazendingen_pdf, email_nazendingen_pdf
 from core.views.news import news, news_media
 from core.views.policies import policies, policies_media
-from core.views.admin import admin_dashboard, admin_users, admin_groups, admin_orgs, group_delete, user_update, user_delete, org_delete, org_update, admin_afdelingen, delete_afdeling, afdeling_update, admin_taken,  location_update, task_update, delete_location, delete_task, admin_functies, functie_update, delete_functie, admin_bezorgen, dagdeel_update, user_resend_invite
+from core.views.admin import admin_dashboard, admin_users, admin_groups, admin_orgs, group_delete, user_update, user_delete, org_delete, org_update, admin_afdelingen, delete_afdeling, afdeling_update, admin_taken,  location_update, task_update, delete_location, delete_task, admin_functies, functie_update, delete_functie, admin_bezorgen, dagdeel_update, user_resend_invite, push_metrics_api
 from core.views.profiel import profiel_index, avatar_upload, avatar_remove, profiel_update_settings
 from core.views.twofa import logout_view, kiosk_login_view
 from core.views.mijnbeschikbaarheid import mijnbeschikbaarheid_view
@@ -88,6 +89,8 @@ urlpatterns = [
     path("agenda/", agenda_views.agenda, name="agenda"),
 
     path("rooster/", rooster, name="rooster"),
+    path("rooster/previews/", rooster_previews, name="rooster_previews"),
+    path("previews/zoom/", pdf_preview_zoom, name="pdf_preview_zoom"),
 
     path("beschikbaarheid/", mijnbeschikbaarheid_view, name="mijnbeschikbaarheid"),
     path("personeel/teamdashboard/", personeelsdashboard_view, name="beschikbaarheidpersoneel"),
@@ -183,6 +186,7 @@ urlpatterns = [
     path("beheer/taken/", admin_taken, name="admin_taken"),
     path("beheer/functies/", admin_functies, name="admin_functies"),
     path("beheer/bezorgen/", admin_bezorgen, name="admin_bezorgen"),
+    path("beheer/push-metrics/", push_metrics_api, name="push_metrics_api"),
     # Acties (Delete/Update)
     path("beheer/group/<int:group_id>/delete/", group_delete, name="group_delete"),
     path("beheer/user/<int:user_id>/update/", user_update, name="user_update"),
@@ -0,0 +1,197 @@
+# core/utils/beat/roster.py
+"""
+Rooster housekeeping (beat), buiten de request-flow van de roosterpagina.
+
+- Weken buiten het venster [huidige week .. +ROSTER_WEEKS_AHEAD]: PDF + previews weg.
+  In PROD via één gepagineerde S3 LIST per root en BatchDeleter (DeleteObjects, 1000 keys per call).
+- Blob-roosters van verlopen weken: owner vrijgeven (de blob-sweep ruimt op).
+- Oude PDF's in een weekmap zonder RosterWeek: alsnog registreren + previews renderen,
+  zodat de view alleen RosterWeek hoeft te lezen.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from core.models import RosterWeek
+from core.utils.storage_batch import BatchDeleter
+
+
+def _monday_of_week(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def _window(today: date) -> tuple[date, dict[str, date]]:
+    """
+    (min_monday, {"weekNN": monday}) voor het roostervenster.
+    """
+    from core.views.roster import ROSTER_WEEKS_AHEAD, _week_slug_from_monday
+
+    min_monday = _monday_of_week(today)
+    weeks = {}
+    for i in range(ROSTER_WEEKS_AHEAD + 1):
+        monday = min_monday + timedelta(weeks=i)
+        weeks[_week_slug_from_monday(monday)] = monday
+    return min_monday, weeks
+
+
+def _pick_roster_pdf(names: Iterable[str]) -> Optional[str]:
+    # zelfde keuze als de oude view: nieuwste rooster.<hash>.pdf, anders legacy rooster.pdf
+    names = set(names)
+    hashed = sorted(n for n in names if n.startswith("rooster.") and n.endswith(".pdf") and n != "rooster.pdf")
+    if hashed:
+        return hashed[-1]
+    return "rooster.pdf" if "rooster.pdf" in names else None
+
+
+def _release_expired_blobs(min_monday: date) -> int:
+    from core.utils.blobs import BLOB_PREFIX, release_blob
+    from core.views.roster import _roster_owner
+
+    released = 0
+    for rw in RosterWeek.objects.filter(monday__lt=min_monday, file_path__startswith=BLOB_PREFIX):
+        release_blob(rw.file_hash, _roster_owner(rw.monday))
+        RosterWeek.objects.filter(id=rw.id).update(file_path="", file_hash="", n_pages=0)
+        released += 1
+    return released
+
+
+def _register_legacy_pdfs(pdfs: dict[str, str], weeks: dict[str, date]) -> int:
+    """
+    pdfs: {"weekNN": rel_path}. Maakt RosterWeek aan voor weken die er nog geen hebben.
+    """
+    from core.views._upload_helpers import DEFAULT_PREVIEW_FORMAT, hash_storage_file, queue_pdf_previews
+    from core.views.roster import _week_cache_dir
+
+    known = set(
+        RosterWeek.objects.filter(monday__in=[weeks[s] for s in pdfs]).exclude(file_hash="").values_list("monday", flat=True)
+    )
+
+    registered = 0
+    for slug, rel_path in pdfs.items():
+        monday = weeks[slug]
+        if monday in known:
+            continue
+        try:
+            h = hash_storage_file(rel_path)
+        except FileNotFoundError:
+            continue
+        RosterWeek.objects.update_or_create(
+            monday=monday,
+            defaults={
+                "week_slug": slug,
+                "file_path": rel_path,
+                "file_hash": h,
+                "n_pages": 0,
+                "preview_ext": DEFAULT_PREVIEW_FORMAT,
+            },
+        )
+        queue_pdf_previews(rel_path=rel_path, cache_root=_week_cache_dir(monday), file_hash=h)
+        registered += 1
+    return registered
+
+
+def _forget_manifests(cache_dirs: Iterable[tuple[str, str]]) -> None:
+    from core.views._helpers import CACHE_ROSTER_DIR
+    from core.views._upload_helpers import forget_preview_manifest
+
+    for slug, h in cache_dirs:
+        forget_preview_manifest(cache_root=CACHE_ROSTER_DIR / slug, file_hash=h)
+
+
+def _list_names(prefix: str) -> Iterable[str]:
+    # storage-relatieve namen onder prefix (S3 LIST, gepagineerd door boto3)
+    location = (default_storage.location or "").strip("/")
+    key_prefix = f"{location}/{prefix}/" if location else f"{prefix}/"
+    for obj in default_storage.bucket.objects.filter(Prefix=key_prefix):
+        yield obj.key[len(location) + 1:] if location else obj.key
+
+
+def _cleanup_local(allowed: dict[str, date], deleter: BatchDeleter) -> dict:
+    from core.views._helpers import ROSTER_DIR, CACHE_ROSTER_DIR
+    from core.views._upload_helpers import _media_relpath
+
+    removed_weeks = 0
+    forget = []
+    pdfs = {}
+
+    for week_dir in ROSTER_DIR.glob("week*"):
+        if not week_dir.is_dir():
+            continue
+        if week_dir.name in allowed:
+            name = _pick_roster_pdf(p.name for p in week_dir.iterdir())
+            if name:
+                pdfs[week_dir.name] = f"{_media_relpath(week_dir)}/{name}"
+            continue
+        deleter.add_prefix(_media_relpath(week_dir))
+        removed_weeks += 1
+
+    for cache_week_dir in CACHE_ROSTER_DIR.glob("week*"):
+        if not cache_week_dir.is_dir() or cache_week_dir.name in allowed:
+            continue
+        forget += [(cache_week_dir.name, p.name) for p in cache_week_dir.iterdir() if p.is_dir()]
+        deleter.add_prefix(_media_relpath(cache_week_dir))
+
+    _forget_manifests(forget)
+    return {"removed_weeks": removed_weeks, "pdfs": pdfs}
+
+
+def _cleanup_s3(allowed: dict[str, date], deleter: BatchDeleter) -> dict:
+    removed_weeks = set()
+    forget = set()
+    week_files: dict[str, list[str]] = {}
+
+    # rooster/weekNN/<pdf>: één gepagineerde LIST over alle weken
+    for name in _list_names("rooster"):
+        parts = name.split("/")[1:]
+        if len(parts) < 2 or not parts[0].startswith("week"):
+            continue
+        slug = parts[0]
+        if slug in allowed:
+            if len(parts) == 2:
+                week_files.setdefault(slug, []).append(parts[1])
+            continue
+        deleter.add(name)
+        removed_weeks.add(slug)
+
+    # cache/rooster/weekNN/<hash>/page_XXX.* + manifest.json
+    for name in _list_names("cache/rooster"):
+        parts = name.split("/")[2:]
+        if not parts or not parts[0].startswith("week") or parts[0] in allowed:
+            continue
+        deleter.add(name)
+        if len(parts) >= 3:
+            forget.add((parts[0], parts[1]))
+
+    _forget_manifests(forget)
+
+    pdfs = {}
+    for slug, names in week_files.items():
+        name = _pick_roster_pdf(names)
+        if name:
+            pdfs[slug] = f"rooster/{slug}/{name}"
+
+    return {"removed_weeks": len(removed_weeks), "pdfs": pdfs}
+
+
+def cleanup_roster_weeks(*, today: Optional[date] = None) -> dict:
+    """
+    Ruimt roosterweken buiten het venster op en registreert oude PDF's binnen het venster.
+    Return: dict met aantallen.
+    """
+    from core.views._upload_helpers import is_local_media
+
+    if today is None:
+        today = timezone.localdate()
+
+    min_monday, weeks = _window(today)
+
+    result = {"released_blobs": _release_expired_blobs(min_monday)}
+    with BatchDeleter() as deleter:
+        result.update(_cleanup_local(weeks, deleter) if is_local_media() else _cleanup_s3(weeks, deleter))
+    result["deleted_files"] = len(deleter.deleted)
+    result["registered_weeks"] = _register_legacy_pdfs(result.pop("pdfs"), weeks)
+    return result
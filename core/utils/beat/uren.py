@@ -19,6 +19,7 @@ from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
 from core.models import Dagdeel, Shift, UrenDag, UrenMaand, UrenRegel
+from core.utils.emails.attachments import content_sha256
 
 
 @dataclass(frozen=True)
@@ -27,6 +28,7 @@ class UrenExportResult:
     xlsx_storage_path: Optional[str]
     filename: Optional[str]
     row_count: int
+    xlsx_sha256: Optional[str] = None
 
 
 def _month_first(d: date) -> date:
@@ -591,4 +593,5 @@ def export_uren_month_to_storage(today: Optional[date] = None) -> UrenExportResu
         xlsx_storage_path=storage_path,
         filename=filename,
         row_count=row_count,
+        xlsx_sha256=content_sha256(xlsx_bytes),
     )
@@ -0,0 +1,167 @@
+# core/utils/blobs.py
+"""
+Content-addressed blob store voor uploads (nieuws, werkafspraken, rooster).
+
+- Eén bestand per hash onder media/blobs/, previews onder cache/blobs/<hash>/.
+  Identieke uploads worden dus één keer opgeslagen en één keer gerenderd.
+- MediaBlob houdt per hash de owners + ref_count bij.
+- Verwijderen = release; de beat-sweep ruimt blobs zonder refs in één batch op.
+
+Oude records (bestanden buiten blobs/) hebben geen MediaBlob; daarvoor blijven
+de bestaande per-feature delete paden gelden.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import MediaBlob
+from core.utils.storage_batch import BatchDeleter
+from core.views._upload_helpers import (
+    save_upload_with_hash,
+    delete_pdf_previews,
+    _storage_exists,
+    DEFAULT_WEBP_LOSSLESS,
+    DEFAULT_WEBP_QUALITY,
+    DEFAULT_WEBP_METHOD,
+)
+
+BLOB_DIR = Path(settings.MEDIA_ROOT) / "blobs"
+CACHE_BLOB_DIR = Path(settings.CACHE_DIR) / "blobs"
+BLOB_PREFIX = "blobs/"
+
+# Net geüploade blobs krijgen pas na de create van hun owner een ref;
+# de sweep laat blobs zonder refs daarom eerst even liggen.
+BLOB_GC_GRACE = timedelta(hours=1)
+
+
+def is_blob_path(rel_path: str) -> bool:
+    return bool(rel_path) and rel_path.startswith(BLOB_PREFIX)
+
+
+def preview_cache_root(rel_path: str, legacy_root: Path) -> Path:
+    """
+    Cache root voor de previews van een bestand: gedeeld voor blobs,
+    per feature (legacy_root) voor oude uploads.
+    """
+    return CACHE_BLOB_DIR if is_blob_path(rel_path) else legacy_root
+
+
+def store_blob(
+    uploaded_file,
+    *,
+    allowed_exts=(".pdf", ".png", ".jpg", ".jpeg", ".webp"),
+    convert_images_to_webp: bool = True,
+    webp_lossless: bool = DEFAULT_WEBP_LOSSLESS,
+    webp_quality: int = DEFAULT_WEBP_QUALITY,
+    webp_method: int = DEFAULT_WEBP_METHOD,
+) -> MediaBlob:
+    """
+    Slaat een upload content-addressed op en registreert de blob (nog zonder owner).
+    Bestaat de hash al, dan wordt er niets geschreven.
+
+    De rij wordt gelockt: een lopende sweep van dezelfde hash (die het bestand
+    verwijdert terwijl hij de rij vasthoudt) is dan klaar, en zonder rij wordt het
+    bestand opnieuw geschreven als het inmiddels weg is.
+    """
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+
+    save_kwargs = dict(
+        target_dir=BLOB_DIR,
+        base_name="blob",
+        allowed_exts=allowed_exts,
+        clear_existing=False,
+        convert_images_to_webp=convert_images_to_webp,
+        webp_lossless=webp_lossless,
+        webp_quality=webp_quality,
+        webp_method=webp_method,
+        skip_if_exists=True,
+    )
+    rel_path, h = save_upload_with_hash(uploaded_file, **save_kwargs)
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(file_hash=h).first()
+        if blob is not None:
+            # updated_at verversen zodat de volgende sweep deze blob niet meeneemt
+            blob.save(update_fields=["updated_at"])
+            return blob
+
+        # geen rij: een sweep kan het bestand na de check hierboven verwijderd hebben
+        if not _storage_exists(rel_path):
+            rel_path, h = save_upload_with_hash(uploaded_file, **save_kwargs)
+        blob, _created = MediaBlob.objects.get_or_create(
+            file_hash=h,
+            defaults={"file_path": rel_path, "size": getattr(uploaded_file, "size", 0) or 0},
+        )
+    return blob
+
+
+def acquire_blob(file_hash: str, owner: str) -> None:
+    """
+    Registreer owner (bv. "news:12") op de blob. Idempotent.
+    """
+    if not file_hash:
+        return
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(file_hash=file_hash).first()
+        if blob is None or owner in blob.owners:
+            return
+        blob.owners = [*blob.owners, owner]
+        blob.ref_count = len(blob.owners)
+        blob.save(update_fields=["owners", "ref_count", "updated_at"])
+
+
+def release_blob(file_hash: Optional[str], owner: str) -> bool:
+    """
+    Haal owner van de blob af. Het bestand blijft staan tot de sweep.
+
+    Return: True als de hash een geregistreerde blob is, False voor oude
+    (niet-blob) bestanden; dan moet de caller zelf opruimen.
+    """
+    if not file_hash:
+        return False
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(file_hash=file_hash).first()
+        if blob is None:
+            return False
+        if owner in blob.owners:
+            blob.owners = [o for o in blob.owners if o != owner]
+            blob.ref_count = len(blob.owners)
+            blob.save(update_fields=["owners", "ref_count", "updated_at"])
+    return True
+
+
+def sweep_unreferenced_blobs(*, grace: timedelta = BLOB_GC_GRACE) -> int:
+    """
+    Verwijdert alle blobs zonder refs (ouder dan grace): eerst de bestanden +
+    previews, dan de rijen, alles terwijl de rijen gelockt zijn. Een store_blob of
+    acquire_blob van dezelfde hash wacht daardoor tot de sweep klaar is en ziet dan
+    geen rij meer (store_blob schrijft het bestand opnieuw).
+    Eén sweep i.p.v. een referentie-check per delete.
+    Returns number of deleted blobs.
+    """
+    cutoff = timezone.now() - grace
+
+    with transaction.atomic():
+        blobs = list(
+            MediaBlob.objects.select_for_update(skip_locked=True)
+            .filter(ref_count=0, updated_at__lt=cutoff)
+        )
+        if not blobs:
+            return 0
+
+        # alle bestanden + previews samen in batch deletes
+        with BatchDeleter() as d:
+            for blob in blobs:
+                d.add(blob.file_path)
+                if blob.is_pdf:
+                    delete_pdf_previews(cache_root=CACHE_BLOB_DIR, file_hash=blob.file_hash, deleter=d)
+
+        MediaBlob.objects.filter(id__in=[b.id for b in blobs]).delete()
+
+    return len(blobs)
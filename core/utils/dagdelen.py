@@ -20,32 +20,9 @@ FALLBACK = {
     "evening":    {"label": "Vooravond", "start": time(18, 0), "end": time(20, 0)},
 }
 
-def get_period_meta(period: str) -> Dict:
-    """
-    Return:
-      {
-        "label": "Ochtend/Middag/Vooravond",
-        "start": time,
-        "end": time,
-        "time_str": "HH:MM - HH:MM",
-        "dagdeel_code": "...",
-      }
-    """
-    dagdeel_code = PERIOD_TO_DAGDEEL_CODE.get(period)
-
-    if not dagdeel_code:
-        fb = FALLBACK.get(period, {"label": period, "start": time(9, 0), "end": time(13, 0)})
-        return {
-            "label": fb["label"],
-            "start": fb["start"],
-            "end": fb["end"],
-            "time_str": f"{fb['start'].strftime('%H:%M')} - {fb['end'].strftime('%H:%M')}",
-            "dagdeel_code": None,
-        }
-
-    dd = Dagdeel.objects.filter(code=dagdeel_code).only("start_time", "end_time", "name", "code").first()
+def _build_meta(period: str, dagdeel_code, dd) -> Dict:
     if not dd or not dd.start_time or not dd.end_time:
-        fb = FALLBACK.get(period)
+        fb = FALLBACK.get(period, {"label": period, "start": time(9, 0), "end": time(13, 0)})
         return {
             "label": fb["label"],
             "start": fb["start"],
@@ -64,3 +41,36 @@ def get_period_meta(period: str) -> Dict:
         "time_str": f"{start_t.strftime('%H:%M')} - {end_t.strftime('%H:%M')}",
         "dagdeel_code": dagdeel_code,
     }
+
+
+def get_period_meta(period: str) -> Dict:
+    """
+    Return:
+      {
+        "label": "Ochtend/Middag/Vooravond",
+        "start": time,
+        "end": time,
+        "time_str": "HH:MM - HH:MM",
+        "dagdeel_code": "...",
+      }
+    """
+    dagdeel_code = PERIOD_TO_DAGDEEL_CODE.get(period)
+    if not dagdeel_code:
+        return _build_meta(period, None, None)
+
+    dd = Dagdeel.objects.filter(code=dagdeel_code).only("start_time", "end_time", "name", "code").first()
+    return _build_meta(period, dagdeel_code, dd)
+
+
+def get_period_metas() -> Dict[str, Dict]:
+    """
+    Zelfde als get_period_meta, maar voor alle Shift.periods in één query (voor loops over shifts).
+    """
+    dagdelen = {
+        dd.code: dd
+        for dd in Dagdeel.objects.filter(code__in=PERIOD_TO_DAGDEEL_CODE.values()).only("start_time", "end_time", "name", "code")
+    }
+    return {
+        period: _build_meta(period, code, dagdelen.get(code))
+        for period, code in PERIOD_TO_DAGDEEL_CODE.items()
+    }
@@ -0,0 +1,86 @@
+# core/utils/emails/attachments.py
+"""
+Worker-lokale cache voor mailbijlagen uit default_storage (lokaal of S3).
+
+Dezelfde PDF/HTML gaat vaak naar alle apotheken: zonder cache haalt elke job het
+bestand opnieuw uit S3. Hier blijft de inhoud per worker-proces bewaard (LRU,
+begrensd op ATTACHMENT_CACHE_MAX_BYTES), gesleuteld op (pad, versie):
+
+- versie = sha256 van de inhoud als de producer die meegeeft (geen S3-request bij een hit);
+- anders de modified time uit storage (bij S3 een HEAD i.p.v. een GET).
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ATTACHMENT_CACHE_MAX_ITEM_BYTES = 16 * 1024 * 1024   # grotere bestanden niet cachen
+
+_cache: "OrderedDict[tuple[str, str], bytes]" = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+
+def content_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _get(key):
+    with _lock:
+        content = _cache.get(key)
+        if content is not None:
+            _cache.move_to_end(key)
+        return content
+
+
+def _put(key, content: bytes) -> None:
+    global _cache_bytes
+    if len(content) > ATTACHMENT_CACHE_MAX_ITEM_BYTES:
+        return
+    with _lock:
+        old = _cache.pop(key, None)
+        if old is not None:
+            _cache_bytes -= len(old)
+        _cache[key] = content
+        _cache_bytes += len(content)
+        while _cache_bytes > ATTACHMENT_CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def clear_attachment_cache() -> None:
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def read_attachment(path: str, sha256: str | None = None) -> bytes:
+    """
+    Inhoud van een bestand in default_storage, uit de cache als die versie er al is.
+    """
+    if sha256:
+        version = f"sha256:{sha256}"
+    else:
+        version = f"mtime:{default_storage.get_modified_time(path).isoformat()}"
+
+    key = (path, version)
+    content = _get(key)
+    if content is not None:
+        return content
+
+    with default_storage.open(path, "rb") as f:
+        content = f.read()
+
+    if sha256 and content_sha256(content) != sha256:
+        # bestand is na het aanmaken van de job overschreven: versturen wat er nu staat
+        logger.warning("Bijlage %s wijkt af van de verwachte sha256, niet gecachet", path)
+        return content
+
+    _put(key, content)
+    return content
@@ -5,7 +5,7 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from email.mime.image import MIMEImage
 
-def send_birthday_email(to_email, first_name):
+def send_birthday_email(to_email, first_name, connection=None):
     """
     Verstuurt een verjaardagsmail naar een medewerker.
     """
@@ -55,6 +55,7 @@ def send_birthday_email(to_email, first_name):
         body=text_content,
         from_email=from_email,
         to=[to_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
@@ -39,6 +39,7 @@ def send_diensten_overzicht_email(
     week_end: date,
     rows: list[dict],
     location_rows: list[dict],
+    connection=None,
 ):
     """
     rows verwacht:
@@ -239,6 +240,7 @@ def send_diensten_overzicht_email(
         body=text_content,
         from_email=from_email,
         to=[to_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
@@ -4,7 +4,7 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from email.mime.image import MIMEImage
 
-def send_laatste_pot_email(to_email, first_name, item_naam):
+def send_laatste_pot_email(to_email, first_name, item_naam, connection=None):
     """
     Verstuurt een e-mail naar een medewerker wanneer een laatste pot is aangebroken.
     """
@@ -63,6 +63,7 @@ def send_laatste_pot_email(to_email, first_name, item_naam):
         body=text_content,
         from_email=from_email,
         to=[to_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
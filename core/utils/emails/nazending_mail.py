@@ -5,7 +5,7 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from email.mime.image import MIMEImage
 
-def send_single_nazending_email(to_email, name, pdf_content, filename, logo_path, contact_email):
+def send_single_nazending_email(to_email, name, pdf_content, filename, logo_path, contact_email, connection=None):
     """
     Verstuurt 1 email naar 1 apotheek met PDF bijlage.
     """
@@ -67,6 +67,7 @@ def send_single_nazending_email(to_email, name, pdf_content, filename, logo_path
         from_email=from_email_formatted,
         to=[to_email],
         reply_to=[contact_email],  # Zorgt dat replies altijd bij het juiste team komen
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
@@ -14,6 +14,7 @@ def send_single_no_delivery_email(
     contact_email: str,
     week: int,
     dag_label: str,
+    connection=None,
 ):
     subject = f"Niet-leverlijst (week {week} - {dag_label}) - Apotheek Jansen"
     from_email_formatted = f"Apotheek Jansen <{contact_email}>"
@@ -64,6 +65,7 @@ def send_single_no_delivery_email(
         from_email=from_email_formatted,
         to=[to_email],
         reply_to=[contact_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
@@ -14,6 +14,7 @@ def send_single_omzettingslijst_email(
     contact_email: str,
     week: int,
     dag_label: str,
+    connection=None,
 ):
     subject = f"Omzettingslijst (week {week} - {dag_label}) - Apotheek Jansen"
     from_email_formatted = f"Apotheek Jansen <{contact_email}>"
@@ -65,6 +66,7 @@ def send_single_omzettingslijst_email(
         from_email=from_email_formatted,
         to=[to_email],
         reply_to=[contact_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
@@ -0,0 +1,68 @@
+# core/utils/emails/smtp.py
+"""
+Eén persistente SMTP verbinding per worker-proces, voor batch jobs in email_dispatcher_task.
+
+Django opent bij msg.send() zonder connection telkens een nieuwe SMTP/TLS sessie.
+Hier blijft de verbinding open tussen berichten (en batches). Na SMTP_IDLE_CHECK_SECONDS
+zonder verkeer eerst een NOOP: de server kan een idle verbinding dichtgooien, en een
+kapotte verbinding mag niet als "adres faalt" (-> fallback adres) aangezien worden.
+"""
+import logging
+import os
+import time
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+SMTP_IDLE_CHECK_SECONDS = 30
+
+# per proces (na fork van de celery worker opnieuw opbouwen)
+_state = {"pid": None, "conn": None, "used": 0.0}
+
+
+def _is_alive(conn) -> bool:
+    smtp = getattr(conn, "connection", None)
+    if smtp is None:
+        # geen SMTP backend (console/locmem) of nog niet geopend
+        return not hasattr(conn, "connection")
+    try:
+        return smtp.noop()[0] == 250
+    except Exception:
+        return False
+
+
+def close_smtp_connection() -> None:
+    conn = _state["conn"]
+    _state.update(conn=None, used=0.0)
+    if conn is None or _state["pid"] != os.getpid():
+        return
+    try:
+        conn.close()
+    except Exception:
+        logger.debug("SMTP verbinding sluiten mislukt", exc_info=True)
+
+
+def get_smtp_connection():
+    """
+    Open (of hergebruikte) verbinding van dit proces. Na een fout: close_smtp_connection()
+    aanroepen, de volgende aanroep bouwt dan een nieuwe op.
+    """
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        # socket van het parent proces niet gebruiken (en ook niet sluiten)
+        _state.update(pid=pid, conn=None, used=0.0)
+
+    conn = _state["conn"]
+    now = time.monotonic()
+    if conn is not None and now - _state["used"] > SMTP_IDLE_CHECK_SECONDS and not _is_alive(conn):
+        close_smtp_connection()
+        conn = None
+
+    if conn is None:
+        conn = get_connection(fail_silently=False)
+        conn.open()
+        _state["conn"] = conn
+
+    _state["used"] = now
+    return conn
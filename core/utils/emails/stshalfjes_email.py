@@ -25,6 +25,7 @@ def send_single_stshalfjes_email(
     filename: str,
     logo_path: str,
     contact_email: str,
+    connection=None,
 ):
     """
     Verstuurt 1 e-mail naar 1 apotheek met PDF bijlage:
@@ -81,6 +82,7 @@ def send_single_stshalfjes_email(
         from_email=from_email_formatted,
         to=[to_email],
         reply_to=[contact_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
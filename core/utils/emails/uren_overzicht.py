@@ -19,6 +19,7 @@ def send_uren_overzicht_email(
     filename: str,
     contact_email: str,
     logo_path: str | None = None,
+    connection=None,
 ):
     subject = f"Urenoverzicht {month_first.strftime('%Y-%m')} - Apotheek Jansen"
     from_email_formatted = contact_email
@@ -61,6 +62,7 @@ def send_uren_overzicht_email(
         from_email=from_email_formatted,
         to=[to_email],
         reply_to=[contact_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
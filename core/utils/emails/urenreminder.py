@@ -5,7 +5,7 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from email.mime.image import MIMEImage
 
-def send_uren_reminder_email(to_email, first_name, reminder_date):
+def send_uren_reminder_email(to_email, first_name, reminder_date, connection=None):
     """
     Verstuur een herinnering per e-mail naar de gebruiker om hun uren door te geven.
     """
@@ -66,6 +66,7 @@ def send_uren_reminder_email(to_email, first_name, reminder_date):
         body=text_content,
         from_email=from_email,
         to=[to_email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
 
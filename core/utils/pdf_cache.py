@@ -0,0 +1,174 @@
+# core/utils/pdf_cache.py
+"""
+Cache van gerenderde export-PDF's, content-addressed op de uiteindelijke HTML.
+
+- Sleutel: sha256 van (stylesheet versie, WeasyPrint versie, base_url, HTML). De base_url
+  verschilt tussen views (request host) en mail tasks (SITE_DOMAIN). Dezelfde lijst
+  (preview download, daarna mail naar N apotheken) wordt zo één keer gerenderd.
+- Bytes alleen in Redis (pdfcache:pdf:<sleutel>, met TTL), nooit in de (publieke)
+  media bucket: exports bevatten patiëntgegevens. Index ook in Redis
+  (sorted set: sleutel -> laatste gebruik, hash: sleutel -> grootte).
+- Verloopt na PDF_CACHE_TTL seconden zonder gebruik; boven PDF_CACHE_MAX_BYTES
+  gaan de langst niet gebruikte PDF's eruit (bij het opslaan en in de beat-sweep).
+- Ook medicatiebeoordelingen (patiënt en afdeling) gaan door de cache: de bytes staan
+  alleen in Redis en verlopen vanzelf, er blijft niets achter in de bucket.
+
+Fouten in de cache worden gelogd en nooit doorgegeven: dan wordt er gewoon gerenderd.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.utils.pdf_export import PDF_EXPORT_CSS_VERSION
+from core.utils.storage_batch import BatchDeleter
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_KEY = "pdfcache:pdf:{key}"
+PDF_CACHE_INDEX_KEY = "pdfcache:index"
+PDF_CACHE_SIZES_KEY = "pdfcache:sizes"
+
+# Vroeger stonden de PDF's in de media bucket; purge_legacy_pdf_cache_dir ruimt die op.
+PDF_CACHE_LEGACY_DIR = "cache/pdf_exports"
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "PDF_CACHE_TTL", 60 * 60 * 24))
+
+
+def _max_bytes() -> int:
+    return int(getattr(settings, "PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def _redis_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _keys() -> tuple[str, str]:
+    return cache.make_key(PDF_CACHE_INDEX_KEY), cache.make_key(PDF_CACHE_SIZES_KEY)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _pdf_key(key: str) -> str:
+    return cache.make_key(PDF_CACHE_KEY.format(key=key))
+
+
+@lru_cache(maxsize=1)
+def _weasyprint_version() -> str:
+    # zonder weasyprint te importeren (de web-container rendert zelf niet altijd)
+    try:
+        return version("weasyprint")
+    except PackageNotFoundError:
+        return ""
+
+
+def pdf_cache_key(html: str, *, base_url: str) -> str:
+    # base_url lost relatieve urls (afbeeldingen, logo) op, dus hoort bij de inhoud van de PDF
+    digest = hashlib.sha256()
+    digest.update(f"{PDF_EXPORT_CSS_VERSION}|{_weasyprint_version()}|{base_url}|".encode())
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_cached_pdf(key: str) -> bytes | None:
+    try:
+        r = _redis_connection()
+        index_key, sizes_key = _keys()
+        last_used = r.zscore(index_key, key)
+        now = time.time()
+        if last_used is None or now - float(last_used) > _ttl():
+            return None
+
+        pdf = r.get(_pdf_key(key))
+        if not pdf:
+            pipe = r.pipeline()
+            pipe.zrem(index_key, key)
+            pipe.hdel(sizes_key, key)
+            pipe.execute()
+            return None
+
+        pipe = r.pipeline()
+        pipe.zadd(index_key, {key: now})
+        pipe.expire(_pdf_key(key), _ttl())
+        pipe.execute()
+        return pdf
+    except Exception:
+        logger.warning("PDF cache: lezen %s mislukt", key, exc_info=True)
+        return None
+
+
+def store_cached_pdf(key: str, pdf: bytes) -> None:
+    if not pdf or len(pdf) > _max_bytes():
+        return
+    try:
+        r = _redis_connection()
+        index_key, sizes_key = _keys()
+        pipe = r.pipeline()
+        pipe.set(_pdf_key(key), pdf, ex=_ttl())
+        pipe.zadd(index_key, {key: time.time()})
+        pipe.hset(sizes_key, key, len(pdf))
+        pipe.execute()
+    except Exception:
+        logger.warning("PDF cache: opslaan %s mislukt", key, exc_info=True)
+        return
+
+    try:
+        evict_pdf_cache(expired=False)
+    except Exception:
+        logger.warning("PDF cache: opruimen mislukt", exc_info=True)
+
+
+def evict_pdf_cache(*, expired: bool = True) -> int:
+    """
+    Verwijdert verlopen PDF's (expired=True) en daarna de langst niet gebruikte
+    tot de totale grootte weer onder PDF_CACHE_MAX_BYTES zit.
+    Returns aantal verwijderde PDF's.
+    """
+    r = _redis_connection()
+    index_key, sizes_key = _keys()
+
+    victims = []
+    if expired:
+        victims = [_decode(k) for k in r.zrangebyscore(index_key, "-inf", time.time() - _ttl())]
+
+    sizes = {_decode(k): int(v) for k, v in r.hgetall(sizes_key).items()}
+    total = sum(size for k, size in sizes.items() if k not in victims)
+    if total > _max_bytes():
+        skip = set(victims)
+        for k in (_decode(k) for k in r.zrange(index_key, 0, -1)):
+            if total <= _max_bytes():
+                break
+            if k in skip:
+                continue
+            victims.append(k)
+            total -= sizes.get(k, 0)
+
+    if not victims:
+        return 0
+
+    pipe = r.pipeline()
+    pipe.zrem(index_key, *victims)
+    pipe.hdel(sizes_key, *victims)
+    pipe.delete(*[_pdf_key(k) for k in victims])
+    pipe.execute()
+    return len(victims)
+
+
+def purge_legacy_pdf_cache_dir() -> int:
+    """
+    Verwijdert PDF's die nog onder PDF_CACHE_LEGACY_DIR in de media bucket staan.
+    Returns aantal verwijderde bestanden (na de eerste keer 0, één LIST).
+    """
+    with BatchDeleter() as d:
+        return d.add_prefix(PDF_CACHE_LEGACY_DIR)
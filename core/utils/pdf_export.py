@@ -0,0 +1,261 @@
+# core/utils/pdf_export.py
+"""
+HTML -> PDF (WeasyPrint) voor de exports (medicatiebeoordeling, nazendingen,
+STS-halfjes, no-delivery, omzettingslijst).
+
+- De export-stylesheet en de FontConfiguration worden één keer per proces opgebouwd
+  en daarna hergebruikt (warm_pdf_renderer() doet dat vooraf in de pdf workers).
+- render_pdf(): in een webrequest, met settings.PDF_RENDER_SERVICE aan, gaat de layout
+  naar de "pdf" queue (render_pdf_task) en wacht de view via Redis op de bytes, max
+  PDF_RENDER_TIMEOUT seconden (ruim binnen de gunicorn timeout). Geen antwoord of een
+  fout in de worker: PdfRenderUnavailable (503 via core.middleware), niet alsnog zelf
+  renderen. De job wordt dan afgemeld, zodat de worker hem overslaat of het resultaat
+  niet meer neerzet. Alleen als de queue zelf onbereikbaar is wordt er lokaal gerenderd.
+  Binnen een celery task wordt altijd lokaal gerenderd.
+- Eerst wordt de PDF cache bekeken (core/utils/pdf_cache.py): dezelfde HTML wordt
+  maar één keer gerenderd.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDER_RESULT_KEY = "pdfrender:{job_id}"
+PDF_RENDER_CANCEL_KEY = "pdfrender:{job_id}:cancel"
+PDF_RENDER_RESULT_TTL = 120
+
+
+class PdfRenderUnavailable(RuntimeError):
+    """
+    De pdf workers leverden niet (op tijd); de view geeft een 503 i.p.v. zelf te renderen.
+    """
+
+PDF_EXPORT_CSS = """
+    :root { --accent: #062A5E; }  /* donkerder blauw */
+
+    @page { size: A4; margin: 14mm; }
+
+    body {
+      font-family: Arial, sans-serif;
+      font-size: 11pt;
+      color: #111;
+      background: #fff;
+    }
+
+    .pdf-header {
+      display: flex;
+      align-items: center;
+      gap: 16px;
+      border-bottom: 2px solid var(--accent);
+      padding-bottom: 12px;
+      margin-bottom: 14px;
+    }
+
+    .pdf-logo {
+      width: 100px;
+      height: auto;
+      object-fit: contain;
+    }
+
+    .pdf-title {
+      font-size: 20pt;
+      font-weight: 700;
+      margin: 0;
+    }
+
+    .pdf-submeta {
+      margin-top: 6px;
+      font-size: 10pt;
+      color: #444;
+      line-height: 1.4;
+    }
+
+    .prepared-by {
+      margin-top: 6px;
+      font-size: 10pt;
+    }
+
+    .section-title {
+      font-size: 13pt;
+      font-weight: 700;
+      margin: 20px 0 10px;
+      color: var(--accent);
+    }
+
+    .group-title {
+      font-size: 11pt;
+      font-weight: 700;
+      margin-top: 14px;
+      color: var(--accent);
+    }
+
+    table {
+      width: 100%;
+      border-collapse: collapse;
+      margin-top: 8px;
+    }
+
+    th, td {
+      border: 1px solid #ddd;
+      padding: 7px 8px;
+      vertical-align: top;
+    }
+
+    th {
+      background: #f4f6fb;
+      font-weight: 700;
+    }
+
+    .muted { color: #666; }
+
+    .comment-box {
+      margin-top: 10px;
+      padding: 10px;
+      border-left: 4px solid var(--accent);
+      background: #f9faff;
+    }
+
+    .comment-label {
+      font-weight: 700;
+      margin-bottom: 4px;
+    }
+
+    .divider {
+      border-top: 1px solid #eee;
+      margin: 18px 0;
+    }
+
+    .toc-link {
+      color: var(--accent);
+      text-decoration: none;
+    }
+
+    /* Nieuw: elke patiënt op nieuwe pagina in afdeling export */
+    .patient-page {
+      page-break-before: always;
+    }
+    .patient-page.first-patient {
+      page-break-before: auto;
+    }
+"""
+
+# Verandert mee met de stylesheet (bijv. voor caches van gerenderde PDF's)
+PDF_EXPORT_CSS_VERSION = hashlib.sha256(PDF_EXPORT_CSS.encode()).hexdigest()[:12]
+
+# per proces: gecompileerde stylesheet + font config
+_state: dict = {"css": None, "font_config": None}
+
+
+def _renderer():
+    if _state["css"] is None:
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = FontConfiguration()
+        _state["css"] = CSS(string=PDF_EXPORT_CSS, font_config=font_config)
+        _state["font_config"] = font_config
+    return _state["css"], _state["font_config"]
+
+
+def warm_pdf_renderer() -> None:
+    """
+    Stylesheet compileren en fonts laden vóór het eerste echte request.
+    """
+    try:
+        render_pdf_local("<p>warm</p>", base_url="")
+    except Exception:
+        logger.warning("PDF renderer niet warm gemaakt", exc_info=True)
+
+
+def render_pdf_local(html: str, *, base_url: str) -> bytes:
+    from weasyprint import HTML
+
+    css, font_config = _renderer()
+    return HTML(string=html, base_url=base_url).write_pdf(stylesheets=[css], font_config=font_config)
+
+
+def _redis_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def result_key(job_id: str) -> str:
+    return cache.make_key(PDF_RENDER_RESULT_KEY.format(job_id=job_id))
+
+
+def cancel_key(job_id: str) -> str:
+    return cache.make_key(PDF_RENDER_CANCEL_KEY.format(job_id=job_id))
+
+
+def _in_celery_task() -> bool:
+    from celery import current_task
+    return bool(current_task and current_task.request.id)
+
+
+def _abandon_render(r, job_id: str) -> None:
+    # worker slaat de job over (nog niet gestart) of zet het resultaat niet meer neer
+    try:
+        pipe = r.pipeline()
+        pipe.set(cancel_key(job_id), 1, ex=PDF_RENDER_RESULT_TTL)
+        pipe.delete(result_key(job_id))
+        pipe.execute()
+    except Exception:
+        logger.warning("PDF render %s niet afgemeld", job_id, exc_info=True)
+
+
+def _render_via_service(html: str, *, base_url: str) -> bytes | None:
+    """
+    None: de queue is niet bereikbaar (er is nog niet gewacht, lokaal renderen kan).
+    """
+    from core.tasks.pdf import render_pdf_task
+
+    timeout = int(getattr(settings, "PDF_RENDER_TIMEOUT", 25))
+    job_id = uuid.uuid4().hex
+    try:
+        r = _redis_connection()
+        render_pdf_task.apply_async(args=[job_id, html, base_url], queue="pdf", expires=timeout)
+    except Exception:
+        logger.warning("PDF render service niet bereikbaar, lokaal renderen", exc_info=True)
+        return None
+
+    try:
+        item = r.blpop(result_key(job_id), timeout=timeout)
+    except Exception as exc:
+        _abandon_render(r, job_id)
+        raise PdfRenderUnavailable(f"PDF render {job_id}: Redis fout") from exc
+
+    if item is None:
+        _abandon_render(r, job_id)
+        raise PdfRenderUnavailable(f"PDF render {job_id}: geen antwoord binnen {timeout}s")
+    if not item[1]:
+        # lege waarde = fout in de worker (die staat daar in de log)
+        raise PdfRenderUnavailable(f"PDF render {job_id}: fout in de pdf worker")
+    return item[1]
+
+
+def _render_uncached(html: str, *, base_url: str) -> bytes:
+    if getattr(settings, "PDF_RENDER_SERVICE", False) and not _in_celery_task():
+        pdf = _render_via_service(html, base_url=base_url)
+        if pdf is not None:
+            return pdf
+    return render_pdf_local(html, base_url=base_url)
+
+
+def render_pdf(html: str, *, base_url: str) -> bytes:
+    if not getattr(settings, "PDF_CACHE_ENABLED", True):
+        return _render_uncached(html, base_url=base_url)
+
+    from core.utils.pdf_cache import get_cached_pdf, pdf_cache_key, store_cached_pdf
+
+    key = pdf_cache_key(html, base_url=base_url)
+    pdf = get_cached_pdf(key)
+    if pdf is None:
+        pdf = _render_uncached(html, base_url=base_url)
+        store_cached_pdf(key, pdf)
+    return pdf
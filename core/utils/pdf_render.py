@@ -0,0 +1,244 @@
+# core/utils/pdf_render.py
+"""
+Rasteriseren + encoden van PDF pagina's (PyMuPDF + Pillow).
+
+Bewust zonder Django imports: de functies hieronder draaien ook in
+worker-processen van de process pool (spawn/forkserver), die alleen dit
+module importeren en het PDF document zelf openen.
+
+Een PDF bron is bytes of een pad; met een pad opent PyMuPDF het bestand zelf
+en leest het pagina's op aanvraag, zodat grote PDF's niet in het geheugen staan.
+"""
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from os import PathLike
+from typing import Iterable, Iterator, Union
+
+import fitz  # PyMuPDF
+from PIL import Image  # pillow
+
+PdfSource = Union[bytes, str, PathLike]
+
+
+def open_pdf(source: PdfSource):
+    """
+    fitz.Document voor bytes of een pad (pad: geen kopie in het geheugen).
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(str(source), filetype="pdf")
+
+
+def render_page_bytes(
+    page,
+    *,
+    dpi: int,
+    fmt: str,
+    webp_lossless: bool,
+    webp_quality: int,
+    webp_method: int,
+) -> bytes:
+    """
+    Rendert één fitz.Page naar PNG of WEBP bytes.
+    """
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    if fmt == "png":
+        return pix.tobytes("png")
+
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return _encode(img, fmt=fmt, webp_lossless=webp_lossless, webp_quality=webp_quality, webp_method=webp_method)
+
+
+def render_page_tiers(
+    page,
+    *,
+    tiers: dict[str, int],
+    fmt: str,
+    webp_lossless: bool,
+    webp_quality: int,
+    webp_method: int,
+    lqip_width: int = 0,
+) -> dict[str, bytes]:
+    """
+    Rendert één fitz.Page voor meerdere tiers ({"thumb": dpi, "screen": dpi}).
+    Eén rasterisatie op de hoogste dpi; kleinere tiers worden daaruit geschaald.
+    lqip_width > 0: ook een piepklein placeholder-plaatje onder de key "lqip".
+    """
+    top = max(tiers.values())
+    pix = page.get_pixmap(dpi=top, alpha=False)
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    out = {}
+    for name, dpi in tiers.items():
+        tier_img = img if dpi == top else img.resize(page_pixel_size(page, dpi), Image.LANCZOS)
+        out[name] = _encode(
+            tier_img,
+            fmt=fmt,
+            webp_lossless=webp_lossless,
+            webp_quality=webp_quality,
+            webp_method=webp_method,
+        )
+
+    if lqip_width > 0:
+        height = max(1, round(img.height * lqip_width / img.width))
+        out["lqip"] = _encode(
+            img.resize((lqip_width, height), Image.BILINEAR),
+            fmt=fmt,
+            webp_lossless=False,
+            webp_quality=30,
+            webp_method=webp_method,
+        )
+    return out
+
+
+def _encode(img, *, fmt: str, webp_lossless: bool, webp_quality: int, webp_method: int) -> bytes:
+    buf = BytesIO()
+    if fmt == "png":
+        img.save(buf, format="PNG")
+    else:
+        img.save(buf, format="WEBP", lossless=webp_lossless, quality=webp_quality, method=webp_method)
+    return buf.getvalue()
+
+
+def page_pixel_size(page, dpi: int) -> tuple[int, int]:
+    """
+    (width, height) in pixels van de render op deze dpi (gelijk aan get_pixmap).
+    """
+    rect = (page.rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    return rect.width, rect.height
+
+
+# ===== Page fingerprints =====
+# Hash van wat een pagina tekent: page dict + content streams + (recursief) alle
+# resources (fonts, images, XObjects). Object-nummers worden weggenormaliseerd,
+# zodat dezelfde pagina in een nieuw geëxporteerde PDF dezelfde fingerprint houdt.
+_REF_RE = re.compile(rb"(\d+) 0 R")
+# Terugverwijzingen naar de page tree/pagina zelf niet volgen (anders hash je het hele document)
+_BACKREF_RE = re.compile(rb"/(Parent|P|Dest|StructParents?|B)\s+(\d+ 0 R|\d+)")
+
+
+def _hash_text(doc, text: bytes, digest, seen: dict) -> None:
+    text = _BACKREF_RE.sub(b"", text)
+    digest.update(_REF_RE.sub(b"R", text))
+    for m in _REF_RE.finditer(text):
+        _hash_xref(doc, int(m.group(1)), digest, seen)
+
+
+def _hash_xref(doc, xref: int, digest, seen: dict) -> None:
+    if xref in seen:
+        # al gehasht: alleen de positie meenemen (cycli / gedeelde resources)
+        digest.update(b"#%d" % seen[xref])
+        return
+    seen[xref] = len(seen)
+
+    _hash_text(doc, doc.xref_object(xref, compressed=True).encode("latin-1", "replace"), digest, seen)
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref) or b"")
+
+
+def page_fingerprint(doc, index: int) -> str:
+    """
+    Fingerprint van pagina index: gelijk = zelfde render (bij dezelfde render-opties).
+    """
+    page = doc[index]
+    digest = hashlib.sha256()
+    digest.update(f"{tuple(page.rect)}|{page.rotation}".encode())
+
+    seen: dict = {}
+    _hash_xref(doc, page.xref, digest, seen)
+
+    # Geërfde /Resources uit de page tree
+    if doc.xref_get_key(page.xref, "Resources")[0] == "null":
+        xref = page.xref
+        while True:
+            kind, val = doc.xref_get_key(xref, "Parent")
+            if kind != "xref":
+                break
+            xref = int(val.split()[0])
+            kind, val = doc.xref_get_key(xref, "Resources")
+            if kind == "xref":
+                _hash_xref(doc, int(val.split()[0]), digest, seen)
+                break
+            if kind == "dict":
+                _hash_text(doc, val.encode("latin-1", "replace"), digest, seen)
+                break
+
+    return digest.hexdigest()[:16]
+
+
+# ===== Process pool workers =====
+# Elk worker-proces opent het document één keer (initializer) en rendert
+# daarna alleen nog pagina-indexen. Met een pad als bron gaat alleen het pad
+# over, niet de PDF bytes.
+_worker_doc = None
+_worker_opts: dict = {}
+
+
+def _worker_init(source: PdfSource, opts: dict) -> None:
+    global _worker_doc, _worker_opts
+    _worker_doc = open_pdf(source)
+    _worker_opts = opts
+
+
+def _render(page, opts: dict):
+    # met "tiers": dict[tier, bytes], anders bytes voor één dpi
+    if "tiers" in opts:
+        return render_page_tiers(page, **opts)
+    return render_page_bytes(page, **opts)
+
+
+def _worker_render(index: int):
+    return _render(_worker_doc[index], _worker_opts)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    # forkserver: geen fork van een (multi-threaded) celery/gunicorn proces, goedkoper dan spawn
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def iter_rendered_pages(
+    source: PdfSource,
+    indexes: Iterable[int],
+    *,
+    workers: int = 1,
+    **opts,
+) -> Iterator[tuple[int, object]]:
+    """
+    Yield (index, data) voor de gevraagde pagina's, in de volgorde van indexes.
+    data: bytes, of {tier: bytes} als opts een "tiers" dict bevat.
+
+    workers > 1: pagina's worden verdeeld over een process pool (alle cores).
+    Lukt dat niet (bijv. daemon-proces zonder kinderen, of een gecrashte worker),
+    dan worden de resterende pagina's gewoon serieel gerenderd.
+    """
+    indexes = list(indexes)
+    done: set[int] = set()
+
+    if workers > 1 and len(indexes) > 1:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(indexes)),
+                mp_context=_mp_context(),
+                initializer=_worker_init,
+                initargs=(source, opts),
+            ) as pool:
+                for index, data in zip(indexes, pool.map(_worker_render, indexes)):
+                    done.add(index)
+                    yield index, data
+        except (AssertionError, OSError, BrokenProcessPool):
+            pass
+
+    remaining = [i for i in indexes if i not in done]
+    if not remaining:
+        return
+
+    with open_pdf(source) as doc:
+        for index in remaining:
+            yield index, _render(doc[index], opts)
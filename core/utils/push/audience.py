@@ -0,0 +1,100 @@
+# core/utils/push/audience.py
+"""
+Gecachte push-audiences per (permission_key, wants_key).
+
+Een broadcast (rooster, nieuws, agenda, ...) is daarmee één cache read + versturen,
+i.p.v. alle users met profiel/prefs laden en in Python filteren.
+
+Invalidatie via één audience-versie in de cache key (PUSH_AUDIENCE_VER_KEY):
+- permissie-wijzigingen (zelfde signals als de perm-version bumps),
+- NotificationPreferences opgeslagen,
+- PushSubscription / NativePushToken aangemaakt of gewijzigd (signals) of verwijderd
+  (bump_push_audience_on_commit bij de delete zelf: geen post_delete, dan blijft
+  een bulk delete één DELETE zonder de rijen eerst op te halen),
+- is_active / superuser van een user gewijzigd.
+Een audience die tijdens het opbouwen al verouderd raakt, komt onder de oude versie te staan
+en wordt dus nooit meer gelezen.
+"""
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import NativePushToken, PushSubscription
+
+PUSH_AUDIENCE_VER_KEY = "push:audience:ver"
+PUSH_AUDIENCE_KEY = "push:audience:{ver}:{permission_key}:{wants_key}"
+PUSH_AUDIENCE_TTL = 60 * 60 * 24
+
+
+def get_push_audience_version() -> int:
+    v = cache.get(PUSH_AUDIENCE_VER_KEY)
+    return int(v) if v else 1
+
+
+def bump_push_audience_version() -> int:
+    """
+    Alle gecachte audiences ongeldig (één INCR).
+    """
+    cache.add(PUSH_AUDIENCE_VER_KEY, 1, timeout=None)
+    return int(cache.incr(PUSH_AUDIENCE_VER_KEY))
+
+
+def bump_push_audience_on_commit() -> None:
+    """
+    bump_push_audience_version na de commit van de huidige transaction, max één keer
+    per transaction (een bulk delete of een reeks saves geeft één INCR).
+    """
+    conn = transaction.get_connection()
+    if any(func is bump_push_audience_version for _sids, func, _robust in conn.run_on_commit):
+        return
+    transaction.on_commit(bump_push_audience_version)
+
+
+def _build_push_audience(permission_key: str, wants_key: Optional[str]) -> dict:
+    """
+    Users die OF webpush subs OF native tokens hebben, gefilterd met can + wants_push
+    (wants_key None: alleen de permissie). Subs en tokens als [id, user_id].
+    """
+    from core.views._helpers import users_who_can, wants_push
+
+    User = get_user_model()
+    users = list(
+        User.objects.filter(
+            Q(push_subscriptions__isnull=False) | Q(native_push_tokens__isnull=False)
+        )
+        .select_related("profile", "profile__notif_prefs")
+        .distinct()
+    )
+    allowed = users_who_can(users, permission_key)
+    user_ids = [u.id for u in users if u.id in allowed and (wants_key is None or wants_push(u, wants_key))]
+
+    subs = PushSubscription.objects.filter(user_id__in=user_ids).values_list("id", "user_id")
+    tokens = (
+        NativePushToken.objects.filter(user_id__in=user_ids)
+        .exclude(token="")
+        .values_list("id", "user_id")
+    )
+    return {
+        "user_ids": user_ids,
+        "subs": [list(row) for row in subs],
+        "tokens": [list(row) for row in tokens],
+    }
+
+
+def get_push_audience(permission_key: str, wants_key: Optional[str]) -> dict:
+    """
+    {"user_ids": [...], "subs": [[sub_id, user_id], ...], "tokens": [[token_id, user_id], ...]}
+    """
+    key = PUSH_AUDIENCE_KEY.format(
+        ver=get_push_audience_version(),
+        permission_key=permission_key,
+        wants_key=wants_key or "-",
+    )
+    audience = cache.get(key)
+    if audience is None:
+        audience = _build_push_audience(permission_key, wants_key)
+        cache.set(key, audience, timeout=PUSH_AUDIENCE_TTL)
+    return audience
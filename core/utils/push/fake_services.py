@@ -0,0 +1,203 @@
+# core/utils/push/fake_services.py
+"""
+Lokale stand-ins voor de push services, voor load tests zonder Google/Apple/Mozilla.
+
+- FakeWebPushServer: HTTP server op 127.0.0.1 die Web Push requests accepteert
+  (endpoint: <base_url>/wp/<key>) met instelbare latency, foutpercentage (503) en
+  percentage verlopen subscriptions (410).
+- FakeFcm: vervangt tijdens een `with` blok messaging.send_each_for_multicast in
+  core.utils.push.push; per token success, UnregisteredError of UnavailableError.
+
+Beide houden bij wat ze ontvangen hebben (FakeServiceStats). Alleen voor de
+management command push_loadtest en lokale benchmarks, nooit in productiecode.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+FAKE_WEBPUSH_PATH = "/wp/"
+
+
+@dataclass
+class FakeServiceConfig:
+    latency_ms: float = 0.0       # vaste vertraging per request (FCM: per multicast)
+    jitter_ms: float = 0.0        # plus uniform 0..jitter_ms
+    error_rate: float = 0.0       # fractie tijdelijke fouten (503 / UnavailableError)
+    gone_rate: float = 0.0        # fractie verlopen ontvangers (410 / UnregisteredError)
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeServiceStats:
+    requests: int = 0
+    messages: int = 0
+    bytes: int = 0
+    outcomes: Counter = field(default_factory=Counter)   # "ok" / "gone" / "error"
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, outcome: str, *, n_bytes: int = 0) -> None:
+        with self.lock:
+            self.requests += 1
+            self.messages += 1
+            self.bytes += n_bytes
+            self.outcomes[outcome] += 1
+
+    def record_batch(self, outcomes: list[str]) -> None:
+        # één request (FCM multicast) met een uitkomst per bericht
+        with self.lock:
+            self.requests += 1
+            self.messages += len(outcomes)
+            self.outcomes.update(outcomes)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "messages": self.messages,
+                "bytes": self.bytes,
+                "outcomes": dict(self.outcomes),
+            }
+
+
+class _FakeBehaviour:
+    def __init__(self, config: FakeServiceConfig):
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> None:
+        with self._lock:
+            jitter = self._random.uniform(0, self.config.jitter_ms) if self.config.jitter_ms else 0.0
+        total = self.config.latency_ms + jitter
+        if total > 0:
+            time.sleep(total / 1000)
+
+    def outcome(self) -> str:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.config.gone_rate:
+            return "gone"
+        if roll < self.config.gone_rate + self.config.error_rate:
+            return "error"
+        return "ok"
+
+
+# -----------------------------
+# Web Push
+# -----------------------------
+class FakeWebPushServer:
+    """
+    with FakeWebPushServer(FakeServiceConfig(latency_ms=50)) as server:
+        endpoint = server.endpoint("abc")
+    """
+
+    STATUS = {"ok": 201, "gone": 410, "error": 503}
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeServiceConfig()
+        self.stats = FakeServiceStats()
+        self._behaviour = _FakeBehaviour(self.config)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def endpoint(self, key) -> str:
+        return f"{self.base_url}{FAKE_WEBPUSH_PATH}{key}"
+
+    def owns(self, endpoint: str) -> bool:
+        return endpoint.startswith(f"{self.base_url}{FAKE_WEBPUSH_PATH}")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, net als de echte push services
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.path.startswith(FAKE_WEBPUSH_PATH):
+                    outcome, status = "gone", 404
+                else:
+                    server._behaviour.delay()
+                    outcome = server._behaviour.outcome()
+                    status = server.STATUS[outcome]
+                server.stats.record(outcome, n_bytes=len(body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeWebPushServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-webpush", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# -----------------------------
+# FCM
+# -----------------------------
+class FakeFcm:
+    """
+    Vervangt tijdens het `with` blok het versturen naar FCM in core.utils.push.push.
+    Berichten worden wel volledig opgebouwd (MulticastMessage), alleen niet verstuurd.
+    """
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None):
+        self.config = config or FakeServiceConfig()
+        self.stats = FakeServiceStats()
+        self._behaviour = _FakeBehaviour(self.config)
+        self._saved = None
+
+    def send_each_for_multicast(self, multicast_message, dry_run=False, app=None):
+        from firebase_admin import exceptions as firebase_exceptions
+        from firebase_admin import messaging
+
+        self._behaviour.delay()
+        responses, outcomes = [], []
+        for n, _token in enumerate(multicast_message.tokens):
+            outcome = self._behaviour.outcome()
+            outcomes.append(outcome)
+            if outcome == "ok":
+                responses.append(messaging.SendResponse({"name": f"projects/fake/messages/{n}"}, None))
+            elif outcome == "gone":
+                responses.append(messaging.SendResponse(None, messaging.UnregisteredError("Token is not registered (fake)")))
+            else:
+                responses.append(messaging.SendResponse(None, firebase_exceptions.UnavailableError("Unavailable (fake)")))
+        self.stats.record_batch(outcomes)
+        return messaging.BatchResponse(responses)
+
+    def __enter__(self):
+        from core.utils.push import push
+
+        self._saved = (push.messaging.send_each_for_multicast, push._native_ready)
+        push.messaging.send_each_for_multicast = self.send_each_for_multicast
+        push._native_ready = lambda: True
+        return self
+
+    def __exit__(self, *exc):
+        from core.utils.push import push
+
+        push.messaging.send_each_for_multicast, push._native_ready = self._saved
@@ -0,0 +1,182 @@
+# core/utils/push/metrics.py
+"""
+Metrics per push broadcast, opgeslagen in Redis zodat alle chunk tasks (ook op andere workers)
+in dezelfde broadcast optellen.
+
+- Audience: aantal webpush subscriptions / native tokens en aantal chunks.
+- Per provider (webpush per push service host, bijv. "web:fcm.googleapis.com"; native "fcm"):
+  sent / failed / gone (verwijderd) / retry, plus latencies in ms voor percentielen.
+  retry telt tijdelijke fouten die opnieuw geprobeerd worden; pas na de laatste poging
+  tellen ze (één keer) als failed.
+- Duur: van dispatch tot de laatste chunk klaar is.
+
+Als de laatste chunk klaar is volgt één JSON logregel ("push.broadcast {...}").
+Uitlezen via get_broadcast_metrics / recent_broadcast_metrics (admin JSON endpoint).
+Fouten bij het bijhouden worden gelogd en nooit doorgegeven aan het versturen.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PUSH_METRICS_KEY = "push:metrics:{broadcast_id}"
+PUSH_METRICS_LAT_KEY = "push:metrics:{broadcast_id}:lat:{provider}"
+PUSH_METRICS_INDEX_KEY = "push:metrics:index"
+PUSH_METRICS_TTL = 60 * 60 * 24 * 7
+PUSH_METRICS_KEEP = 200                 # aantal broadcasts in de index
+PUSH_METRICS_MAX_SAMPLES = 5000         # latencies per provider per broadcast
+
+COUNT_FIELDS = ("sent", "failed", "gone", "retry")
+
+
+@dataclass
+class ProviderStats:
+    sent: int = 0
+    failed: int = 0
+    gone: int = 0
+    retry: int = 0
+    latency_ms: list[float] = field(default_factory=list)
+
+    def give_up_retries(self) -> None:
+        """Laatste poging: tijdelijke fouten worden niet meer opnieuw geprobeerd -> failed."""
+        self.failed += self.retry
+        self.retry = 0
+
+
+def _redis_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _key(template: str, **kwargs) -> str:
+    return cache.make_key(template.format(**kwargs))
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _percentile(sorted_values: list[float], pct: float):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return round(sorted_values[idx], 1)
+
+
+def start_broadcast(broadcast_id: str, *, tag: str, web_count: int, native_count: int, chunks: int) -> None:
+    try:
+        r = _redis_connection()
+        key = _key(PUSH_METRICS_KEY, broadcast_id=broadcast_id)
+        index_key = _key(PUSH_METRICS_INDEX_KEY)
+        now = time.time()
+        pipe = r.pipeline()
+        pipe.hset(key, mapping={
+            "tag": tag,
+            "started": now,
+            "audience_web": web_count,
+            "audience_native": native_count,
+            "chunks": chunks,
+            "chunks_done": 0,
+        })
+        pipe.expire(key, PUSH_METRICS_TTL)
+        pipe.zadd(index_key, {broadcast_id: now})
+        pipe.zremrangebyrank(index_key, 0, -PUSH_METRICS_KEEP - 1)
+        pipe.execute()
+    except Exception:
+        logger.warning("Push metrics: start %s niet opgeslagen", broadcast_id, exc_info=True)
+
+
+def record_sends(broadcast_id: str, providers: dict[str, ProviderStats]) -> None:
+    """
+    Telt de resultaten van één chunk (of retry daarvan) op bij de broadcast.
+    """
+    if not providers:
+        return
+    try:
+        r = _redis_connection()
+        key = _key(PUSH_METRICS_KEY, broadcast_id=broadcast_id)
+        pipe = r.pipeline()
+        for provider, stats in providers.items():
+            for name in COUNT_FIELDS:
+                n = getattr(stats, name)
+                if n:
+                    pipe.hincrby(key, f"{provider}|{name}", n)
+            if stats.latency_ms:
+                lat_key = _key(PUSH_METRICS_LAT_KEY, broadcast_id=broadcast_id, provider=provider)
+                pipe.rpush(lat_key, *[round(ms, 1) for ms in stats.latency_ms])
+                pipe.ltrim(lat_key, 0, PUSH_METRICS_MAX_SAMPLES - 1)
+                pipe.expire(lat_key, PUSH_METRICS_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning("Push metrics: sends %s niet opgeslagen", broadcast_id, exc_info=True)
+
+
+def chunk_done(broadcast_id: str) -> None:
+    """
+    Chunk definitief klaar (geen retries meer). Bij de laatste chunk: duur vastleggen + logregel.
+    """
+    try:
+        r = _redis_connection()
+        key = _key(PUSH_METRICS_KEY, broadcast_id=broadcast_id)
+        done = r.hincrby(key, "chunks_done", 1)
+        chunks = r.hget(key, "chunks")
+        if chunks is None or done != int(chunks):
+            return
+        r.hset(key, "finished", time.time())
+        logger.info("push.broadcast %s", json.dumps(get_broadcast_metrics(broadcast_id), sort_keys=True))
+    except Exception:
+        logger.warning("Push metrics: chunk van %s niet afgemeld", broadcast_id, exc_info=True)
+
+
+def get_broadcast_metrics(broadcast_id: str) -> dict | None:
+    r = _redis_connection()
+    raw = r.hgetall(_key(PUSH_METRICS_KEY, broadcast_id=broadcast_id))
+    if not raw:
+        return None
+    data = {_decode(k): _decode(v) for k, v in raw.items()}
+
+    started = float(data.get("started") or 0)
+    finished = float(data["finished"]) if data.get("finished") else None
+    result = {
+        "broadcast_id": broadcast_id,
+        "tag": data.get("tag") or "",
+        "started": started,
+        "finished": finished,
+        "duration_ms": round((finished - started) * 1000, 1) if finished else None,
+        "audience": {
+            "web": int(data.get("audience_web") or 0),
+            "native": int(data.get("audience_native") or 0),
+        },
+        "chunks": int(data.get("chunks") or 0),
+        "chunks_done": int(data.get("chunks_done") or 0),
+        "providers": {},
+    }
+
+    for field_name, value in data.items():
+        if "|" not in field_name:
+            continue
+        provider, name = field_name.rsplit("|", 1)
+        stats = result["providers"].setdefault(provider, {n: 0 for n in COUNT_FIELDS})
+        stats[name] = int(value)
+
+    for provider, stats in result["providers"].items():
+        lat_key = _key(PUSH_METRICS_LAT_KEY, broadcast_id=broadcast_id, provider=provider)
+        samples = sorted(float(_decode(v)) for v in r.lrange(lat_key, 0, -1))
+        stats["latency_ms"] = {
+            "count": len(samples),
+            "p50": _percentile(samples, 50),
+            "p90": _percentile(samples, 90),
+            "p99": _percentile(samples, 99),
+            "max": round(samples[-1], 1) if samples else None,
+        }
+    return result
+
+
+def recent_broadcast_metrics(limit: int = 50) -> list[dict]:
+    r = _redis_connection()
+    ids = [_decode(b) for b in r.zrevrange(_key(PUSH_METRICS_INDEX_KEY), 0, max(0, limit - 1))]
+    return [m for m in (get_broadcast_metrics(b) for b in ids) if m]
@@ -2,18 +2,23 @@
 import os
 import json
 import base64
+import hashlib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
-from urllib.parse import urlparse
+from typing import Optional
 
-from django.conf import settings
+from celery import group
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
 from django.utils import timezone
 
-from pywebpush import webpush, WebPushException
-
 from core.models import PushSubscription, NativePushToken
-from core.views._helpers import can, wants_push
+from core.views._helpers import can, users_who_can, wants_push
+from core.utils.push.audience import bump_push_audience_on_commit, get_push_audience
+from core.utils.push import metrics as push_metrics
+from core.utils.push.webpush_sender import WebPushTarget, send_webpush_many
 
 # ============================================================
 # TOGGLES (zet hier aan/uit, zonder settings.py te wijzigen)
@@ -21,16 +26,26 @@ from core.views._helpers import can, wants_push
 PUSH_ENABLE_WEBPUSH = True
 PUSH_ENABLE_NATIVE_FCM = True
 
+# Fan-out: een broadcast wordt verdeeld over chunk tasks (queue "push"), elk met eigen retries
+PUSH_WEBPUSH_CHUNK = 200
+PUSH_NATIVE_BATCH = 500           # max tokens per FCM multicast
+PUSH_NATIVE_WORKERS = 4           # gelijktijdige multicasts binnen één chunk
+PUSH_NATIVE_CHUNK = PUSH_NATIVE_BATCH * PUSH_NATIVE_WORKERS
+PUSH_BROADCAST_KEY = "push:broadcast:{broadcast_id}"
+PUSH_BROADCAST_TTL = 60 * 60 * 24
+
 # ============================================================
 # NATIVE PUSH (FCM) helpers
 # ============================================================
 try:
     import firebase_admin
     from firebase_admin import credentials, messaging
+    from firebase_admin import exceptions as firebase_exceptions
 except Exception:  # pragma: no cover
     firebase_admin = None
     credentials = None
     messaging = None
+    firebase_exceptions = None
 
 
 # Kies 1 vaste channel-id (moet ook in Android bestaan!)
@@ -62,17 +77,14 @@ def _chunked(seq, size=500):
         yield seq[i : i + size]
 
 
-def _send_native_push_to_users(payload: dict, users):
-    """
-    Stuur naar alle NativePushToken van deze users.
-    payload verwacht keys: title, body, url, tag
-    """
+def _native_ready() -> bool:
     if not PUSH_ENABLE_NATIVE_FCM:
-        return
+        return False
     _ensure_firebase()
-    if firebase_admin is None or not (getattr(firebase_admin, "_apps", None) and firebase_admin._apps):
-        return
+    return firebase_admin is not None and bool(getattr(firebase_admin, "_apps", None) and firebase_admin._apps)
+
 
+def _native_message(payload: dict, tokens: list[str]):
     title = payload.get("title") or "Melding"
     body = payload.get("body") or ""
 
@@ -81,110 +93,258 @@ def _send_native_push_to_users(payload: dict, users):
         "tag": str(payload.get("tag") or ""),
     }
 
-    tokens = list(
-        NativePushToken.objects.filter(user__in=users)
-        .exclude(token="")
-        .values_list("token", flat=True)
-        .distinct()
-    )
-    if not tokens:
-        return
-
-    for batch in _chunked(tokens, 500):
-        msg = messaging.MulticastMessage(
-            notification=messaging.Notification(title=title, body=body),
-            data=data,
-            tokens=batch,
-            android=messaging.AndroidConfig(
-                collapse_key=data["tag"] or None,
-                priority="high",
-                notification=messaging.AndroidNotification(
-                    channel_id=ANDROID_CHANNEL_ID_HIGH,
-                    sound="default",
-                    icon="ic_stat_notification",
-                ),
+    return messaging.MulticastMessage(
+        notification=messaging.Notification(title=title, body=body),
+        data=data,
+        tokens=tokens,
+        android=messaging.AndroidConfig(
+            collapse_key=data["tag"] or None,
+            priority="high",
+            notification=messaging.AndroidNotification(
+                channel_id=ANDROID_CHANNEL_ID_HIGH,
+                sound="default",
+                icon="ic_stat_notification",
             ),
-            apns=messaging.APNSConfig(
-                headers={"apns-collapse-id": data["tag"]} if data["tag"] else {},
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(sound="default")
-                ),
+        ),
+        apns=messaging.APNSConfig(
+            headers={"apns-collapse-id": data["tag"]} if data["tag"] else {},
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(sound="default")
             ),
-        )
+        ),
+    )
 
-        resp = messaging.send_each_for_multicast(msg)
 
-        # ongeldige tokens opruimen
-        bad_tokens = []
-        for t, r in zip(batch, resp.responses):
-            if r.success:
-                continue
-            exc = r.exception
-            msg_l = (str(exc) or "").lower()
-            if "not registered" in msg_l or "unregistered" in msg_l:
-                bad_tokens.append(t)
+def _is_retryable_fcm_error(exc) -> bool:
+    if firebase_exceptions is None or exc is None:
+        return False
+    return isinstance(exc, (
+        firebase_exceptions.UnavailableError,
+        firebase_exceptions.InternalError,
+        firebase_exceptions.DeadlineExceededError,
+        firebase_exceptions.ResourceExhaustedError,
+    ))
 
-        if bad_tokens:
-            NativePushToken.objects.filter(token__in=bad_tokens).delete()
 
+def _is_unregistered_fcm_error(exc) -> bool:
+    if messaging is not None and isinstance(exc, messaging.UnregisteredError):
+        return True
+    msg_l = (str(exc) or "").lower()
+    return "not registered" in msg_l or "unregistered" in msg_l
 
-# ============================================================
-# WEB PUSH helpers (jouw bestaande logica blijft leidend)
-# ============================================================
-def _build_vapid_claims(endpoint: str) -> dict:
-    parsed = urlparse(endpoint)
-    aud = f"https://{parsed.netloc}"
-    return {"sub": settings.VAPID_SUB, "aud": aud}
 
+def _send_native_batch(payload: dict, tokens: list[str]):
+    """
+    Eén multicast (max PUSH_NATIVE_BATCH tokens), zonder DB.
+    Return: (ProviderStats, ongeldige tokens, tokens met een tijdelijke fout).
+    """
+    stats = push_metrics.ProviderStats()
+    started = time.perf_counter()
+    try:
+        resp = messaging.send_each_for_multicast(_native_message(payload, tokens))
+    except Exception as exc:
+        stats.latency_ms.append((time.perf_counter() - started) * 1000)
+        # transportfout of tijdelijke FCM fout -> hele batch later opnieuw
+        if not isinstance(exc, firebase_exceptions.FirebaseError) or _is_retryable_fcm_error(exc):
+            stats.retry += len(tokens)
+            return stats, [], list(tokens)
+        raise
+    stats.latency_ms.append((time.perf_counter() - started) * 1000)
+
+    bad_tokens = []
+    retry_tokens = []
+    for t, r in zip(tokens, resp.responses):
+        if r.success:
+            continue
+        if _is_unregistered_fcm_error(r.exception):
+            bad_tokens.append(t)
+        elif _is_retryable_fcm_error(r.exception):
+            retry_tokens.append(t)
+
+    stats.sent += resp.success_count
+    stats.failed += resp.failure_count - len(retry_tokens)
+    stats.gone += len(bad_tokens)
+    stats.retry += len(retry_tokens)
+    return stats, bad_tokens, retry_tokens
+
+
+def _send_native_tokens(payload: dict, tokens: list[str], stats: Optional[push_metrics.ProviderStats] = None,
+                        *, workers: int = PUSH_NATIVE_WORKERS) -> list[str]:
+    """
+    Multicasts van PUSH_NATIVE_BATCH tokens, max `workers` tegelijk; de duur schaalt dus met
+    batches / workers. Ongeldige tokens worden aan het eind in één DELETE verwijderd.
+    stats (optioneel) wordt aangevuld; latency is per multicast, FCM geeft geen tijd per token.
+    Return: tokens met een tijdelijke fout (later opnieuw proberen).
+    """
+    if not tokens:
+        return []
+    stats = stats if stats is not None else push_metrics.ProviderStats()
 
-def _send_webpush(payload: dict, eligible_subs):
-    if not PUSH_ENABLE_WEBPUSH:
-        return
+    batches = list(_chunked(tokens, PUSH_NATIVE_BATCH))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        results = list(pool.map(lambda batch: _send_native_batch(payload, batch), batches))
+
+    bad_tokens = []
+    retry_tokens = []
+    for batch_stats, bad, retry in results:
+        for name in push_metrics.COUNT_FIELDS:
+            setattr(stats, name, getattr(stats, name) + getattr(batch_stats, name))
+        stats.latency_ms.extend(batch_stats.latency_ms)
+        bad_tokens += bad
+        retry_tokens += retry
 
-    for s in eligible_subs:
-        claims = _build_vapid_claims(s.endpoint)
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": s.endpoint,
-                    "keys": {"p256dh": s.p256dh, "auth": s.auth},
-                },
-                data=json.dumps(payload),
-                vapid_private_key=settings.VAPID_PRIVATE_KEY,
-                vapid_claims=claims,
-            )
-        except WebPushException as e:
-            status = getattr(e, "response", None).status_code if getattr(e, "response", None) else None
-            if status in (404, 410, 403):
-                s.delete()
+    if bad_tokens:
+        deleted, _ = NativePushToken.objects.filter(token__in=bad_tokens).delete()
+        if deleted:
+            bump_push_audience_on_commit()
+    return retry_tokens
 
 
 # ============================================================
 # Recipients (belangrijk!): native los van webpush bepalen
 # ============================================================
-def _eligible_users(permission_key: str, wants_key: str):
+def _eligible_subs(subs, permission_key: str, wants_key: Optional[str]):
     """
-    Vind users die OF webpush subs OF native tokens hebben,
-    en filter met exact dezelfde checks als je nu gebruikt: can + wants_push.
+    Webpush subs waarvan de user permission_key heeft (en wants_key aan heeft staan).
+    subs: queryset met select_related("user", "user__profile", "user__profile__notif_prefs").
     """
-    User = get_user_model()
-    qs = (
-        User.objects.filter(
-            Q(push_subscriptions__isnull=False) | Q(native_push_tokens__isnull=False)
-        )
-        .select_related("profile", "profile__notif_prefs")
-        .distinct()
-    )
-    return [u for u in qs if can(u, permission_key) and wants_push(u, wants_key)]
+    subs = list(subs)
+    allowed = users_who_can({s.user_id: s.user for s in subs}.values(), permission_key)
+    return [s for s in subs if s.user_id in allowed and (wants_key is None or wants_push(s.user, wants_key))]
 
 
 def _send_both(payload: dict, eligible_subs, eligible_users_for_native):
     """
     - Webpush: naar eligible_subs (exact zoals voorheen)
     - Native: naar eligible_users_for_native (nieuw, onafhankelijk van web subs)
+    Versturen gebeurt in chunk tasks, zie dispatch_push_broadcast.
+    """
+    sub_ids = [s.id for s in eligible_subs]
+    token_ids = []
+    if PUSH_ENABLE_NATIVE_FCM and eligible_users_for_native:
+        token_ids = list(
+            NativePushToken.objects.filter(user_id__in=[u.id for u in eligible_users_for_native])
+            .exclude(token="")
+            .values_list("id", flat=True)
+        )
+    _send_ids(payload, sub_ids, token_ids)
+
+
+def _send_audience(payload: dict, permission_key: str, wants_key: Optional[str], exclude_user_ids=()):
+    """
+    Broadcast naar de gecachte audience van (permission_key, wants_key): webpush subs en
+    native tokens van users met de permissie (en wants_key aan). Zie core/utils/push/audience.py.
+    """
+    audience = get_push_audience(permission_key, wants_key)
+    exclude = set(exclude_user_ids)
+    _send_ids(
+        payload,
+        [sub_id for sub_id, user_id in audience["subs"] if user_id not in exclude],
+        [token_id for token_id, user_id in audience["tokens"] if user_id not in exclude],
+    )
+
+
+def _send_ids(payload: dict, sub_ids: list[int], token_ids: list[int]):
+    dispatch_push_broadcast(
+        payload,
+        sub_ids if PUSH_ENABLE_WEBPUSH else [],
+        token_ids if PUSH_ENABLE_NATIVE_FCM else [],
+    )
+
+
+# ============================================================
+# Fan-out: chunk tasks met eigen idempotency key + retries
+# ============================================================
+def _broadcast_id(payload: dict, sub_ids: list[int], token_ids: list[int]) -> str:
+    """
+    Binnen een Celery task: task id + tag + hash van payload en ontvangers, zodat een
+    retry van de broadcast task niet opnieuw verdeelt (en dus niet dubbel verstuurt),
+    maar een loop per user (zelfde task, zelfde tag) wel elke user bereikt.
+    Anders: uniek.
+    """
+    from celery import current_task
+
+    task_id = getattr(getattr(current_task, "request", None), "id", None)
+    if not task_id:
+        return f"{uuid.uuid4().hex}:{payload.get('tag') or ''}"
+
+    digest = hashlib.sha256(
+        json.dumps([payload, sorted(sub_ids), sorted(token_ids)], sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+    return f"{task_id}:{payload.get('tag') or ''}:{digest}"
+
+
+def dispatch_push_broadcast(payload: dict, sub_ids: list[int], token_ids: list[int], *, broadcast_id: Optional[str] = None) -> int:
+    """
+    Verdeelt een broadcast over chunk tasks (PUSH_WEBPUSH_CHUNK subscriptions /
+    PUSH_NATIVE_CHUNK tokens). Een fout in één chunk herhaalt alleen die chunk,
+    en alleen voor de ontvangers met een tijdelijke fout.
+    Return: aantal chunks.
     """
-    _send_webpush(payload, eligible_subs)
-    _send_native_push_to_users(payload, eligible_users_for_native)
+    from core.tasks.push import send_native_chunk_task, send_webpush_chunk_task
+
+    broadcast_id = broadcast_id or _broadcast_id(payload, sub_ids, token_ids)
+    key = PUSH_BROADCAST_KEY.format(broadcast_id=broadcast_id)
+    if cache.get(key):
+        return 0
+
+    sigs = [
+        send_webpush_chunk_task.s(broadcast_id, n, payload, chunk).set(queue="push")
+        for n, chunk in enumerate(_chunked(sub_ids, PUSH_WEBPUSH_CHUNK))
+    ]
+    sigs += [
+        send_native_chunk_task.s(broadcast_id, n, payload, chunk).set(queue="push")
+        for n, chunk in enumerate(_chunked(token_ids, PUSH_NATIVE_CHUNK))
+    ]
+    if sigs:
+        push_metrics.start_broadcast(
+            broadcast_id,
+            tag=str(payload.get("tag") or ""),
+            web_count=len(sub_ids),
+            native_count=len(token_ids),
+            chunks=len(sigs),
+        )
+        group(sigs).apply_async()
+    cache.set(key, 1, timeout=PUSH_BROADCAST_TTL)
+    return len(sigs)
+
+
+def send_webpush_chunk(payload: dict, sub_ids: list[int], broadcast_id: Optional[str] = None,
+                       *, last_attempt: bool = False) -> list[int]:
+    """
+    Return: subscription ids met een tijdelijke fout. Met broadcast_id: metrics bijwerken;
+    bij last_attempt tellen die tijdelijke fouten als failed (er komt geen retry meer).
+    """
+    if not PUSH_ENABLE_WEBPUSH:
+        return []
+    rows = PushSubscription.objects.filter(id__in=sub_ids).values_list("id", "endpoint", "p256dh", "auth")
+    result = send_webpush_many(payload, [WebPushTarget(*row) for row in rows])
+    if broadcast_id:
+        if last_attempt:
+            for stats in result.providers.values():
+                stats.give_up_retries()
+        push_metrics.record_sends(broadcast_id, result.providers)
+    return result.retry
+
+
+def send_native_chunk(payload: dict, token_ids: list[int], broadcast_id: Optional[str] = None,
+                      *, last_attempt: bool = False) -> list[int]:
+    """
+    Return: token ids met een tijdelijke fout. Met broadcast_id: metrics bijwerken;
+    bij last_attempt tellen die tijdelijke fouten als failed (er komt geen retry meer).
+    """
+    if not _native_ready() or not token_ids:
+        return []
+    by_token = dict(
+        NativePushToken.objects.filter(id__in=token_ids).exclude(token="").values_list("token", "id")
+    )
+    stats = push_metrics.ProviderStats()
+    retry_tokens = _send_native_tokens(payload, list(by_token), stats)
+    if broadcast_id:
+        if last_attempt:
+            stats.give_up_retries()
+        push_metrics.record_sends(broadcast_id, {"fcm": stats})
+    return [by_token[t] for t in retry_tokens]
 
 
 # ============================================================
@@ -212,11 +372,7 @@ def send_roster_updated_push(iso_year: int, iso_week: int, monday_str: str, frid
         "tag": f"rooster-update-{iso_year}-{iso_week}",
     }
 
-    subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").all()
-    eligible_subs = [s for s in subs if can(s.user, "can_view_roster") and wants_push(s.user, "push_new_roster")]
-
-    eligible_users_native = _eligible_users("can_view_roster", "push_new_roster")
-    _send_both(payload, eligible_subs, eligible_users_native)
+    _send_audience(payload, "can_view_roster", "push_new_roster")
 
 
 def send_news_upload_push(uploader_first_name: str):
@@ -228,11 +384,7 @@ def send_news_upload_push(uploader_first_name: str):
 
     payload = {"title": "Nieuwtje!", "body": body_text, "url": "/nieuws/", "tag": "news-update"}
 
-    subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").all()
-    eligible_subs = [s for s in subs if can(s.user, "can_view_news") and wants_push(s.user, "push_news_upload")]
-
-    eligible_users_native = _eligible_users("can_view_news", "push_news_upload")
-    _send_both(payload, eligible_subs, eligible_users_native)
+    _send_audience(payload, "can_view_news", "push_news_upload")
 
 
 def send_agenda_upload_push(category: str):
@@ -245,11 +397,7 @@ def send_agenda_upload_push(category: str):
 
     payload = {"title": title, "body": body, "url": "/agenda/", "tag": "agenda-update"}
 
-    subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").all()
-    eligible_subs = [s for s in subs if can(s.user, "can_view_agenda") and wants_push(s.user, "push_new_agenda")]
-
-    eligible_users_native = _eligible_users("can_view_agenda", "push_new_agenda")
-    _send_both(payload, eligible_subs, eligible_users_native)
+    _send_audience(payload, "can_view_agenda", "push_new_agenda")
 
 
 def send_laatste_pot_push(item_naam: str):
@@ -260,20 +408,8 @@ def send_laatste_pot_push(item_naam: str):
         "tag": "laatste-pot-update",
     }
 
-    subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").all()
-    eligible_subs = [s for s in subs if can(s.user, "can_perform_bestellingen")]
-
-    # native wants_push key? (je had hier geen wants_push check)
-    # we houden dit exact gelijk: alleen can()
-    User = get_user_model()
-    qs = (
-        User.objects.filter(Q(push_subscriptions__isnull=False) | Q(native_push_tokens__isnull=False))
-        .select_related("profile", "profile__notif_prefs")
-        .distinct()
-    )
-    eligible_users_native = [u for u in qs if can(u, "can_perform_bestellingen")]
-
-    _send_both(payload, eligible_subs, eligible_users_native)
+    # geen wants_push key: alleen can()
+    _send_audience(payload, "can_perform_bestellingen", None)
 
 
 def _dienst_word(n: int) -> str:
@@ -325,7 +461,7 @@ def send_user_shifts_changed_push(user_id: int, iso_year: int, iso_week: int, mo
     }
 
     subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").filter(user_id=user_id)
-    eligible_subs = [s for s in subs if can(s.user, "can_view_diensten") and wants_push(s.user, "push_dienst_changed")]
+    eligible_subs = _eligible_subs(subs, "can_view_diensten", "push_dienst_changed")
 
     eligible_users_native = []
     if can(user, "can_view_diensten") and wants_push(user, "push_dienst_changed"):
@@ -343,7 +479,7 @@ def send_uren_reminder_push(user_id, reminder_date):
     }
 
     subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").filter(user_id=user_id)
-    eligible_subs = [s for s in subs if can(s.user, "can_view_urendoorgeven") and wants_push(s.user, "push_uren_reminder")]
+    eligible_subs = _eligible_subs(subs, "can_view_urendoorgeven", "push_uren_reminder")
 
     User = get_user_model()
     user = User.objects.filter(id=user_id).select_related("profile", "profile__notif_prefs").first()
@@ -363,7 +499,7 @@ def send_birthday_push_for_user(user_id, birthday_name):
     }
 
     subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").filter(user_id=user_id)
-    eligible_subs = [s for s in subs if can(s.user, "can_view_agenda") and wants_push(s.user, "push_birthday_self")]
+    eligible_subs = _eligible_subs(subs, "can_view_agenda", "push_birthday_self")
 
     User = get_user_model()
     user = User.objects.filter(id=user_id).select_related("profile", "profile__notif_prefs").first()
@@ -403,14 +539,8 @@ def send_birthday_push_for_others(birthday_user_ids: list[int], birthday_names:
         "tag": f"birthday-others-{timezone.localdate().isoformat()}",
     }
 
-    subs = PushSubscription.objects.select_related("user", "user__profile", "user__profile__notif_prefs").exclude(user_id__in=birthday_user_ids)
-    eligible_subs = [s for s in subs if can(s.user, "can_view_agenda") and wants_push(s.user, "push_birthday_apojansen")]
-
-    eligible_users_native = _eligible_users("can_view_agenda", "push_birthday_apojansen")
     # exclude jarigen
-    eligible_users_native = [u for u in eligible_users_native if u.id not in set(birthday_user_ids)]
-
-    _send_both(payload, eligible_subs, eligible_users_native)
+    _send_audience(payload, "can_view_agenda", "push_birthday_apojansen", exclude_user_ids=birthday_user_ids)
 
 def send_test_push(user_id: int):
     User = get_user_model()
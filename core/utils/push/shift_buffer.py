@@ -0,0 +1,158 @@
+# core/utils/push/shift_buffer.py
+"""
+Debounce buffer voor "Diensten bijgewerkt" pushes.
+
+Planners publiceren vaak meerdere keren binnen een paar minuten. I.p.v. per publicatie
+een push per user, worden de aantallen (added/changed/removed) per (user, week) in een
+Redis hash opgeteld. De flush task stuurt één samengevatte push zodra er
+SHIFT_PUSH_DEBOUNCE_SECONDS niets meer bij is gekomen, of uiterlijk na
+SHIFT_PUSH_MAX_DELAY_SECONDS sinds de eerste wijziging.
+
+De flush verplaatst de buffer in één MULTI naar een processing key, zodat een
+publicatie tijdens de flush in een nieuwe buffer (met eigen flush) terechtkomt.
+De processing key wordt pas na het versturen verwijderd: faalt dat, dan leest de
+retry van de flush task hem opnieuw en gaat de push niet verloren.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SHIFT_PUSH_BUFFER_KEY = "push:shiftbuf:{user_id}:{iso_year}:{iso_week}"
+SHIFT_PUSH_SCHEDULED_KEY = "push:shiftbuf:{user_id}:{iso_year}:{iso_week}:scheduled"
+SHIFT_PUSH_PROCESSING_KEY = "push:shiftbuf:{user_id}:{iso_year}:{iso_week}:processing"
+COUNT_FIELDS = ("added", "changed", "removed")
+
+
+def _debounce_seconds() -> int:
+    return int(getattr(settings, "SHIFT_PUSH_DEBOUNCE_SECONDS", 300))
+
+
+def _max_delay_seconds() -> int:
+    return int(getattr(settings, "SHIFT_PUSH_MAX_DELAY_SECONDS", 1800))
+
+
+def _buffer_ttl() -> int:
+    # ruim na de uiterste flush, zodat een gemiste flush de buffer niet eeuwig laat staan
+    return _max_delay_seconds() + 60 * 60
+
+
+def _redis_connection():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _keys(user_id: int, iso_year: int, iso_week: int) -> tuple[str, str, str]:
+    fmt = {"user_id": user_id, "iso_year": iso_year, "iso_week": iso_week}
+    return (
+        cache.make_key(SHIFT_PUSH_BUFFER_KEY.format(**fmt)),
+        cache.make_key(SHIFT_PUSH_SCHEDULED_KEY.format(**fmt)),
+        cache.make_key(SHIFT_PUSH_PROCESSING_KEY.format(**fmt)),
+    )
+
+
+def _schedule_flush(user_id: int, iso_year: int, iso_week: int, countdown: float) -> None:
+    from core.tasks.push import flush_user_shifts_changed_push_task
+
+    flush_user_shifts_changed_push_task.apply_async(
+        args=[int(user_id), int(iso_year), int(iso_week)],
+        countdown=max(1, int(countdown)),
+        queue="push",
+    )
+
+
+def buffer_user_shifts_changed(user_id: int, iso_year: int, iso_week: int, monday_str: str,
+                               added_count: int, changed_count: int, removed_count: int) -> None:
+    """
+    Telt de wijzigingen op in de buffer en plant (1x per buffer) een flush.
+    Zonder Redis: direct versturen zoals voorheen.
+    """
+    counts = {"added": int(added_count or 0), "changed": int(changed_count or 0), "removed": int(removed_count or 0)}
+    if sum(counts.values()) <= 0:
+        return
+
+    buf_key, sched_key, _proc_key = _keys(user_id, iso_year, iso_week)
+    now = time.time()
+    try:
+        r = _redis_connection()
+        pipe = r.pipeline()
+        for field, n in counts.items():
+            if n:
+                pipe.hincrby(buf_key, field, n)
+        pipe.hset(buf_key, "monday", monday_str)
+        pipe.hsetnx(buf_key, "first", now)
+        pipe.hset(buf_key, "last", now)
+        pipe.expire(buf_key, _buffer_ttl())
+        pipe.set(sched_key, 1, nx=True, ex=_buffer_ttl())
+        scheduled = pipe.execute()[-1]
+    except Exception:
+        logger.warning("Shift push buffer niet beschikbaar, direct versturen", exc_info=True)
+        from core.tasks.push import send_user_shifts_changed_push_task
+        send_user_shifts_changed_push_task.delay(
+            int(user_id), int(iso_year), int(iso_week), monday_str,
+            counts["added"], counts["changed"], counts["removed"],
+        )
+        return
+
+    if scheduled:
+        _schedule_flush(user_id, iso_year, iso_week, _debounce_seconds())
+
+
+def _send_processing(r, proc_key: str, user_id: int, iso_year: int, iso_week: int) -> None:
+    """
+    Verstuurt de push voor een verplaatste buffer en verwijdert hem daarna.
+    Een fout gaat door naar de flush task (retry leest dezelfde key weer).
+    """
+    raw = r.hgetall(proc_key)
+    data = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v for k, v in raw.items()}
+    if not data:
+        return
+
+    from core.utils.push.push import send_user_shifts_changed_push
+    send_user_shifts_changed_push(
+        user_id=user_id,
+        iso_year=iso_year,
+        iso_week=iso_week,
+        monday_str=data.get("monday") or "",
+        **{f"{field}_count": int(data.get(field) or 0) for field in COUNT_FIELDS},
+    )
+    r.delete(proc_key)
+
+
+def flush_user_shifts_changed(user_id: int, iso_year: int, iso_week: int) -> None:
+    """
+    Eerst een nog niet verstuurde processing buffer (vorige poging mislukt). Dan: nog
+    binnen het debounce-venster opnieuw plannen, anders de buffer atomair naar de
+    processing key verplaatsen en één push versturen met de opgetelde aantallen.
+    """
+    buf_key, sched_key, proc_key = _keys(user_id, iso_year, iso_week)
+    r = _redis_connection()
+
+    _send_processing(r, proc_key, user_id, iso_year, iso_week)
+
+    state = r.hmget(buf_key, "first", "last")
+    if state[0] is None:
+        r.delete(sched_key)
+        return
+
+    first, last = float(state[0]), float(state[1] or state[0])
+    due = min(last + _debounce_seconds(), first + _max_delay_seconds())
+    wait = due - time.time()
+    if wait >= 1:
+        _schedule_flush(user_id, iso_year, iso_week, wait)
+        return
+
+    pipe = r.pipeline(transaction=True)
+    pipe.renamenx(buf_key, proc_key)
+    pipe.delete(sched_key)
+    moved = pipe.execute()[0]
+    if not moved:
+        # een gelijktijdige flush verstuurt zijn processing buffer nog -> deze buffer straks
+        if r.set(sched_key, 1, nx=True, ex=_buffer_ttl()):
+            _schedule_flush(user_id, iso_year, iso_week, _debounce_seconds())
+        return
+
+    _send_processing(r, proc_key, user_id, iso_year, iso_week)
@@ -0,0 +1,186 @@
+# core/utils/push/webpush_sender.py
+"""
+Web Push versturen naar veel subscriptions tegelijk.
+
+- Thread pool met begrensde parallelliteit (WEBPUSH_WORKERS).
+- Eén requests.Session per push-service origin (fcm.googleapis.com, updates.push.services.mozilla.com,
+  web.push.apple.com, ...), dus keep-alive verbindingen worden hergebruikt over subscriptions
+  en over broadcasts binnen hetzelfde worker proces.
+- VAPID JWT per audience (origin) gecached zolang hij geldig is, i.p.v. per subscription tekenen.
+- Verlopen subscriptions (404/410/403) worden verzameld en aan het eind in één DELETE opgeruimd.
+- Per push service (host) tellingen + latency per request in WebPushResult.providers (zie metrics.py).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from py_vapid import Vapid
+from pywebpush import WebPusher
+
+from core.utils.push.metrics import ProviderStats
+
+logger = logging.getLogger(__name__)
+
+WEBPUSH_WORKERS = 16            # max gelijktijdige requests per broadcast
+WEBPUSH_TIMEOUT = 10            # seconden per request
+WEBPUSH_TTL = 0                 # zelfde default als pywebpush.webpush()
+VAPID_JWT_LIFETIME = 12 * 60 * 60
+VAPID_JWT_MARGIN = 10 * 60      # ruim voor exp een nieuwe tekenen
+
+GONE_STATUSES = (404, 410, 403)
+RETRY_STATUSES = (429,)         # plus 5xx en netwerkfouten
+
+
+@dataclass(frozen=True)
+class WebPushTarget:
+    """
+    Alleen de velden die nodig zijn om te versturen (geen model instances in threads).
+    """
+    id: int
+    endpoint: str
+    p256dh: str
+    auth: str
+
+
+@dataclass
+class WebPushResult:
+    sent: int = 0
+    failed: int = 0                                  # definitief mislukt (incl. gone)
+    gone: list[int] = field(default_factory=list)
+    retry: list[int] = field(default_factory=list)   # tijdelijke fout: later opnieuw proberen
+    providers: dict[str, ProviderStats] = field(default_factory=dict)   # key: "web:<host>"
+
+
+# -----------------------------
+# Per proces: sessions + VAPID (na een fork opnieuw)
+# -----------------------------
+_lock = threading.Lock()
+_state: dict = {"pid": None, "sessions": {}, "jwts": {}, "vapid": None}
+
+
+def _proc_state() -> dict:
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        _state.update(pid=pid, sessions={}, jwts={}, vapid=None)
+    return _state
+
+
+def _origin(endpoint: str) -> str:
+    parsed = urlparse(endpoint)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _session_for(origin: str) -> requests.Session:
+    with _lock:
+        sessions = _proc_state()["sessions"]
+        session = sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=WEBPUSH_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            sessions[origin] = session
+        return session
+
+
+def _vapid_headers(aud: str) -> dict:
+    """
+    Authorization header voor deze audience; hergebruikt tot VAPID_JWT_MARGIN voor exp.
+    """
+    now = int(time.time())
+    with _lock:
+        state = _proc_state()
+        cached = state["jwts"].get(aud)
+        if cached and cached[1] - VAPID_JWT_MARGIN > now:
+            return dict(cached[0])
+
+        if state["vapid"] is None:
+            state["vapid"] = Vapid.from_string(private_key=settings.VAPID_PRIVATE_KEY)
+        exp = now + VAPID_JWT_LIFETIME
+        headers = state["vapid"].sign({"sub": settings.VAPID_SUB, "aud": aud, "exp": exp})
+        state["jwts"][aud] = (headers, exp)
+        return dict(headers)
+
+
+def _provider(endpoint: str) -> str:
+    return f"web:{urlparse(endpoint).hostname or ''}"
+
+
+def _send_one(target: WebPushTarget, data: str) -> tuple[Optional[int], float]:
+    """
+    Return: (HTTP status (None bij een netwerkfout), duur in ms).
+    """
+    origin = _origin(target.endpoint)
+    started = time.perf_counter()
+    try:
+        response = WebPusher(
+            {"endpoint": target.endpoint, "keys": {"p256dh": target.p256dh, "auth": target.auth}},
+            requests_session=_session_for(origin),
+        ).send(
+            data,
+            _vapid_headers(origin),
+            ttl=WEBPUSH_TTL,
+            timeout=WEBPUSH_TIMEOUT,
+        )
+    except Exception:
+        logger.warning("Webpush naar %s mislukt", origin, exc_info=True)
+        return None, (time.perf_counter() - started) * 1000
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+def send_webpush_many(
+    payload: dict,
+    targets: Iterable[WebPushTarget],
+    *,
+    workers: int = WEBPUSH_WORKERS,
+    delete_gone: bool = True,
+) -> WebPushResult:
+    """
+    Verstuurt payload naar alle targets, parallel. Subscriptions die de push service
+    niet meer kent (404/410/403) worden in één query verwijderd (delete_gone).
+    """
+    targets = list(targets)
+    result = WebPushResult()
+    if not targets:
+        return result
+
+    data = json.dumps(payload)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        outcomes = list(pool.map(lambda t: _send_one(t, data), targets))
+
+    for target, (status, elapsed_ms) in zip(targets, outcomes):
+        stats = result.providers.setdefault(_provider(target.endpoint), ProviderStats())
+        stats.latency_ms.append(elapsed_ms)
+        if status is not None and status <= 202:
+            result.sent += 1
+            stats.sent += 1
+            continue
+        if status is None or status in RETRY_STATUSES or status >= 500:
+            # nog niet mislukt: telt pas als failed als ook de laatste poging faalt
+            result.retry.append(target.id)
+            stats.retry += 1
+            continue
+        result.failed += 1
+        stats.failed += 1
+        if status in GONE_STATUSES:
+            result.gone.append(target.id)
+            stats.gone += 1
+
+    if delete_gone and result.gone:
+        from core.models import PushSubscription
+        from core.utils.push.audience import bump_push_audience_on_commit
+        deleted, _ = PushSubscription.objects.filter(id__in=result.gone).delete()
+        if deleted:
+            bump_push_audience_on_commit()
+
+    return result
@@ -0,0 +1,197 @@
+# core/utils/storage_batch.py
+"""
+Batch verwijderen uit storage.
+
+S3 (storage met .bucket): keys verzamelen en in één DeleteObjects call per
+max 1000 keys verwijderen, met retries voor keys die S3 (tijdelijk) weigert.
+Andere storages (FileSystemStorage in DEV, of een stand-in in tests): per
+bestand storage.delete(), zelfde interface en zelfde report.
+
+    with BatchDeleter() as d:
+        d.add("news/news.abc.pdf")
+        d.add_prefix("cache/news/abc")
+    d.report  # {"deleted": 2, "failed": [], "dry_run": False, "keys": [...]}
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Iterable
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+S3_DELETE_BATCH = 1000          # max aantal keys per DeleteObjects call
+DELETE_RETRIES = 3
+DELETE_RETRY_BACKOFF = 0.5      # seconden, verdubbelt per poging
+
+# Foutcodes van DeleteObjects waarbij opnieuw proberen zin heeft
+RETRYABLE_CODES = {"InternalError", "SlowDown", "ServiceUnavailable", "RequestTimeout"}
+
+
+class BatchDeleter:
+    def __init__(
+        self,
+        storage=None,
+        *,
+        batch_size: int = S3_DELETE_BATCH,
+        retries: int = DELETE_RETRIES,
+        dry_run: bool = False,
+    ):
+        if storage is None:
+            from django.core.files.storage import default_storage
+            storage = default_storage
+
+        self.storage = storage
+        self.batch_size = max(1, min(batch_size, S3_DELETE_BATCH))
+        self.retries = retries
+        self.dry_run = dry_run
+
+        self._pending: list[str] = []
+        self._prune_dirs: set[str] = set()
+        self.deleted: list[str] = []
+        self.failed: list[str] = []
+
+    # ----- context manager: flush bij verlaten (niet na een exception) -----
+    def __enter__(self) -> "BatchDeleter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+
+    @property
+    def is_s3(self) -> bool:
+        return hasattr(self.storage, "bucket")
+
+    def _key(self, name: str) -> str:
+        location = (getattr(self.storage, "location", "") or "").strip("/")
+        name = name.lstrip("/")
+        return f"{location}/{name}" if location else name
+
+    def _name(self, key: str) -> str:
+        location = (getattr(self.storage, "location", "") or "").strip("/")
+        return key[len(location) + 1:] if location and key.startswith(f"{location}/") else key
+
+    # ----- verzamelen -----
+    def add(self, name: str) -> None:
+        """
+        name: pad relatief aan de storage root (bv. "news/news.<hash>.pdf").
+        """
+        if not name:
+            return
+        self._pending.append(name)
+        if self.is_s3 and len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, names: Iterable[str]) -> None:
+        for name in names:
+            self.add(name)
+
+    def add_prefix(self, prefix: str) -> int:
+        """
+        Alles onder prefix ("map") toevoegen. S3: één gepagineerde LIST; lokaal: os.walk.
+        Returns number of added keys.
+        """
+        prefix = prefix.strip("/")
+        if not prefix:
+            raise ValueError("add_prefix vereist een niet-lege prefix")
+
+        added = 0
+        if self.is_s3:
+            for obj in self.storage.bucket.objects.filter(Prefix=self._key(prefix) + "/"):
+                if obj.key.endswith("/"):
+                    continue
+                self.add(self._name(obj.key))
+                added += 1
+            return added
+
+        root = self.storage.path(prefix)
+        for dirpath, _dirs, files in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, self.storage.path("")).replace(os.sep, "/")
+            for filename in files:
+                self.add(f"{rel_dir}/{filename}")
+                added += 1
+        self._prune_dirs.add(prefix)
+        return added
+
+    # ----- verwijderen -----
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        if self.dry_run:
+            self.deleted.extend(pending)
+            return
+
+        if self.is_s3:
+            for start in range(0, len(pending), self.batch_size):
+                self._delete_s3_batch(pending[start:start + self.batch_size])
+        else:
+            for name in pending:
+                try:
+                    self.storage.delete(name)
+                    self.deleted.append(name)
+                except Exception:
+                    logger.exception("Verwijderen mislukt: %s", name)
+                    self.failed.append(name)
+            self._prune_empty_dirs()
+
+    def _delete_s3_batch(self, names: list[str]) -> None:
+        todo = names
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(DELETE_RETRY_BACKOFF * (2 ** (attempt - 1)))
+            try:
+                resp = self.storage.bucket.delete_objects(
+                    Delete={"Objects": [{"Key": self._key(n)} for n in todo], "Quiet": True},
+                )
+            except (ClientError, BotoCoreError):
+                logger.warning("DeleteObjects mislukt (poging %s/%s)", attempt + 1, self.retries + 1, exc_info=True)
+                continue
+
+            errors = resp.get("Errors") or []
+            retry = {self._name(e["Key"]) for e in errors if e.get("Code") in RETRYABLE_CODES}
+            hard = {self._name(e["Key"]) for e in errors} - retry
+            for name in hard:
+                logger.error("Verwijderen geweigerd door S3: %s", name)
+            self.failed.extend(n for n in todo if n in hard)
+            self.deleted.extend(n for n in todo if n not in retry and n not in hard)
+
+            todo = [n for n in todo if n in retry]
+            if not todo:
+                return
+
+        self.failed.extend(todo)
+
+    def _prune_empty_dirs(self) -> None:
+        # Lokaal: lege mappen onder een add_prefix() root opruimen (S3 heeft geen mappen)
+        dirs, self._prune_dirs = self._prune_dirs, set()
+        for prefix in dirs:
+            root = self.storage.path(prefix)
+            for dirpath, _dirs, _files in sorted(os.walk(root), key=lambda w: -len(w[0])):
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+
+    @property
+    def report(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "deleted": len(self.deleted),
+            "failed": list(self.failed),
+            "keys": list(self.deleted),
+        }
+
+
+def delete_names(names: Iterable[str], *, storage=None, dry_run: bool = False) -> dict:
+    """
+    Shortcut: verwijder names in batches en geef het report terug.
+    """
+    with BatchDeleter(storage, dry_run=dry_run) as d:
+        d.add_many(names)
+    return d.report
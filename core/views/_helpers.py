@@ -11,10 +11,9 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.staticfiles import finders
 from django.http import HttpRequest
 
-from core.permissions_cache import get_cached_permset
+from core.permissions_cache import get_cached_permset, user_ids_with_perm
 from core.models import NotificationPreferences
-
-from weasyprint import HTML, CSS
+from core.utils.pdf_export import render_pdf
 
 # ===== PATHS =====
 MEDIA_ROOT = Path(settings.MEDIA_ROOT)
@@ -188,6 +187,15 @@ def can(obj, codename: str) -> bool:
 
     return perm in get_cached_permset(user)
 
+
+def users_who_can(users, codename: str) -> set[int]:
+    """
+    Bulk variant van can(user, codename) voor audiences (push, mail):
+    set met user ids die het mogen, in een vast aantal Redis/DB round-trips.
+    """
+    perm = codename if "." in codename else f"core.{codename}"
+    return user_ids_with_perm(users, perm)
+
 # ===== Clear dir voor rooster =====
 
 def clear_dir(p: Path):
@@ -233,116 +241,8 @@ def _static_abs_path(static_path: str) -> str:
     return path
 
 def _render_pdf(html: str, *, base_url: str) -> bytes:
-    css = CSS(string="""
-        :root { --accent: #062A5E; }  /* donkerder blauw */
-
-        @page { size: A4; margin: 14mm; }
-
-        body {
-          font-family: Arial, sans-serif;
-          font-size: 11pt;
-          color: #111;
-          background: #fff;
-        }
-
-        .pdf-header {
-          display: flex;
-          align-items: center;
-          gap: 16px;
-          border-bottom: 2px solid var(--accent);
-          padding-bottom: 12px;
-          margin-bottom: 14px;
-        }
-
-        .pdf-logo {
-          width: 100px;
-          height: auto;
-          object-fit: contain;
-        }
-
-        .pdf-title {
-          font-size: 20pt;
-          font-weight: 700;
-          margin: 0;
-        }
-
-        .pdf-submeta {
-          margin-top: 6px;
-          font-size: 10pt;
-          color: #444;
-          line-height: 1.4;
-        }
-
-        .prepared-by {
-          margin-top: 6px;
-          font-size: 10pt;
-        }
-
-        .section-title {
-          font-size: 13pt;
-          font-weight: 700;
-          margin: 20px 0 10px;
-          color: var(--accent);
-        }
-
-        .group-title {
-          font-size: 11pt;
-          font-weight: 700;
-          margin-top: 14px;
-          color: var(--accent);
-        }
-
-        table {
-          width: 100%;
-          border-collapse: collapse;
-          margin-top: 8px;
-        }
-
-        th, td {
-          border: 1px solid #ddd;
-          padding: 7px 8px;
-          vertical-align: top;
-        }
-
-        th {
-          background: #f4f6fb;
-          font-weight: 700;
-        }
-
-        .muted { color: #666; }
-
-        .comment-box {
-          margin-top: 10px;
-          padding: 10px;
-          border-left: 4px solid var(--accent);
-          background: #f9faff;
-        }
-
-        .comment-label {
-          font-weight: 700;
-          margin-bottom: 4px;
-        }
-
-        .divider {
-          border-top: 1px solid #eee;
-          margin: 18px 0;
-        }
-
-        .toc-link {
-          color: var(--accent);
-          text-decoration: none;
-        }
-
-        /* Nieuw: elke patiënt op nieuwe pagina in afdeling export */
-        .patient-page {
-          page-break-before: always;
-        }
-        .patient-page.first-patient {
-          page-break-before: auto;
-        }
-    """)
-
-    return HTML(string=html, base_url=base_url).write_pdf(stylesheets=[css])
+    # warme stylesheet/fonts; vanuit een request via de pdf workers (core/utils/pdf_export.py)
+    return render_pdf(html, base_url=base_url)
 
 # === Notification preferences helpers ===
 def _get_prefs(user) -> Optional[NotificationPreferences]:
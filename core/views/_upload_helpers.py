@@ -1,19 +1,34 @@
 # core/views/_upload_helpers.py
 from __future__ import annotations
 
+import base64
 import hashlib
+import json
+import os
 import shutil
+import tempfile
+from contextlib import contextmanager
 from io import BytesIO
 from pathlib import Path
-from typing import Iterable, Optional, Tuple
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
-import fitz  # PyMuPDF
 from PIL import Image  # pillow
 
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import default_storage
 
+from core.utils.pdf_render import (
+    PdfSource,
+    iter_rendered_pages,
+    open_pdf,
+    page_fingerprint,
+    page_pixel_size,
+    render_page_bytes,
+)
+from core.utils.storage_batch import BatchDeleter
+
 MEDIA_ROOT = Path(settings.MEDIA_ROOT)
 CACHE_DIR = Path(settings.CACHE_DIR)
 
@@ -26,9 +41,40 @@ DEFAULT_WEBP_LOSSLESS = False     # lossy = kleiner + vaak sneller
 DEFAULT_WEBP_QUALITY = 90         # 70–85 is meestal prima
 DEFAULT_WEBP_METHOD = 4           # 0–6 (lager = sneller, iets groter)
 
+# Preview tiers: thumb + screen worden direct gerenderd (srcset in de viewer),
+# zoom (DEFAULT_DPI, page_XXX.<ext> zoals oude caches) pas bij de eerste aanvraag.
+PREVIEW_TIERS = {"thumb": 48, "screen": 120}
+PREVIEW_LQIP_WIDTH = 16          # inline placeholder (data-uri in het manifest), ~200 bytes
+PREVIEW_ZOOM_KEY = "pdfzoom:{base_dir}:{page}"
+PREVIEW_ZOOM_LOCK_TTL = 60 * 2
+
+# Parallel renderen: pagina's over een process pool verdelen (alle cores)
+DEFAULT_RENDER_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_PAGES = 4            # onder dit aantal weegt het opstarten van de pool niet op
+
+# Streaming: uploads/downloads in blokken hashen en kopiëren (geen hele PDF in geheugen)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
 # Legacy support: oude PNG caches blijven werken
 ALLOW_LEGACY_PNG = True
 
+# Manifest naast de previews (cache/.../<hash>/manifest.json), gecached in Redis.
+# Leespaden gebruiken alleen het manifest en doen nooit een listdir (S3 LIST).
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 3             # v2: fingerprint per pagina, v3: tiers + source
+PREVIEW_MANIFEST_KEY = "pdfmanifest:{base_dir}"
+PREVIEW_MANIFEST_TTL = 60 * 60 * 24 * 7
+PREVIEW_MANIFEST_MISS_TTL = 60    # geen manifest.json: kort onthouden, niet elke view een GET
+
+# Render-status in Redis (achtergrond rendering via Celery)
+PREVIEW_STATE_KEY = "pdfpreview:{base_dir}"
+PREVIEW_STATE_TTL = 60 * 30       # een hangende/gecrashte render blokkeert max 30 min
+
+# Pagina's die een (nog lopende of afgebroken) render al heeft opgeslagen, met hun
+# manifest-entry. Een herstart gaat daarmee verder zonder listdir of HEAD per bestand.
+PREVIEW_PROGRESS_KEY = "pdfprogress:{base_dir}"
+PREVIEW_PROGRESS_TTL = 60 * 60 * 24
+
 
 def is_local_media() -> bool:
     return bool(getattr(settings, "SERVE_MEDIA_LOCALLY", False) or settings.DEBUG)
@@ -38,6 +84,37 @@ def hash_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()[:16]
 
 
+def hash_chunks(chunks: Iterable[bytes]) -> str:
+    """
+    Zelfde hash als hash_bytes, maar blok voor blok.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def hash_path(path: Path) -> str:
+    with open(path, "rb") as fh:
+        return hash_chunks(iter(lambda: fh.read(STREAM_CHUNK_SIZE), b""))
+
+
+def hash_upload(uploaded_file) -> str:
+    """
+    Hash een UploadedFile via chunks() (grote uploads staan al als temp file op disk)
+    en zet de pointer terug voor het opslaan.
+    """
+    if hasattr(uploaded_file, "chunks"):
+        h = hash_chunks(uploaded_file.chunks(STREAM_CHUNK_SIZE))
+    else:
+        h = hash_chunks(iter(lambda: uploaded_file.read(STREAM_CHUNK_SIZE), b""))
+    try:
+        uploaded_file.seek(0)
+    except Exception:
+        pass
+    return h
+
+
 def clear_dir(p: Path) -> None:
     if not p.exists():
         return
@@ -88,6 +165,44 @@ def _save_bytes(rel_path: str, data: bytes) -> None:
         default_storage.save(rel_path, ContentFile(data))
 
 
+def _save_stream(rel_path: str, uploaded_file) -> None:
+    """
+    Zelfde als _save_bytes, maar streamt de upload blok voor blok weg.
+    In PROD doet boto3 (AWS_S3_TRANSFER_CONFIG) een multipart upload voor grote bestanden.
+    """
+    if is_local_media():
+        abs_path = MEDIA_ROOT / rel_path
+        abs_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(abs_path, "wb") as out:
+            for chunk in uploaded_file.chunks(STREAM_CHUNK_SIZE):
+                out.write(chunk)
+    else:
+        uploaded_file.seek(0)
+        default_storage.save(rel_path, File(uploaded_file, name=Path(rel_path).name))
+
+
+def _storage_key(rel_path: str) -> str:
+    # S3 object key voor een storage-relatief pad (location prefix, bv. "media/")
+    return f"{default_storage.location}/{rel_path}".lstrip("/")
+
+
+def _copy_storage_file(src_rel: str, dst_rel: str) -> None:
+    """
+    Kopie binnen media storage. PROD: server-side CopyObject (geen download/upload).
+    """
+    if is_local_media():
+        dst = MEDIA_ROOT / dst_rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(MEDIA_ROOT / src_rel, dst)
+        return
+
+    bucket = default_storage.bucket
+    bucket.Object(_storage_key(dst_rel)).copy_from(
+        CopySource={"Bucket": bucket.name, "Key": _storage_key(src_rel)},
+        MetadataDirective="COPY",
+    )
+
+
 def _delete_path(rel_path: str) -> None:
     if not rel_path:
         return
@@ -103,15 +218,13 @@ def _delete_path(rel_path: str) -> None:
             pass
 
 
-def _listdir_storage(prefix: str) -> list[str]:
-    """
-    Geeft alleen bestandsnamen (geen subdirs).
-    """
+def _storage_exists(rel_path: str) -> bool:
+    if is_local_media():
+        return (MEDIA_ROOT / rel_path).exists()
     try:
-        _dirs, files = default_storage.listdir(prefix)
+        return default_storage.exists(rel_path)
     except Exception:
-        files = []
-    return files
+        return False
 
 
 def _cache_rel_str(cache_root: Path) -> str:
@@ -173,24 +286,27 @@ def save_upload_with_hash(
     webp_lossless: bool = DEFAULT_WEBP_LOSSLESS,
     webp_quality: int = DEFAULT_WEBP_QUALITY,
     webp_method: int = DEFAULT_WEBP_METHOD,
+    skip_if_exists: bool = False,
 ) -> tuple[str, str]:
     """
     Slaat upload gehashed op in target_dir (onder MEDIA_ROOT).
 
     - PDF: blijft PDF (je wilt PDF bewaren als bron).
     - Image: wordt standaard geconverteerd naar WEBP (lossless nu), tenzij convert_images_to_webp=False.
+    - skip_if_exists: bestaat <base_name>.<hash><ext> al, dan wordt er niets geschreven
+      (content-addressed opslag, zie core/utils/blobs.py).
 
     Return:
       (rel_path, file_hash)
     """
-    raw = read_upload_bytes(uploaded_file)
     ext_in = (Path(uploaded_file.name).suffix or "").lower()
 
     allowed = {e.lower() for e in allowed_exts}
     if ext_in not in allowed:
         raise ValueError(f"Unsupported file type '{ext_in}'. Toegestaan: {', '.join(sorted(allowed))}")
 
-    h = hash_bytes(raw)
+    # Hash tijdens het streamen; de upload zelf komt niet als één bytes object in geheugen
+    h = hash_upload(uploaded_file)
 
     # optioneel: bestaande in map opruimen (rooster-week: wil je max 1 pdf)
     if clear_existing:
@@ -209,24 +325,31 @@ def save_upload_with_hash(
                     except Exception:
                         pass
 
-    # bepaal output bytes/ext
-    if ext_in == ".pdf":
-        out_bytes = raw
-        ext_out = ".pdf"
-    else:
-        if convert_images_to_webp:
-            out_bytes = _image_bytes_to_webp_bytes(
-                raw,
-                lossless=webp_lossless,
-                quality=webp_quality,
-                method=webp_method,
-            )
-            ext_out = ".webp"
-        else:
-            out_bytes = raw
-            ext_out = ext_in
+    if skip_if_exists:
+        ext_out = ext_in if ext_in == ".pdf" or not convert_images_to_webp else ".webp"
+        rel_dir = _media_relpath(target_dir)
+        filename = f"{base_name}.{h}{ext_out}"
+        rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+        if _storage_exists(rel_path):
+            return rel_path, h
+
+    # PDF (en images zonder conversie): ongewijzigd wegstreamen
+    if ext_in == ".pdf" or not convert_images_to_webp:
+        filename = f"{base_name}.{h}{ext_in}"
+        rel_dir = _media_relpath(target_dir)
+        rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
+        _save_stream(rel_path, uploaded_file)
+        return rel_path, h
+
+    # Image -> webp: Pillow heeft de bytes toch nodig (images zijn klein)
+    out_bytes = _image_bytes_to_webp_bytes(
+        read_upload_bytes(uploaded_file),
+        lossless=webp_lossless,
+        quality=webp_quality,
+        method=webp_method,
+    )
 
-    filename = f"{base_name}.{h}{ext_out}"
+    filename = f"{base_name}.{h}.webp"
     rel_dir = _media_relpath(target_dir)
     rel_path = f"{rel_dir}/{filename}" if rel_dir else filename
 
@@ -234,8 +357,124 @@ def save_upload_with_hash(
     return rel_path, h
 
 
+# -----------------------------
+# Preview manifest
+# -----------------------------
+def _manifest_cache_key(cache_root: Path, file_hash: str) -> str:
+    return PREVIEW_MANIFEST_KEY.format(base_dir=_cache_base_dir(cache_root, file_hash))
+
+
+def _build_manifest(*, fmt: str, pages: list[dict], render: dict, source: str = "") -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "n_pages": len(pages),
+        "format": fmt,
+        "pages": pages,
+        "render": render,
+        "source": source,
+    }
+
+
+def write_preview_manifest(*, cache_root: Path, file_hash: str, manifest: dict) -> None:
+    """
+    Schrijft manifest.json naast de previews en zet hem in Redis.
+    """
+    data = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+
+    if is_local_media():
+        out_dir = cache_root / file_hash
+        out_dir.mkdir(parents=True, exist_ok=True)
+        (out_dir / MANIFEST_NAME).write_bytes(data)
+    else:
+        path = f"{_cache_base_dir(cache_root, file_hash)}/{MANIFEST_NAME}"
+        # media storage overschrijft niet (file_overwrite=False) -> eerst weg
+        try:
+            default_storage.delete(path)
+        except Exception:
+            pass
+        default_storage.save(path, ContentFile(data))
+
+    try:
+        cache.set(_manifest_cache_key(cache_root, file_hash), manifest, timeout=PREVIEW_MANIFEST_TTL)
+    except Exception:
+        pass
+
+
+def get_preview_manifest(*, cache_root: Path, file_hash: str, cached_only: bool = False) -> Optional[dict]:
+    """
+    Manifest voor deze hash: eerst Redis, dan één GET op manifest.json. Geen listdir.
+    Een ontbrekend manifest wordt PREVIEW_MANIFEST_MISS_TTL onthouden (write_preview_manifest
+    overschrijft dat). cached_only: alleen Redis, nooit storage (bijv. prefetch).
+    """
+    if not file_hash:
+        return None
+
+    key = _manifest_cache_key(cache_root, file_hash)
+    try:
+        manifest = cache.get(key)
+    except Exception:
+        manifest = None
+    if manifest is not None:
+        return manifest or None
+    if cached_only:
+        return None
+
+    try:
+        if is_local_media():
+            raw = (cache_root / file_hash / MANIFEST_NAME).read_bytes()
+        else:
+            with default_storage.open(f"{_cache_base_dir(cache_root, file_hash)}/{MANIFEST_NAME}", "rb") as f:
+                raw = f.read()
+        manifest = json.loads(raw)
+    except Exception:
+        manifest = None
+
+    try:
+        if manifest is None:
+            cache.set(key, {}, timeout=PREVIEW_MANIFEST_MISS_TTL)
+        else:
+            cache.set(key, manifest, timeout=PREVIEW_MANIFEST_TTL)
+    except Exception:
+        pass
+    return manifest
+
+
+def forget_preview_manifest(*, cache_root: Path, file_hash: str) -> None:
+    try:
+        cache.delete(_manifest_cache_key(cache_root, file_hash))
+    except Exception:
+        pass
+
+
+def seed_preview_manifest(*, cache_root: Path, file_hash: str, n_pages: int, ext: str) -> dict:
+    """
+    Manifest voor bestaande (pre-manifest) caches waarvan het aantal pagina's al
+    bekend is, bijv. uit RosterWeek.n_pages/preview_ext.
+    """
+    fmt = (ext or DEFAULT_PREVIEW_FORMAT).lower()
+    pages = [{"name": f"page_{i:03d}.{fmt}"} for i in range(1, n_pages + 1)]
+    manifest = _build_manifest(fmt=fmt, pages=pages, render={})
+    write_preview_manifest(cache_root=cache_root, file_hash=file_hash, manifest=manifest)
+    return manifest
+
+
+def _page_name(page_no: int, fmt: str, tier: Optional[str] = None) -> str:
+    # zoom tier heeft de oude naam (page_001.webp), de rest page_001.<tier>.webp
+    return f"page_{page_no:03d}.{tier}.{fmt}" if tier else f"page_{page_no:03d}.{fmt}"
+
+
+def _lqip_data_uri(data: bytes, fmt: str) -> str:
+    return f"data:image/{fmt};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _hash_pdf_source(pdf_source: PdfSource) -> str:
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return hash_bytes(bytes(pdf_source))
+    return hash_path(Path(pdf_source))
+
+
 def render_pdf_to_previews(
-    pdf_bytes: bytes,
+    pdf_source: PdfSource,
     *,
     cache_root: Path,
     file_hash: Optional[str] = None,
@@ -244,170 +483,514 @@ def render_pdf_to_previews(
     webp_lossless: bool = DEFAULT_WEBP_LOSSLESS,
     webp_quality: int = DEFAULT_WEBP_QUALITY,
     webp_method: int = DEFAULT_WEBP_METHOD,
+    on_page: Optional[Callable[[int, int, str], None]] = None,
+    workers: int = DEFAULT_RENDER_WORKERS,
+    reuse_from: Optional[tuple[Path, str]] = None,
+    source_rel: str = "",
 ) -> tuple[str, int, str]:
     """
-    Rendert een PDF naar page_XXX.<ext> in cache.
+    Rendert een PDF naar page_XXX.<tier>.<ext> (PREVIEW_TIERS) in cache, pagina voor pagina.
+    De zoom tier (dpi) wordt later per pagina gerenderd door ensure_zoom_preview(),
+    vanuit source_rel (het opgeslagen PDF-pad, komt in het manifest).
+    pdf_source: bytes of een pad (pad: PyMuPDF leest de PDF van disk, niet uit geheugen).
+
+    - Pagina's die al bestaan worden overgeslagen (een afgebroken render gaat verder
+      waar hij gebleven was). Welke dat zijn staat in het manifest of in de voortgang
+      in Redis (PREVIEW_PROGRESS_KEY); er wordt niets gelist of per bestand opgevraagd.
+    - workers > 1 en minimaal PARALLEL_MIN_PAGES te renderen: de pagina's worden over
+      een process pool verdeeld; volgorde en bestandsnamen blijven gelijk.
+    - on_page(page_no, n_pages, ext) wordt aangeroepen zodra een pagina is opgeslagen,
+      zodat de viewer pagina's kan tonen terwijl de rest nog rendert.
+    - reuse_from=(cache_root, hash) van een vorige versie (bv. het vorige rooster van
+      de week): pagina's met dezelfde fingerprint worden gekopieerd i.p.v. gerenderd.
 
     Return: (hash, n_pages, ext_used)
     """
-    h = file_hash or hash_bytes(pdf_bytes)
+    h = file_hash or _hash_pdf_source(pdf_source)
     fmt = (preview_format or "webp").lower()
     if fmt not in ("webp", "png"):
         fmt = "webp"
 
-    # DEV: filesystem
-    if is_local_media():
+    # Al volledig gerenderd (manifest met tiers aanwezig) -> niets te doen
+    manifest = get_preview_manifest(cache_root=cache_root, file_hash=h)
+    if (
+        manifest
+        and manifest.get("format") == fmt
+        and manifest.get("n_pages")
+        and all(p.get("tiers") for p in manifest.get("pages") or [])
+    ):
+        n_pages = int(manifest["n_pages"])
+        if on_page is not None:
+            for i in range(n_pages):
+                on_page(i + 1, n_pages, fmt)
+        return h, n_pages, fmt
+
+    local = is_local_media()
+    base_dir = _cache_base_dir(cache_root, h)
+    if local:
         out_dir = cache_root / h
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        # skip als al bestaat
-        existing = list(out_dir.glob(f"page_*.{fmt}"))
-        if existing:
-            return h, len(existing), fmt
-
-        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-            for i, page in enumerate(doc):
-                pix = page.get_pixmap(dpi=dpi, alpha=False)
-                filename = f"page_{i+1:03d}.{fmt}"
-                out_path = out_dir / filename
+    render_opts = {
+        "dpi": dpi,
+        "tiers": PREVIEW_TIERS,
+        "webp_lossless": webp_lossless,
+        "webp_quality": webp_quality,
+        "webp_method": webp_method,
+    }
+
+    with open_pdf(pdf_source) as doc:
+        n_pages = doc.page_count
+        sizes = [
+            {tier: page_pixel_size(doc[i], tier_dpi) for tier, tier_dpi in [*PREVIEW_TIERS.items(), (None, dpi)]}
+            for i in range(n_pages)
+        ]
+        fingerprints = [page_fingerprint(doc, i) for i in range(n_pages)]
+
+    # Ongewijzigde pagina's uit de vorige versie (zelfde fingerprint + zelfde render-opties)
+    reusable: dict[str, dict] = {}
+    if reuse_from and reuse_from[1] and reuse_from[1] != h:
+        prev = get_preview_manifest(cache_root=reuse_from[0], file_hash=reuse_from[1])
+        if prev and prev.get("format") == fmt and prev.get("render") == render_opts:
+            reusable = {p["fingerprint"]: p for p in prev.get("pages") or [] if p.get("fingerprint") and p.get("tiers")}
+
+    # Klaar: pagina's met tiers in het manifest (andere render-opties tellen niet) of in
+    # de voortgang van een afgebroken render; hun entry (afmetingen, grootte, lqip) blijft staan.
+    progress_key = PREVIEW_PROGRESS_KEY.format(base_dir=base_dir)
+    done: dict[int, dict] = {}
+    if manifest and manifest.get("format") == fmt and manifest.get("render") == render_opts:
+        done.update({i: p for i, p in enumerate(manifest.get("pages") or []) if p.get("tiers")})
+    try:
+        progress = cache.get(progress_key)
+    except Exception:
+        progress = None
+    if progress and progress.get("format") == fmt and progress.get("render") == render_opts:
+        done.update({int(i): p for i, p in (progress.get("pages") or {}).items()})
+    done = {
+        i: p for i, p in done.items()
+        if i < n_pages and p.get("fingerprint") == fingerprints[i]
+    }
+
+    tier_names = [{tier: _page_name(i + 1, fmt, tier) for tier in PREVIEW_TIERS} for i in range(n_pages)]
+    todo = [i for i in range(n_pages) if i not in done and fingerprints[i] not in reusable]
+
+    rendered = iter_rendered_pages(
+        pdf_source,
+        todo,
+        workers=workers if len(todo) >= PARALLEL_MIN_PAGES else 1,
+        tiers=PREVIEW_TIERS,
+        lqip_width=PREVIEW_LQIP_WIDTH,
+        fmt=fmt,
+        webp_lossless=webp_lossless,
+        webp_quality=webp_quality,
+        webp_method=webp_method,
+    )
 
-                if fmt == "png":
-                    out_path.write_bytes(pix.tobytes("png"))
+    pages = []
+    for i in range(n_pages):
+        if i in done:
+            pages.append(done[i])
+            if on_page is not None:
+                on_page(i + 1, n_pages, fmt)
+            continue
+
+        tier_sizes: dict[str, Optional[int]] = {}
+        lqip = None
+        if fingerprints[i] in reusable:
+            prev_tiers = reusable[fingerprints[i]]["tiers"]
+            for tier, filename in tier_names[i].items():
+                _copy_storage_file(
+                    f"{_cache_base_dir(reuse_from[0], reuse_from[1])}/{prev_tiers[tier]['name']}",
+                    f"{base_dir}/{filename}",
+                )
+                tier_sizes[tier] = prev_tiers[tier].get("size")
+            lqip = reusable[fingerprints[i]].get("lqip")
+        else:
+            _index, data = next(rendered)
+            for tier, filename in tier_names[i].items():
+                if local:
+                    (out_dir / filename).write_bytes(data[tier])
                 else:
-                    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
-                    out_path.write_bytes(
-                        _pil_to_webp_bytes(img, lossless=webp_lossless, quality=webp_quality, method=webp_method)
-                    )
-
-        n_pages = len(list(out_dir.glob(f"page_*.{fmt}")))
-        return h, n_pages, fmt
+                    default_storage.save(f"{base_dir}/{filename}", ContentFile(data[tier]))
+                tier_sizes[tier] = len(data[tier])
+            if data.get("lqip"):
+                lqip = _lqip_data_uri(data["lqip"], fmt)
+
+        width, height = sizes[i][None]
+        page = {
+            "name": _page_name(i + 1, fmt),
+            "width": width,
+            "height": height,
+            "fingerprint": fingerprints[i],
+            "lqip": lqip,
+            "tiers": {
+                tier: {
+                    "name": filename,
+                    "width": sizes[i][tier][0],
+                    "height": sizes[i][tier][1],
+                    "size": tier_sizes[tier],
+                }
+                for tier, filename in tier_names[i].items()
+            },
+        }
+        pages.append(page)
+        done[i] = page
+        try:
+            cache.set(
+                progress_key,
+                {"format": fmt, "render": render_opts, "pages": {str(k): v for k, v in done.items()}},
+                timeout=PREVIEW_PROGRESS_TTL,
+            )
+        except Exception:
+            pass
 
-    # PROD: S3
-    base_dir = _cache_base_dir(cache_root, h)
-    files = _listdir_storage(base_dir)
-    existing = [f for f in files if f.startswith("page_") and f.endswith(f".{fmt}")]
-    if existing:
-        return h, len(existing), fmt
-
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-        for i, page in enumerate(doc):
-            pix = page.get_pixmap(dpi=dpi, alpha=False)
-            filename = f"page_{i+1:03d}.{fmt}"
-            storage_path = f"{base_dir}/{filename}"
-
-            if fmt == "png":
-                default_storage.save(storage_path, ContentFile(pix.tobytes("png")))
-            else:
-                img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
-                default_storage.save(
-                    storage_path,
-                    ContentFile(_pil_to_webp_bytes(img, lossless=webp_lossless, quality=webp_quality, method=webp_method)),
-                )
+        if on_page is not None:
+            on_page(i + 1, n_pages, fmt)
 
-    files = _listdir_storage(base_dir)
-    n_pages = len([f for f in files if f.startswith("page_") and f.endswith(f".{fmt}")])
+    write_preview_manifest(
+        cache_root=cache_root,
+        file_hash=h,
+        manifest=_build_manifest(fmt=fmt, pages=pages, render=render_opts, source=source_rel),
+    )
+    try:
+        cache.delete(progress_key)
+    except Exception:
+        pass
     return h, n_pages, fmt
 
 
-def list_pdf_preview_urls(
+def _zoom_view_url(cache_root: Path, file_hash: str, page_no: int) -> str:
+    from django.urls import reverse
+    from urllib.parse import urlencode
+
+    query = urlencode({"c": _cache_rel_str(cache_root), "h": file_hash, "p": page_no})
+    return f"{reverse('pdf_preview_zoom')}?{query}"
+
+
+def _preview_page(cache_root: Path, file_hash: str, page_no: int, page: dict) -> dict:
+    """
+    Eén pagina voor de viewer: src (screen), srcset (thumb + screen), de zoom link
+    en lqip (inline placeholder, of None).
+    Oude manifests zonder tiers: alles wijst naar het enige (volle) bestand.
+    """
+    tiers = page.get("tiers") or {}
+    screen = tiers.get("screen")
+    if not screen:
+        url = _cache_url(cache_root, file_hash, page["name"])
+        return {
+            "src": url,
+            "srcset": "",
+            "zoom": url,
+            "width": page.get("width"),
+            "height": page.get("height"),
+            "lqip": None,
+        }
+
+    srcset = ", ".join(
+        f"{_cache_url(cache_root, file_hash, t['name'])} {t['width']}w"
+        for t in sorted(tiers.values(), key=lambda t: t["width"])
+    )
+    return {
+        "src": _cache_url(cache_root, file_hash, screen["name"]),
+        "srcset": srcset,
+        "zoom": _zoom_view_url(cache_root, file_hash, page_no),
+        "width": screen["width"],
+        "height": screen["height"],
+        "lqip": page.get("lqip"),
+    }
+
+
+def list_pdf_preview_pages(
     *,
     cache_root: Path,
     file_hash: str,
     prefer_format: str = DEFAULT_PREVIEW_FORMAT,
     allow_legacy_png: bool = ALLOW_LEGACY_PNG,
-) -> tuple[list[str], str]:
+    cached_only: bool = False,
+) -> tuple[list[dict], str]:
     """
-    Return: (urls, ext_used)
+    Return: (pages, ext_used), pages: [{"src", "srcset", "zoom", "width", "height", "lqip"}].
 
-    Prefereer webp, maar als er alleen legacy png bestaat: return png urls.
+    Leest alleen het manifest (Redis, anders manifest.json); geen listdir.
+    cached_only: alleen Redis (zie get_preview_manifest).
+    Prefereer webp, maar een legacy png manifest is ook goed als dat mag.
     """
     if not file_hash:
         return [], ""
 
-    prefer = (prefer_format or "webp").lower()
-    candidates = [prefer]
-    if allow_legacy_png and prefer != "png":
-        candidates.append("png")
+    manifest = get_preview_manifest(cache_root=cache_root, file_hash=file_hash, cached_only=cached_only)
+    if not manifest:
+        return [], ""
 
-    # DEV
-    if is_local_media():
-        folder = cache_root / file_hash
-        if not folder.exists():
-            return [], ""
-
-        for ext in candidates:
-            files = sorted([p.name for p in folder.glob(f"page_*.{ext}")])
-            if files:
-                return ([_cache_url(cache_root, file_hash, name) for name in files], ext)
+    ext = (manifest.get("format") or "").lower()
+    prefer = (prefer_format or "webp").lower()
+    if ext != prefer and not (allow_legacy_png and ext == "png"):
         return [], ""
 
-    # PROD
+    pages = [
+        _preview_page(cache_root, file_hash, i, page)
+        for i, page in enumerate(manifest.get("pages") or [], start=1)
+    ]
+    return pages, ext
+
+
+def ensure_zoom_preview(*, cache_root: Path, file_hash: str, page_no: int) -> Optional[str]:
+    """
+    Url van de zoom tier (manifest dpi) van één pagina. Bestaat die nog niet, dan gaat
+    de render naar de "previews" queue (render_zoom_preview_task) en krijgt deze
+    aanvraag de screen tier; de web worker rendert zelf niets.
+    None als de pagina niet in het manifest staat.
+    """
+    manifest = get_preview_manifest(cache_root=cache_root, file_hash=file_hash)
+    if not manifest or not 1 <= page_no <= int(manifest.get("n_pages") or 0):
+        return None
+
+    page = manifest["pages"][page_no - 1]
+    name = page["name"]
+    url = _cache_url(cache_root, file_hash, name)
+    if not page.get("tiers"):
+        # oude cache: het enige bestand is al de volle resolutie
+        return url
+
+    fallback = _cache_url(cache_root, file_hash, page["tiers"]["screen"]["name"])
     base_dir = _cache_base_dir(cache_root, file_hash)
-    files = _listdir_storage(base_dir)
+    done_key = PREVIEW_ZOOM_KEY.format(base_dir=base_dir, page=page_no)
+    try:
+        if cache.get(done_key):
+            return url
+    except Exception:
+        pass
+
+    if _storage_exists(f"{base_dir}/{name}"):
+        try:
+            cache.set(done_key, 1, timeout=PREVIEW_MANIFEST_TTL)
+        except Exception:
+            pass
+        return url
+
+    if not manifest.get("source"):
+        return fallback
+
+    # één render per pagina tegelijk; de task haalt de lock weg als hij klaar is
+    try:
+        if not cache.add(f"{done_key}:lock", 1, timeout=PREVIEW_ZOOM_LOCK_TTL):
+            return fallback
+    except Exception:
+        pass
+
+    from core.tasks import render_zoom_preview_task
+    render_zoom_preview_task.delay(_cache_rel_str(cache_root), file_hash, page_no)
+    return fallback
+
+
+def render_zoom_preview(*, cache_root: Path, file_hash: str, page_no: int) -> None:
+    """
+    Rendert de zoom tier van één pagina (Celery, queue "previews"), zie ensure_zoom_preview.
+    """
+    base_dir = _cache_base_dir(cache_root, file_hash)
+    done_key = PREVIEW_ZOOM_KEY.format(base_dir=base_dir, page=page_no)
+    try:
+        manifest = get_preview_manifest(cache_root=cache_root, file_hash=file_hash)
+        if not manifest or not manifest.get("source") or not 1 <= page_no <= int(manifest.get("n_pages") or 0):
+            return
+
+        name = manifest["pages"][page_no - 1]["name"]
+        if not _storage_exists(f"{base_dir}/{name}"):
+            render = manifest.get("render") or {}
+            try:
+                with storage_local_path(manifest["source"]) as pdf_path, open_pdf(pdf_path) as doc:
+                    data = render_page_bytes(
+                        doc[page_no - 1],
+                        dpi=render.get("dpi", DEFAULT_DPI),
+                        fmt=manifest.get("format") or DEFAULT_PREVIEW_FORMAT,
+                        webp_lossless=render.get("webp_lossless", DEFAULT_WEBP_LOSSLESS),
+                        webp_quality=render.get("webp_quality", DEFAULT_WEBP_QUALITY),
+                        webp_method=render.get("webp_method", DEFAULT_WEBP_METHOD),
+                    )
+            except FileNotFoundError:
+                # bron is vervangen/verwijderd -> screen tier blijft het maximum
+                return
+            _save_bytes(f"{base_dir}/{name}", data)
+
+        try:
+            cache.set(done_key, 1, timeout=PREVIEW_MANIFEST_TTL)
+        except Exception:
+            pass
+    finally:
+        try:
+            cache.delete(f"{done_key}:lock")
+        except Exception:
+            pass
+
+
+# -----------------------------
+# Achtergrond rendering (Celery, queue "previews")
+# -----------------------------
+def _preview_state_key(cache_root: Path, file_hash: str) -> str:
+    return PREVIEW_STATE_KEY.format(base_dir=_cache_base_dir(cache_root, file_hash))
+
+
+def get_preview_state(*, cache_root: Path, file_hash: str) -> Optional[dict]:
+    """
+    Status van een lopende render: {"status": "queued"|"rendering", "pages_done", "n_pages", "ext"}.
+    None als er niets loopt (klaar, of de status is verlopen).
+    """
+    if not file_hash:
+        return None
+    try:
+        return cache.get(_preview_state_key(cache_root, file_hash))
+    except Exception:
+        return None
 
-    for ext in candidates:
-        pages = sorted([name for name in files if name.startswith("page_") and name.endswith(f".{ext}")])
-        if pages:
-            return ([_cache_url(cache_root, file_hash, name) for name in pages], ext)
 
-    return [], ""
+def set_preview_state(*, cache_root: Path, file_hash: str, **state) -> None:
+    try:
+        cache.set(_preview_state_key(cache_root, file_hash), state, timeout=PREVIEW_STATE_TTL)
+    except Exception:
+        pass
 
 
-def ensure_pdf_previews_exist(
+def clear_preview_state(*, cache_root: Path, file_hash: str) -> None:
+    try:
+        cache.delete(_preview_state_key(cache_root, file_hash))
+    except Exception:
+        pass
+
+
+def queue_pdf_previews(
     *,
-    pdf_bytes: bytes,
+    rel_path: str,
     cache_root: Path,
-    file_hash: Optional[str] = None,
-    dpi: int = DEFAULT_DPI,
-    prefer_format: str = DEFAULT_PREVIEW_FORMAT,
-    allow_legacy_png: bool = ALLOW_LEGACY_PNG,
-    webp_lossless: bool = DEFAULT_WEBP_LOSSLESS,
-    webp_quality: int = DEFAULT_WEBP_QUALITY,
-    webp_method: int = DEFAULT_WEBP_METHOD,
-) -> tuple[str, int, str]:
+    file_hash: str,
+    roster_monday: Optional[str] = None,
+    reuse_from: Optional[tuple[Path, str]] = None,
+    discard_reuse: bool = False,
+) -> bool:
     """
-    Zorgt dat previews bestaan. Als legacy png bestaat en toegestaan: gebruik die.
-    Anders render naar prefer_format.
+    Zet het renderen van previews op de Celery queue "previews".
+    Dubbel queuen (bijv. meerdere viewers tegelijk) wordt voorkomen via cache.add.
+
+    roster_monday (iso): na de eerste pagina gaat de rooster-push de deur uit.
+    Na afloop worden n_pages/preview_ext bijgewerkt op elke RosterWeek met deze hash.
+    reuse_from=(cache_root, hash): ongewijzigde pagina's van die versie hergebruiken;
+    discard_reuse: die previews na afloop verwijderen.
+
+    Return: True als er een nieuwe render is gequeued.
     """
-    h = file_hash or hash_bytes(pdf_bytes)
+    if not rel_path or not file_hash:
+        return False
 
-    urls, ext = list_pdf_preview_urls(cache_root=cache_root, file_hash=h, prefer_format=prefer_format, allow_legacy_png=allow_legacy_png)
-    if urls and ext:
-        return h, len(urls), ext
+    from core.tasks import render_pdf_previews_task
 
-    return render_pdf_to_previews(
-        pdf_bytes,
+    state = {"status": "queued", "pages_done": 0, "n_pages": 0, "ext": DEFAULT_PREVIEW_FORMAT}
+    try:
+        added = cache.add(_preview_state_key(cache_root, file_hash), state, timeout=PREVIEW_STATE_TTL)
+    except Exception:
+        added = True
+    if not added:
+        return False
+
+    reuse_cache_rel, reuse_hash = (_cache_rel_str(reuse_from[0]), reuse_from[1]) if reuse_from else (None, None)
+    render_pdf_previews_task.delay(
+        rel_path,
+        _cache_rel_str(cache_root),
+        file_hash,
+        roster_monday,
+        reuse_cache_rel,
+        reuse_hash,
+        discard_reuse,
+    )
+    return True
+
+
+def preview_status(
+    *,
+    cache_root: Path,
+    file_hash: str,
+    prefer_format: str = DEFAULT_PREVIEW_FORMAT,
+    allow_legacy_png: bool = ALLOW_LEGACY_PNG,
+) -> tuple[list[dict], bool]:
+    """
+    Return: (pages, pending), pages zoals list_pdf_preview_pages.
+
+    Tijdens een lopende render: de pagina's die al klaar zijn (zonder listdir, alleen
+    de screen tier, afmetingen nog onbekend) en pending=True.
+    Anders de normale preview pagina's en pending=False.
+    """
+    state = get_preview_state(cache_root=cache_root, file_hash=file_hash)
+    if state:
+        ext = state.get("ext") or DEFAULT_PREVIEW_FORMAT
+        pages = [
+            {
+                "src": _cache_url(cache_root, file_hash, _page_name(i, ext, "screen")),
+                "srcset": "",
+                "zoom": _zoom_view_url(cache_root, file_hash, i),
+                "width": None,
+                "height": None,
+                "lqip": None,
+            }
+            for i in range(1, int(state.get("pages_done") or 0) + 1)
+        ]
+        return pages, True
+
+    pages, _ext = list_pdf_preview_pages(
         cache_root=cache_root,
-        file_hash=h,
-        dpi=dpi,
-        preview_format=prefer_format,
-        webp_lossless=webp_lossless,
-        webp_quality=webp_quality,
-        webp_method=webp_method,
+        file_hash=file_hash,
+        prefer_format=prefer_format,
+        allow_legacy_png=allow_legacy_png,
     )
+    return pages, False
 
 
-def delete_pdf_previews(*, cache_root: Path, file_hash: str) -> None:
+def delete_pdf_previews(*, cache_root: Path, file_hash: str, deleter: Optional[BatchDeleter] = None) -> None:
     """
-    Verwijdert zowel webp als png previews voor deze hash.
+    Verwijdert zowel webp als png previews (en het manifest) voor deze hash.
+    Met deleter worden de keys alleen verzameld (batch delete door de caller).
     """
     if not file_hash:
         return
 
+    forget_preview_manifest(cache_root=cache_root, file_hash=file_hash)
+
+    base_dir = _cache_base_dir(cache_root, file_hash)
+    if deleter is not None:
+        deleter.add_prefix(base_dir)
+        return
+
+    with BatchDeleter() as d:
+        d.add_prefix(base_dir)
+
+
+@contextmanager
+def storage_local_path(rel_path: str) -> Iterator[Path]:
+    """
+    Lokaal pad naar een opgeslagen bestand.
+    - DEV: direct MEDIA_ROOT/rel_path
+    - PROD: S3 download (boto3, in delen) naar een temp file die na afloop weg is
+    """
     if is_local_media():
-        folder = cache_root / file_hash
-        if folder.exists():
-            shutil.rmtree(folder, ignore_errors=True)
+        abs_path = MEDIA_ROOT / rel_path
+        if not abs_path.exists():
+            raise FileNotFoundError(rel_path)
+        yield abs_path
         return
 
-    base_dir = _cache_base_dir(cache_root, file_hash)
-    files = _listdir_storage(base_dir)
-    for name in files:
-        if name.startswith("page_") and (name.endswith(".webp") or name.endswith(".png")):
-            try:
-                default_storage.delete(f"{base_dir}/{name}")
-            except Exception:
-                pass
+    if not default_storage.exists(rel_path):
+        raise FileNotFoundError(rel_path)
+
+    key = _storage_key(rel_path)
+    with tempfile.NamedTemporaryFile(suffix=Path(rel_path).suffix) as tmp:
+        default_storage.bucket.Object(key).download_fileobj(tmp, Config=default_storage.transfer_config)
+        tmp.flush()
+        yield Path(tmp.name)
+
+
+def hash_storage_file(rel_path: str) -> str:
+    """
+    Hash van een opgeslagen bestand zonder het in geheugen te laden.
+    """
+    with storage_local_path(rel_path) as path:
+        return hash_path(path)
 
 
 def read_storage_bytes(rel_path: str) -> bytes:
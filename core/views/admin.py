@@ -2,7 +2,7 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
 from django.contrib.auth import get_user_model
@@ -837,4 +837,30 @@ def admin_bezorgen(request):
 
     return render(request, "admin/bezorgen.html", {
         "page_title": "Bezorgen",
-    })
\ No newline at end of file
+    })
+
+# === Push metrics ===
+
+@login_required
+def push_metrics_api(request):
+    """
+    JSON met metrics van recente push broadcasts (core/utils/push/metrics.py).
+    ?id=<broadcast_id> voor één broadcast, anders de laatste ?limit= (max 200).
+    """
+    if not can(request.user, "can_access_admin"):
+        return JsonResponse({"ok": False, "error": "Geen toegang."}, status=403)
+
+    from core.utils.push.metrics import PUSH_METRICS_KEEP, get_broadcast_metrics, recent_broadcast_metrics
+
+    broadcast_id = (request.GET.get("id") or "").strip()
+    if broadcast_id:
+        metrics = get_broadcast_metrics(broadcast_id)
+        if metrics is None:
+            return JsonResponse({"ok": False, "error": "Onbekende broadcast."}, status=404)
+        return JsonResponse({"ok": True, "broadcast": metrics})
+
+    try:
+        limit = max(1, min(int(request.GET.get("limit") or 50), PUSH_METRICS_KEEP))
+    except ValueError:
+        limit = 50
+    return JsonResponse({"ok": True, "broadcasts": recent_broadcast_metrics(limit)})
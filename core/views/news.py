@@ -5,7 +5,6 @@ from pathlib import Path
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.files.storage import default_storage
 from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
@@ -14,14 +13,22 @@ from core.models import NewsItem
 from core.forms import NewsItemForm
 from core.tasks import send_news_uploaded_push_task
 
+from core.utils.storage_batch import BatchDeleter
+from core.utils.blobs import (
+    store_blob,
+    acquire_blob,
+    release_blob,
+    is_blob_path,
+    preview_cache_root,
+    CACHE_BLOB_DIR,
+)
+
 from ._helpers import can
 from ._upload_helpers import (
-    save_upload_with_hash,
-    read_storage_bytes,
-    ensure_pdf_previews_exist,
-    list_pdf_preview_urls,
+    hash_storage_file,
+    queue_pdf_previews,
+    preview_status,
     delete_pdf_previews,
-    DEFAULT_DPI,
     DEFAULT_PREVIEW_FORMAT,
     DEFAULT_WEBP_LOSSLESS,
     DEFAULT_WEBP_QUALITY,
@@ -76,26 +83,26 @@ def _delete_news_files(*, rel_path: str, file_hash: str | None, exclude_id: int
 
     ext = Path(rel_path).suffix.lower()
 
-    # ---- bronbestand ----
-    if getattr(settings, "SERVE_MEDIA_LOCALLY", False) or settings.DEBUG:
-        abs_path = MEDIA_ROOT / rel_path
-        try:
-            abs_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-    else:
-        try:
-            default_storage.delete(rel_path)
-        except Exception:
-            pass
+    # bronbestand + previews in één batch delete
+    with BatchDeleter() as d:
+        d.add(rel_path)
+        if ext == ".pdf" and file_hash:
+            delete_pdf_previews(cache_root=CACHE_NEWS_DIR, file_hash=file_hash, deleter=d)
 
-    # ---- previews (alleen relevant voor PDF) ----
-    if ext == ".pdf" and file_hash:
-        delete_pdf_previews(cache_root=CACHE_NEWS_DIR, file_hash=file_hash)
+
+def _release_news_file(*, rel_path: str, file_hash: str | None, item_id: int) -> None:
+    """
+    Blob-uploads: alleen de owner eraf halen (de blob-sweep ruimt op).
+    Oude uploads (news/...): direct opruimen als niemand anders ze gebruikt.
+    """
+    if is_blob_path(rel_path):
+        release_blob(file_hash, f"news:{item_id}")
+        return
+    _delete_news_files(rel_path=rel_path, file_hash=file_hash, exclude_id=item_id)
 
 
 def _delete_news_files_for_item(item: NewsItem) -> None:
-    _delete_news_files(rel_path=item.file_path or "", file_hash=item.file_hash or None, exclude_id=item.id)
+    _release_news_file(rel_path=item.file_path or "", file_hash=item.file_hash or None, item_id=item.id)
 
 
 def _cleanup_expired_news(now: datetime) -> int:
@@ -124,46 +131,34 @@ def news_media(request, item_id: int):
 
     # PDF: altijd previews (webp/png) teruggeven
     if item.is_pdf:
-        h = item.file_hash or ""
-        urls, ext_used = list_pdf_preview_urls(
-            cache_root=CACHE_NEWS_DIR,
-            file_hash=h,
-            prefer_format=DEFAULT_PREVIEW_FORMAT,
-            allow_legacy_png=ALLOW_LEGACY_PNG,
-        )
-
-        # Als er nog geen cache is: lazy render
-        if not urls:
+        # hash kan ontbreken in oude records -> eenmalig bepalen en opslaan
+        if not item.file_hash:
             try:
-                pdf_bytes = read_storage_bytes(item.file_path)
+                item.file_hash = hash_storage_file(item.file_path)
             except Exception:
-                return JsonResponse({"has_file": True, "type": "pdf", "urls": []})
-
-            h2, _n, _fmt = ensure_pdf_previews_exist(
-                pdf_bytes=pdf_bytes,
-                cache_root=CACHE_NEWS_DIR,
-                file_hash=item.file_hash or None,
-                dpi=DEFAULT_DPI,
-                prefer_format=DEFAULT_PREVIEW_FORMAT,
-                allow_legacy_png=ALLOW_LEGACY_PNG,
-                webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                webp_quality=DEFAULT_WEBP_QUALITY,
-                webp_method=DEFAULT_WEBP_METHOD,
-            )
+                return JsonResponse({"has_file": True, "type": "pdf", "pages": [], "urls": [], "pending": False})
+            item.save(update_fields=["file_hash"])
 
-            # hash kan ontbreken in oude records -> opslaan
-            if h2 and h2 != (item.file_hash or ""):
-                item.file_hash = h2
-                item.save(update_fields=["file_hash"])
+        cache_root = preview_cache_root(item.file_path, CACHE_NEWS_DIR)
+        pages, pending = preview_status(
+            cache_root=cache_root,
+            file_hash=item.file_hash,
+            prefer_format=DEFAULT_PREVIEW_FORMAT,
+            allow_legacy_png=ALLOW_LEGACY_PNG,
+        )
 
-            urls, _ext_used = list_pdf_preview_urls(
-                cache_root=CACHE_NEWS_DIR,
-                file_hash=item.file_hash or "",
-                prefer_format=DEFAULT_PREVIEW_FORMAT,
-                allow_legacy_png=ALLOW_LEGACY_PNG,
-            )
+        # Als er nog geen cache is: render op de achtergrond, de viewer pollt dit endpoint
+        if not pages and not pending:
+            queue_pdf_previews(rel_path=item.file_path, cache_root=cache_root, file_hash=item.file_hash)
+            pending = True
 
-        return JsonResponse({"has_file": True, "type": "pdf", "urls": urls})
+        return JsonResponse({
+            "has_file": True,
+            "type": "pdf",
+            "pages": pages,
+            "urls": [p["src"] for p in pages],
+            "pending": pending,
+        })
 
     # Image: direct url (kan webp/png/jpg zijn)
     return JsonResponse({"has_file": True, "type": "image", "url": item.media_url})
@@ -223,47 +218,30 @@ def news(request):
             item.description = edit_form.cleaned_data.get("description", "")
 
             if uploaded_file:
-                # Upload opslaan (PDF blijft PDF; images -> webp)
-                rel_path, h = save_upload_with_hash(
+                # Upload opslaan in de gedeelde blob store (PDF blijft PDF; images -> webp)
+                blob = store_blob(
                     uploaded_file,
-                    target_dir=NEWS_DIR,
-                    base_name="news",
                     allowed_exts=(".pdf", ".png", ".jpg", ".jpeg", ".webp"),
-                    clear_existing=False,
                     convert_images_to_webp=True,
                     webp_lossless=DEFAULT_WEBP_LOSSLESS,
                     webp_quality=DEFAULT_WEBP_QUALITY,
                     webp_method=DEFAULT_WEBP_METHOD,
                 )
+                rel_path, h = blob.file_path, blob.file_hash
 
-                # Eager render bij PDF zodat meteen zichtbaar is
-                if rel_path.lower().endswith(".pdf"):
-                    try:
-                        pdf_bytes = read_storage_bytes(rel_path)
-                        h2, _n, _fmt = ensure_pdf_previews_exist(
-                            pdf_bytes=pdf_bytes,
-                            cache_root=CACHE_NEWS_DIR,
-                            file_hash=h,
-                            dpi=DEFAULT_DPI,
-                            prefer_format=DEFAULT_PREVIEW_FORMAT,
-                            allow_legacy_png=ALLOW_LEGACY_PNG,
-                            webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                            webp_quality=DEFAULT_WEBP_QUALITY,
-                            webp_method=DEFAULT_WEBP_METHOD,
-                        )
-                        if h2:
-                            h = h2
-                    except Exception:
-                        pass
+                # PDF previews op de achtergrond renderen; de viewer toont pagina's zodra ze klaar zijn
+                if blob.is_pdf:
+                    queue_pdf_previews(rel_path=rel_path, cache_root=CACHE_BLOB_DIR, file_hash=h)
 
                 item.file_path = rel_path
                 item.file_hash = h
                 item.original_filename = uploaded_file.name
                 item.save()
+                acquire_blob(h, f"news:{item.id}")
 
-                # === BUGFIX: alleen old blob deleten als het echt anders is ===
+                # === BUGFIX: alleen old blob vrijgeven als het echt anders is ===
                 if old_rel_path and (old_rel_path != rel_path or (old_hash or "") != (h or "")):
-                    _delete_news_files(rel_path=old_rel_path, file_hash=old_hash, exclude_id=item.id)
+                    _release_news_file(rel_path=old_rel_path, file_hash=old_hash, item_id=item.id)
 
             else:
                 item.original_filename = old_original
@@ -294,40 +272,22 @@ def news(request):
             original_name = ""
 
             if uploaded_file:
-                rel_path, h = save_upload_with_hash(
+                blob = store_blob(
                     uploaded_file,
-                    target_dir=NEWS_DIR,
-                    base_name="news",
                     allowed_exts=(".pdf", ".png", ".jpg", ".jpeg", ".webp"),
-                    clear_existing=False,
                     convert_images_to_webp=True,
                     webp_lossless=DEFAULT_WEBP_LOSSLESS,
                     webp_quality=DEFAULT_WEBP_QUALITY,
                     webp_method=DEFAULT_WEBP_METHOD,
                 )
+                rel_path, h = blob.file_path, blob.file_hash
                 original_name = uploaded_file.name
 
-                # eager render bij pdf
-                if rel_path.lower().endswith(".pdf"):
-                    try:
-                        pdf_bytes = read_storage_bytes(rel_path)
-                        h2, _n, _fmt = ensure_pdf_previews_exist(
-                            pdf_bytes=pdf_bytes,
-                            cache_root=CACHE_NEWS_DIR,
-                            file_hash=h,
-                            dpi=DEFAULT_DPI,
-                            prefer_format=DEFAULT_PREVIEW_FORMAT,
-                            allow_legacy_png=ALLOW_LEGACY_PNG,
-                            webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                            webp_quality=DEFAULT_WEBP_QUALITY,
-                            webp_method=DEFAULT_WEBP_METHOD,
-                        )
-                        if h2:
-                            h = h2
-                    except Exception:
-                        pass
-
-            NewsItem.objects.create(
+                # PDF previews op de achtergrond renderen; de viewer toont pagina's zodra ze klaar zijn
+                if blob.is_pdf:
+                    queue_pdf_previews(rel_path=rel_path, cache_root=CACHE_BLOB_DIR, file_hash=h)
+
+            item = NewsItem.objects.create(
                 title=form.cleaned_data["title"],
                 short_description=form.cleaned_data.get("short_description", ""),
                 description=form.cleaned_data.get("description", ""),
@@ -335,6 +295,8 @@ def news(request):
                 file_hash=h,
                 original_filename=original_name,
             )
+            if h:
+                acquire_blob(h, f"news:{item.id}")
 
             send_news_uploaded_push_task.delay(request.user.first_name)
             messages.success(request, "Nieuwsbericht toegevoegd.")
@@ -629,16 +629,17 @@ def publish_shifts_api(request):
             keys = [f"diensten_ics:{uid}" for uid in affected_user_ids]
             cache.delete_many(keys)
 
-            from core.tasks.push import send_user_shifts_changed_push_task
+            from core.utils.push.shift_buffer import buffer_user_shifts_changed
 
             iso_year = week_start.isocalendar().year
             iso_week = week_start.isocalendar().week
 
+            # gebundeld per user/week: meerdere publicaties kort na elkaar -> één push
             for uid, c in per_user_counts.items():
                 total = int(c["added"]) + int(c["changed"]) + int(c["removed"])
                 if total <= 0:
                     continue
-                send_user_shifts_changed_push_task.delay(
+                buffer_user_shifts_changed(
                     int(uid),
                     int(iso_year),
                     int(iso_week),
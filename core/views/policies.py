@@ -4,7 +4,6 @@ from pathlib import Path
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.files.storage import default_storage
 from django.db.models.functions import Lower
 from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
@@ -12,14 +11,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from core.models import Werkafspraak
 from core.forms import WerkafspraakForm
 
+from core.utils.storage_batch import BatchDeleter
+from core.utils.blobs import (
+    store_blob,
+    acquire_blob,
+    release_blob,
+    is_blob_path,
+    preview_cache_root,
+    CACHE_BLOB_DIR,
+)
+
 from ._helpers import can
 from ._upload_helpers import (
-    save_upload_with_hash,
-    read_storage_bytes,
-    ensure_pdf_previews_exist,
-    list_pdf_preview_urls,
+    hash_storage_file,
+    queue_pdf_previews,
+    preview_status,
     delete_pdf_previews,
-    DEFAULT_DPI,
     DEFAULT_PREVIEW_FORMAT,
     DEFAULT_WEBP_LOSSLESS,
     DEFAULT_WEBP_QUALITY,
@@ -81,31 +88,31 @@ def _delete_werkafspraak_files(*, rel_path: str, category: str, file_hash: str |
 
     ext = Path(rel_path).suffix.lower()
 
-    # ---- bronbestand ----
-    if getattr(settings, "SERVE_MEDIA_LOCALLY", False) or settings.DEBUG:
-        abs_path = MEDIA_ROOT / rel_path
-        try:
-            abs_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-    else:
-        try:
-            default_storage.delete(rel_path)
-        except Exception:
-            pass
+    # bronbestand + previews in één batch delete
+    with BatchDeleter() as d:
+        d.add(rel_path)
+        if ext == ".pdf" and file_hash:
+            cache_root = CACHE_WERKAFSPRAKEN_DIR / category
+            delete_pdf_previews(cache_root=cache_root, file_hash=file_hash, deleter=d)
 
-    # ---- previews (alleen relevant voor PDF) ----
-    if ext == ".pdf" and file_hash:
-        cache_root = CACHE_WERKAFSPRAKEN_DIR / category
-        delete_pdf_previews(cache_root=cache_root, file_hash=file_hash)
+
+def _release_werkafspraak_file(*, rel_path: str, category: str, file_hash: str | None, item_id: int) -> None:
+    """
+    Blob-uploads: alleen de owner eraf halen (de blob-sweep ruimt op).
+    Oude uploads (werkafspraken/<category>/...): direct opruimen als niemand anders ze gebruikt.
+    """
+    if is_blob_path(rel_path):
+        release_blob(file_hash, f"werkafspraak:{item_id}")
+        return
+    _delete_werkafspraak_files(rel_path=rel_path, category=category, file_hash=file_hash, exclude_id=item_id)
 
 
 def _delete_werkafspraak_files_for_item(item: Werkafspraak) -> None:
-    _delete_werkafspraak_files(
+    _release_werkafspraak_file(
         rel_path=item.file_path or "",
         category=item.category or "",
         file_hash=item.file_hash or None,
-        exclude_id=item.id,
+        item_id=item.id,
     )
 
 
@@ -126,46 +133,33 @@ def policies_media(request, item_id: int):
         return JsonResponse({"has_file": False})
 
     if item.is_pdf:
-        cache_root = CACHE_WERKAFSPRAKEN_DIR / (item.category or "")
-        h = item.file_hash or ""
+        cache_root = preview_cache_root(item.file_path, CACHE_WERKAFSPRAKEN_DIR / (item.category or ""))
+
+        if not item.file_hash:
+            try:
+                item.file_hash = hash_storage_file(item.file_path)
+            except Exception:
+                return JsonResponse({"has_file": True, "type": "pdf", "pages": [], "urls": [], "pending": False})
+            item.save(update_fields=["file_hash"])
 
-        urls, ext_used = list_pdf_preview_urls(
+        pages, pending = preview_status(
             cache_root=cache_root,
-            file_hash=h,
+            file_hash=item.file_hash,
             prefer_format=DEFAULT_PREVIEW_FORMAT,
             allow_legacy_png=ALLOW_LEGACY_PNG,
         )
 
-        if not urls:
-            try:
-                pdf_bytes = read_storage_bytes(item.file_path)
-            except Exception:
-                return JsonResponse({"has_file": True, "type": "pdf", "urls": []})
-
-            h2, _n, _fmt = ensure_pdf_previews_exist(
-                pdf_bytes=pdf_bytes,
-                cache_root=cache_root,
-                file_hash=item.file_hash or None,
-                dpi=DEFAULT_DPI,
-                prefer_format=DEFAULT_PREVIEW_FORMAT,
-                allow_legacy_png=ALLOW_LEGACY_PNG,
-                webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                webp_quality=DEFAULT_WEBP_QUALITY,
-                webp_method=DEFAULT_WEBP_METHOD,
-            )
+        if not pages and not pending:
+            queue_pdf_previews(rel_path=item.file_path, cache_root=cache_root, file_hash=item.file_hash)
+            pending = True
 
-            if h2 and h2 != (item.file_hash or ""):
-                item.file_hash = h2
-                item.save(update_fields=["file_hash"])
-
-            urls, _ext_used = list_pdf_preview_urls(
-                cache_root=cache_root,
-                file_hash=item.file_hash or "",
-                prefer_format=DEFAULT_PREVIEW_FORMAT,
-                allow_legacy_png=ALLOW_LEGACY_PNG,
-            )
-
-        return JsonResponse({"has_file": True, "type": "pdf", "urls": urls})
+        return JsonResponse({
+            "has_file": True,
+            "type": "pdf",
+            "pages": pages,
+            "urls": [p["src"] for p in pages],
+            "pending": pending,
+        })
 
     return JsonResponse({"has_file": True, "type": "image", "url": item.media_url})
 
@@ -223,52 +217,34 @@ def policies(request):
             item.category = edit_form.cleaned_data["category"]
 
             if uploaded_file:
-                category_dir = WERKAFSPRAKEN_DIR / item.category
-                rel_path, h = save_upload_with_hash(
+                # Upload opslaan in de gedeelde blob store (PDF blijft PDF; images -> webp)
+                blob = store_blob(
                     uploaded_file,
-                    target_dir=category_dir,
-                    base_name="werkafspraak",
                     allowed_exts=(".pdf", ".png", ".jpg", ".jpeg", ".webp"),
-                    clear_existing=False,
                     convert_images_to_webp=True,
                     webp_lossless=DEFAULT_WEBP_LOSSLESS,
                     webp_quality=DEFAULT_WEBP_QUALITY,
                     webp_method=DEFAULT_WEBP_METHOD,
                 )
+                rel_path, h = blob.file_path, blob.file_hash
 
-                # eager render bij pdf
-                if rel_path.lower().endswith(".pdf"):
-                    try:
-                        pdf_bytes = read_storage_bytes(rel_path)
-                        cache_root = CACHE_WERKAFSPRAKEN_DIR / item.category
-                        h2, _n, _fmt = ensure_pdf_previews_exist(
-                            pdf_bytes=pdf_bytes,
-                            cache_root=cache_root,
-                            file_hash=h,
-                            dpi=DEFAULT_DPI,
-                            prefer_format=DEFAULT_PREVIEW_FORMAT,
-                            allow_legacy_png=ALLOW_LEGACY_PNG,
-                            webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                            webp_quality=DEFAULT_WEBP_QUALITY,
-                            webp_method=DEFAULT_WEBP_METHOD,
-                        )
-                        if h2:
-                            h = h2
-                    except Exception:
-                        pass
+                # PDF previews op de achtergrond renderen; de viewer toont pagina's zodra ze klaar zijn
+                if blob.is_pdf:
+                    queue_pdf_previews(rel_path=rel_path, cache_root=CACHE_BLOB_DIR, file_hash=h)
 
                 item.file_path = rel_path
                 item.file_hash = h
                 item.original_filename = uploaded_file.name
                 item.save()
+                acquire_blob(h, f"werkafspraak:{item.id}")
 
-                # === BUGFIX: alleen oude blob deleten als hij echt anders is ===
+                # === BUGFIX: alleen oude blob vrijgeven als hij echt anders is ===
                 if old_rel_path and (old_rel_path != rel_path or (old_hash or "") != (h or "")):
-                    _delete_werkafspraak_files(
+                    _release_werkafspraak_file(
                         rel_path=old_rel_path,
                         category=old_category,   # verwijder in de juiste oude category
                         file_hash=old_hash,
-                        exclude_id=item.id,
+                        item_id=item.id,
                     )
 
             else:
@@ -308,42 +284,22 @@ def policies(request):
             original_name = ""
 
             if uploaded_file:
-                category_dir = WERKAFSPRAKEN_DIR / category
-                rel_path, h = save_upload_with_hash(
+                blob = store_blob(
                     uploaded_file,
-                    target_dir=category_dir,
-                    base_name="werkafspraak",
                     allowed_exts=(".pdf", ".png", ".jpg", ".jpeg", ".webp"),
-                    clear_existing=False,
                     convert_images_to_webp=True,
                     webp_lossless=DEFAULT_WEBP_LOSSLESS,
                     webp_quality=DEFAULT_WEBP_QUALITY,
                     webp_method=DEFAULT_WEBP_METHOD,
                 )
+                rel_path, h = blob.file_path, blob.file_hash
                 original_name = uploaded_file.name
 
-                # eager render bij pdf
-                if rel_path.lower().endswith(".pdf"):
-                    try:
-                        pdf_bytes = read_storage_bytes(rel_path)
-                        cache_root = CACHE_WERKAFSPRAKEN_DIR / category
-                        h2, _n, _fmt = ensure_pdf_previews_exist(
-                            pdf_bytes=pdf_bytes,
-                            cache_root=cache_root,
-                            file_hash=h,
-                            dpi=DEFAULT_DPI,
-                            prefer_format=DEFAULT_PREVIEW_FORMAT,
-                            allow_legacy_png=ALLOW_LEGACY_PNG,
-                            webp_lossless=DEFAULT_WEBP_LOSSLESS,
-                            webp_quality=DEFAULT_WEBP_QUALITY,
-                            webp_method=DEFAULT_WEBP_METHOD,
-                        )
-                        if h2:
-                            h = h2
-                    except Exception:
-                        pass
-
-            Werkafspraak.objects.create(
+                # PDF previews op de achtergrond renderen; de viewer toont pagina's zodra ze klaar zijn
+                if blob.is_pdf:
+                    queue_pdf_previews(rel_path=rel_path, cache_root=CACHE_BLOB_DIR, file_hash=h)
+
+            item = Werkafspraak.objects.create(
                 title=add_form.cleaned_data["title"],
                 short_description=add_form.cleaned_data.get("short_description", ""),
                 file_path=rel_path,
@@ -352,6 +308,8 @@ def policies(request):
                 category=category,
                 created_by=request.user,
             )
+            if h:
+                acquire_blob(h, f"werkafspraak:{item.id}")
 
             messages.success(request, "Werkafspraak succesvol geüpload.")
             return redirect("policies")
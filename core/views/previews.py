@@ -0,0 +1,40 @@
+# core/views/previews.py
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import redirect
+
+from ._upload_helpers import ensure_zoom_preview
+
+CACHE_REL_RE = re.compile(r"^[A-Za-z0-9_\-]+(/[A-Za-z0-9_\-]+)*$")
+HASH_RE = re.compile(r"^[0-9a-f]{8,64}$")
+
+
+@login_required
+def pdf_preview_zoom(request):
+    """
+    Zoom tier (volle dpi) van één PDF-pagina. Bij de eerste aanvraag wordt hij op de
+    "previews" queue gerenderd en gaat de redirect naar de screen tier.
+    ?c=<cache map t.o.v. CACHE_DIR>&h=<hash>&p=<pagina>
+    """
+    cache_rel = request.GET.get("c") or ""
+    file_hash = request.GET.get("h") or ""
+    try:
+        page_no = int(request.GET.get("p") or 0)
+    except ValueError:
+        raise Http404
+
+    if not CACHE_REL_RE.match(cache_rel) or not HASH_RE.match(file_hash):
+        raise Http404
+
+    url = ensure_zoom_preview(
+        cache_root=Path(settings.CACHE_DIR) / cache_rel,
+        file_hash=file_hash,
+        page_no=page_no,
+    )
+    if not url:
+        raise Http404
+    return redirect(url)
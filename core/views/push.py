@@ -7,6 +7,7 @@ from django.middleware.csrf import get_token
 from django.db import transaction
 
 from core.models import PushSubscription
+from core.utils.push.audience import bump_push_audience_on_commit
 
 @login_required
 @require_POST
@@ -54,7 +55,9 @@ def push_unsubscribe(request):
         endpoint = data.get("endpoint")
         if not endpoint:
             return HttpResponseBadRequest("Missing endpoint")
-        PushSubscription.objects.filter(user=request.user, endpoint=endpoint).delete()
+        deleted, _ = PushSubscription.objects.filter(user=request.user, endpoint=endpoint).delete()
+        if deleted:
+            bump_push_audience_on_commit()
         return JsonResponse({"ok": True})
     except Exception as e:
         return HttpResponseBadRequest(str(e))
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.contrib.auth.decorators import login_required
 from django.db import transaction
 
 from core.models import NativePushToken
+from core.utils.push.audience import bump_push_audience_on_commit
 
 @login_required
 @require_POST
@@ -23,10 +24,12 @@ def native_push_subscribe(request):
         with transaction.atomic():
             # Optioneel: per user+device slechts 1 token “actief”
             if device_id:
-                NativePushToken.objects.filter(
+                deleted, _ = NativePushToken.objects.filter(
                     user=request.user,
                     device_id=device_id,
                 ).exclude(token=token).delete()
+                if deleted:
+                    bump_push_audience_on_commit()
 
             obj, created = NativePushToken.objects.update_or_create(
                 token=token,
@@ -52,7 +55,9 @@ def native_push_unsubscribe(request):
         if not token:
             return HttpResponseBadRequest("Missing token")
 
-        NativePushToken.objects.filter(user=request.user, token=token).delete()
+        deleted, _ = NativePushToken.objects.filter(user=request.user, token=token).delete()
+        if deleted:
+            bump_push_audience_on_commit()
         return JsonResponse({"ok": True})
     except Exception as e:
         return HttpResponseBadRequest(str(e))
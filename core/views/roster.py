@@ -2,36 +2,61 @@
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.utils import timezone, translation
-from django.core.files.storage import default_storage
 
 from core.models import RosterWeek
 from core.tasks import send_roster_updated_push_task
+from core.utils.storage_batch import BatchDeleter
+from core.utils.blobs import (
+    store_blob,
+    acquire_blob,
+    release_blob,
+    is_blob_path,
+    preview_cache_root,
+)
 
 from ._helpers import (
     can,
-    ROSTER_DIR,            # MEDIA_ROOT / "rooster"
     CACHE_ROSTER_DIR,      # CACHE_DIR / "rooster"
-    clear_dir,
 )
 
 from ._upload_helpers import (
-    save_upload_with_hash,
-    ensure_pdf_previews_exist,
-    list_pdf_preview_urls,
-    read_storage_bytes,
-    _media_relpath,
+    list_pdf_preview_pages,
+    queue_pdf_previews,
+    preview_status,
+    seed_preview_manifest,
+    delete_pdf_previews,
+    DEFAULT_PREVIEW_FORMAT,
 )
 
 # Helpers delen met beschikbaarheid
 from .mijnbeschikbaarheid import _monday_of_iso_week, _clamp_week
 
+# Venster: [huidige week .. +ROSTER_WEEKS_AHEAD]; ook gebruikt door de housekeeping beat task
+ROSTER_WEEKS_AHEAD = 12
+
+
+def _first_page_previews(mondays: list[date]) -> list[dict]:
+    """
+    Eerste pagina van de gegeven weken (alleen als de previews klaar zijn), voor prefetch.
+    Eén query + manifest uit Redis per week (geen storage GET); rendert of queued niets.
+    """
+    out = []
+    for rw in RosterWeek.objects.filter(monday__in=mondays).exclude(file_hash=""):
+        pages, _ext = list_pdf_preview_pages(
+            cache_root=preview_cache_root(rw.file_path, _week_cache_dir(rw.monday)),
+            file_hash=rw.file_hash,
+            cached_only=True,
+        )
+        if pages:
+            out.append({"src": pages[0]["src"], "srcset": pages[0]["srcset"]})
+    return out
+
 
 # -----------------------------
 # Slug helpers: 'weekNN' (alleen weeknummer)
@@ -41,125 +66,14 @@ def _week_slug_from_monday(monday: date) -> str:
     return f"week{iso_week:02d}"
 
 
-def _week_pdf_dir(monday: date) -> Path:
-    # /media/.../rooster/weekNN
-    return (ROSTER_DIR / _week_slug_from_monday(monday)).resolve()
-
-
-def _week_pdf_path(monday: date) -> Path:
-    """
-    Zoek de PDF voor deze week:
-
-    - eerst: rooster.<hash>.pdf in de weekmap
-    - anders: fallback naar legacy rooster.pdf
-    """
-    d = _week_pdf_dir(monday)
-    if d.exists():
-        candidates = sorted(d.glob("rooster.*.pdf"))
-        if candidates:
-            return candidates[-1]
-
-    # legacy fallback
-    return d / "rooster.pdf"
-
-
 def _week_cache_dir(monday: date) -> Path:
     # /media/.../cache/rooster/weekNN
     return (CACHE_ROSTER_DIR / _week_slug_from_monday(monday)).resolve()
 
 
-def _allowed_week_slugs(min_monday: date, weeks_ahead: int) -> set:
-    """Set met 'weekNN' slugs voor [min_monday .. min_monday + weeks_ahead]."""
-    allowed = set()
-    cur = min_monday
-    for _ in range(weeks_ahead + 1):
-        allowed.add(_week_slug_from_monday(cur))
-        cur += timedelta(weeks=1)
-    return allowed
-
-
-def _roster_housekeeping(min_monday: date, weeks_ahead: int) -> None:
-    """
-    Verwijder alle weekmappen (PDF + cache) die NIET in het venster
-    [huidige week .. +weeks_ahead] vallen.
-    Daardoor verdwijnt week x automatisch zodra week x+1 start.
-
-    - In DEV: opruimen op filesystem.
-    - In PROD: opruimen in S3 onder:
-        media/rooster/weekNN/...
-        media/cache/rooster/weekNN/...
-    """
-    ROSTER_DIR.mkdir(parents=True, exist_ok=True)
-    CACHE_ROSTER_DIR.mkdir(parents=True, exist_ok=True)
-
-    allowed = _allowed_week_slugs(min_monday, weeks_ahead)
-
-    # === DEV: lokaal filesystem ===
-    if getattr(settings, "SERVE_MEDIA_LOCALLY", False) or settings.DEBUG:
-        for week_dir in ROSTER_DIR.glob("week*"):
-            if not week_dir.is_dir():
-                continue
-            if week_dir.name not in allowed:
-                try:
-                    clear_dir(week_dir)
-                    week_dir.rmdir()
-                except Exception:
-                    pass
-
-        for cache_week_dir in CACHE_ROSTER_DIR.glob("week*"):
-            if not cache_week_dir.is_dir():
-                continue
-            if cache_week_dir.name not in allowed:
-                try:
-                    clear_dir(cache_week_dir)
-                    cache_week_dir.rmdir()
-                except Exception:
-                    pass
-
-        return
-
-    # === PROD: S3 ===
-    roster_root = _media_relpath(ROSTER_DIR)  # "rooster"
-    try:
-        week_dirs, _files = default_storage.listdir(roster_root)
-    except FileNotFoundError:
-        week_dirs = []
-
-    for slug in list(week_dirs):
-        if slug not in allowed:
-            week_prefix = f"{roster_root}/{slug}"
-            try:
-                _subdirs, files = default_storage.listdir(week_prefix)
-            except FileNotFoundError:
-                files = []
-            for name in files:
-                if name.lower().endswith(".pdf"):
-                    default_storage.delete(f"{week_prefix}/{name}")
-
-    # Cache: cache/rooster/weekNN/<hash>/page_XXX.(webp/png)
-    cache_root = "cache/rooster"
-    try:
-        cache_week_dirs, _ = default_storage.listdir(cache_root)
-    except FileNotFoundError:
-        cache_week_dirs = []
-
-    for slug in list(cache_week_dirs):
-        if slug not in allowed:
-            week_cache_prefix = f"{cache_root}/{slug}"
-            try:
-                hash_dirs, _files = default_storage.listdir(week_cache_prefix)
-            except FileNotFoundError:
-                hash_dirs = []
-            for h in hash_dirs:
-                hash_prefix = f"{week_cache_prefix}/{h}"
-                try:
-                    _d2, files = default_storage.listdir(hash_prefix)
-                except FileNotFoundError:
-                    files = []
-                for name in files:
-                    # verwijder zowel webp als png
-                    if name.startswith("page_") and (name.endswith(".webp") or name.endswith(".png")):
-                        default_storage.delete(f"{hash_prefix}/{name}")
+def _roster_owner(monday: date) -> str:
+    # owner-id op de MediaBlob van het rooster van deze week
+    return f"rosterweek:{monday.isoformat()}"
 
 
 @login_required
@@ -172,11 +86,10 @@ def rooster(request):
     today = timezone.localdate()
     base_date = today + timedelta(weeks=1) if today.weekday() >= 4 else today
 
-    WEEKS_AHEAD = 12
     min_monday = _monday_of_iso_week(today)
-    max_monday = _monday_of_iso_week(today + timedelta(weeks=WEEKS_AHEAD))
+    max_monday = _monday_of_iso_week(today + timedelta(weeks=ROSTER_WEEKS_AHEAD))
 
-    _roster_housekeeping(min_monday=min_monday, weeks_ahead=WEEKS_AHEAD)
+    # Opruimen van oude weken: beat task (core/utils/beat/roster.py), niet in de request
 
     # --- weekselectie ---
     qs_monday = request.GET.get("monday")
@@ -214,7 +127,6 @@ def rooster(request):
         except Exception:
             post_monday = monday
 
-        post_week_pdf_dir = _week_pdf_dir(post_monday)
         post_week_cache_dir = _week_cache_dir(post_monday)
 
         f = request.FILES.get("file")
@@ -222,110 +134,77 @@ def rooster(request):
             messages.error(request, "Upload een PDF-bestand (.pdf).")
             return redirect(f"{reverse('rooster')}?monday={post_monday.isoformat()}")
 
-        post_week_pdf_dir.mkdir(parents=True, exist_ok=True)
-        CACHE_ROSTER_DIR.mkdir(parents=True, exist_ok=True)
+        old_rw = RosterWeek.objects.filter(monday=post_monday).first()
+        owner = _roster_owner(post_monday)
 
-        # Lees bytes voor directe render
-        pdf_bytes = f.read()
-        try:
-            f.seek(0)
-        except Exception:
-            pass
-
-        # Cache voor deze week leegmaken
-        clear_dir(post_week_cache_dir)
-
-        # PDF opslaan als rooster.<hash>.pdf (max 1 per week)
-        rel_path, h = save_upload_with_hash(
-            uploaded_file=f,
-            target_dir=post_week_pdf_dir,
-            base_name="rooster",
-            clear_existing=True,
-            convert_images_to_webp=False,
-        )
+        # PDF opslaan in de gedeelde blob store (zelfde PDF -> zelfde bestand + previews)
+        blob = store_blob(f, allowed_exts=(".pdf",), convert_images_to_webp=False)
+        rel_path, h = blob.file_path, blob.file_hash
 
-        # Render previews (webp voorkeur)
-        hash_id, n_pages, ext_used = ensure_pdf_previews_exist(
-            pdf_bytes=pdf_bytes,
-            cache_root=post_week_cache_dir,
-            file_hash=h,
-        )
-
-        # Model updaten
+        # Model updaten (n_pages volgt zodra de render klaar is)
         RosterWeek.objects.update_or_create(
             monday=post_monday,
             defaults={
                 "week_slug": _week_slug_from_monday(post_monday),
                 "file_path": rel_path,
-                "file_hash": hash_id,
-                "n_pages": n_pages,
-                "preview_ext": ext_used,
+                "file_hash": h,
+                "n_pages": 0,
+                "preview_ext": DEFAULT_PREVIEW_FORMAT,
             },
         )
-
-        # Weekinfo voor notificatie
-        iso_year_post, iso_week_post, _ = post_monday.isocalendar()
-        week_end_post = post_monday + timedelta(days=4)
-
-        messages.success(request, f"Rooster voor week {iso_week_post} geüpload.")
-
-        send_roster_updated_push_task.delay(
-            iso_year_post,
-            iso_week_post,
-            post_monday.isoformat(),
-            week_end_post.isoformat(),
-        )
-
-        # ==== Direct nieuwe roster tonen voor post_monday ====
-        monday_view = post_monday
-        week_end = week_end_post
-        iso_year, iso_week, _ = monday_view.isocalendar()
-
-        prev_raw = monday_view - timedelta(weeks=1)
-        next_raw = monday_view + timedelta(weeks=1)
-        has_prev = prev_raw >= min_monday
-        has_next = next_raw <= max_monday
-        prev_monday = prev_raw if has_prev else min_monday
-        next_monday = next_raw if has_next else max_monday
-
-        week_slug = _week_slug_from_monday(monday_view)
-        week_cache_dir = _week_cache_dir(monday_view)
-
-        page_urls, _ext_used2 = list_pdf_preview_urls(
-            cache_root=week_cache_dir,
-            file_hash=hash_id,
+        acquire_blob(h, owner)
+
+        # Vorig rooster van deze week: ongewijzigde pagina's hergebruiken, daarna vrijgeven
+        reuse_from = None
+        discard_reuse = False
+        if old_rw and old_rw.file_hash and old_rw.file_hash != h:
+            reuse_from = (preview_cache_root(old_rw.file_path, post_week_cache_dir), old_rw.file_hash)
+            if is_blob_path(old_rw.file_path):
+                # blob + previews blijven tot de sweep (grace) staan, dus ruim genoeg voor de render
+                release_blob(old_rw.file_hash, owner)
+            else:
+                # rooster van vóór de blob store: PDF direct weg, previews na de render
+                with BatchDeleter() as d:
+                    d.add(old_rw.file_path)
+                discard_reuse = True
+
+        # Previews renderen op de achtergrond (alleen gewijzigde pagina's); de rooster-push
+        # gaat zodra pagina 1 klaar is. Loopt er al een render voor deze blob (andere owner),
+        # dan de push direct sturen.
+        queued = queue_pdf_previews(
+            rel_path=rel_path,
+            cache_root=preview_cache_root(rel_path, post_week_cache_dir),
+            file_hash=h,
+            roster_monday=post_monday.isoformat(),
+            reuse_from=reuse_from,
+            discard_reuse=discard_reuse,
         )
-
-        context = {
-            "year": datetime.now().year,
-            "monday": monday_view,
-            "week_end": week_end,
-            "has_prev": has_prev,
-            "has_next": has_next,
-            "prev_monday": prev_monday,
-            "next_monday": next_monday,
-            "week_slug": week_slug,
-            "no_roster": False,
-            "page_urls": page_urls,
-            "header_title": f"Week {iso_week} – {iso_year}",
-            "min_monday": min_monday,
-            "max_monday": max_monday,
-            "week_options": [],
-            "can_upload": can(request.user, "can_upload_roster"),
-        }
-
-        cur = min_monday
-        while cur <= max_monday:
-            context["week_options"].append({
-                "value": cur.isoformat(),
-                "start": cur,
-                "end": cur + timedelta(days=4),
-                "iso_week": cur.isocalendar()[1],
-                "iso_year": cur.isocalendar()[0],
-            })
-            cur += timedelta(weeks=1)
-
-        return render(request, "rooster/index.html", context)
+        if not queued:
+            # render voor deze blob loopt al of is klaar: n_pages komt van die render,
+            # of (al klaar) van een andere week met dezelfde PDF
+            done_rw = (
+                RosterWeek.objects.filter(file_hash=h, n_pages__gt=0)
+                .exclude(monday=post_monday)
+                .first()
+            )
+            if done_rw:
+                RosterWeek.objects.filter(monday=post_monday, file_hash=h).update(
+                    n_pages=done_rw.n_pages,
+                    preview_ext=done_rw.preview_ext,
+                )
+            if discard_reuse:
+                delete_pdf_previews(cache_root=reuse_from[0], file_hash=reuse_from[1])
+            iso_year_post, iso_week_post, _ = post_monday.isocalendar()
+            send_roster_updated_push_task.delay(
+                iso_year_post,
+                iso_week_post,
+                post_monday.isoformat(),
+                (post_monday + timedelta(days=4)).isoformat(),
+            )
+
+        iso_week_post = post_monday.isocalendar()[1]
+        messages.success(request, f"Rooster voor week {iso_week_post} geüpload.")
+        return redirect(f"{reverse('rooster')}?monday={post_monday.isoformat()}")
 
     # ==== GET / normale weergave ====
     week_end = monday + timedelta(days=4)
@@ -339,8 +218,6 @@ def rooster(request):
     next_monday = next_raw if has_next else max_monday
 
     week_slug = _week_slug_from_monday(monday)
-    week_pdf_dir = _week_pdf_dir(monday)
-    week_pdf_path = _week_pdf_path(monday)
     week_cache_dir = _week_cache_dir(monday)
 
     context = {
@@ -353,7 +230,9 @@ def rooster(request):
         "next_monday": next_monday,
         "week_slug": week_slug,
         "no_roster": False,
-        "page_urls": [],
+        "page_previews": [],
+        "prefetch_pages": [],
+        "previews_pending": False,
         "header_title": f"Week {iso_week} – {iso_year}",
         "min_monday": min_monday,
         "max_monday": max_monday,
@@ -372,74 +251,58 @@ def rooster(request):
         })
         cur += timedelta(weeks=1)
 
+    # Vorige/volgende week alvast in de browsercache (weekwissel zonder koude start)
+    context["prefetch_pages"] = _first_page_previews(
+        [m for m, ok in ((prev_raw, has_prev), (next_raw, has_next)) if ok]
+    )
+
     # 1) Probeer eerst uit model + cache (zodat je geen PDF hoeft te lezen)
     rw = RosterWeek.objects.filter(monday=monday).first()
     if rw and rw.file_hash:
-        urls, _ext_used = list_pdf_preview_urls(
-            cache_root=week_cache_dir,
-            file_hash=rw.file_hash,
-        )
-        if urls:
-            context["page_urls"] = urls
-            context["no_roster"] = False
+        cache_root = preview_cache_root(rw.file_path, week_cache_dir)
+        pages, pending = preview_status(cache_root=cache_root, file_hash=rw.file_hash)
+        if not pages and not pending and rw.n_pages:
+            # Cache van vóór het manifest: RosterWeek weet al hoeveel pagina's er zijn
+            seed_preview_manifest(
+                cache_root=cache_root,
+                file_hash=rw.file_hash,
+                n_pages=rw.n_pages,
+                ext=rw.preview_ext,
+            )
+            pages, pending = preview_status(cache_root=cache_root, file_hash=rw.file_hash)
+        if not pages and not pending and rw.file_path:
+            # Previews ontbreken (bijv. opgeruimde cache) -> opnieuw op de achtergrond
+            queue_pdf_previews(rel_path=rw.file_path, cache_root=cache_root, file_hash=rw.file_hash)
+            pending = True
+        if pages or pending:
+            context["page_previews"] = pages
+            context["previews_pending"] = pending
             return render(request, "rooster/index.html", context)
 
-    # 2) Fallback: PDF ophalen (DEV vs PROD) en previews maken
-    storage_path = None
+    # 2) Geen rooster voor deze week (oude PDF's zonder RosterWeek registreert de beat task)
+    context["no_roster"] = True
+    return render(request, "rooster/index.html", context)
 
-    if getattr(settings, "SERVE_MEDIA_LOCALLY", False) or settings.DEBUG:
-        if not week_pdf_path.exists():
-            context["no_roster"] = True
-            return render(request, "rooster/index.html", context)
-        pdf_bytes = week_pdf_path.read_bytes()
-        # rel_path in dev (voor model)
-        rel_dir = _media_relpath(week_pdf_dir)
-        storage_path = f"{rel_dir}/{week_pdf_path.name}" if rel_dir else week_pdf_path.name
-    else:
-        week_rel_dir = _media_relpath(week_pdf_dir)  # bijv. "rooster/week48"
-        try:
-            _dirs, files = default_storage.listdir(week_rel_dir)
-        except FileNotFoundError:
-            files = []
-
-        pdf_name = None
-        hashed = sorted(
-            name for name in files
-            if name.startswith("rooster.") and name.endswith(".pdf")
-        )
-        if hashed:
-            pdf_name = hashed[-1]
-        elif "rooster.pdf" in files:
-            pdf_name = "rooster.pdf"
 
-        if not pdf_name:
-            context["no_roster"] = True
-            return render(request, "rooster/index.html", context)
+@login_required
+def rooster_previews(request):
+    """
+    JSON status voor de viewer: welke pagina's zijn al gerenderd en loopt de render nog?
+    """
+    if not can(request.user, "can_view_roster"):
+        return HttpResponseForbidden("Geen toegang tot rooster.")
 
-        storage_path = f"{week_rel_dir}/{pdf_name}"
-        with default_storage.open(storage_path, "rb") as f:
-            pdf_bytes = f.read()
+    try:
+        monday = date.fromisoformat(request.GET.get("monday") or "")
+    except ValueError:
+        return JsonResponse({"pages": [], "urls": [], "pending": False}, status=400)
 
-    # Previews maken/zekerstellen
-    hash_id, n_pages, ext_used = ensure_pdf_previews_exist(
-        pdf_bytes=pdf_bytes,
-        cache_root=week_cache_dir,
-        file_hash=(rw.file_hash if rw and rw.file_hash else None),
-    )
+    rw = RosterWeek.objects.filter(monday=monday).first()
+    if not rw or not rw.file_hash:
+        return JsonResponse({"pages": [], "urls": [], "pending": False})
 
-    # Model bijwerken/aanmaken
-    RosterWeek.objects.update_or_create(
-        monday=monday,
-        defaults={
-            "week_slug": week_slug,
-            "file_path": storage_path or "",
-            "file_hash": hash_id,
-            "n_pages": n_pages,
-            "preview_ext": ext_used,
-        },
+    pages, pending = preview_status(
+        cache_root=preview_cache_root(rw.file_path, _week_cache_dir(monday)),
+        file_hash=rw.file_hash,
     )
-
-    urls, _ext_used2 = list_pdf_preview_urls(cache_root=week_cache_dir, file_hash=hash_id)
-    context["page_urls"] = urls
-
-    return render(request, "rooster/index.html", context)
\ No newline at end of file
+    return JsonResponse({"pages": pages, "urls": [p["src"] for p in pages], "pending": pending})
@@ -94,6 +94,7 @@ MIDDLEWARE = [
     "django_otp.middleware.OTPMiddleware",
     "two_factor.middleware.threadlocals.ThreadLocals",
     "core.middleware.Enforce2FAMiddleware",
+    "core.middleware.PdfRenderUnavailableMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -182,6 +183,9 @@ CELERY_TASK_ROUTES = {
     "core.tasks.send_news_uploaded_push_task": {"queue": "push"},
     "core.tasks.send_agenda_uploaded_push_task": {"queue": "push"},
     "core.tasks.send_laatste_pot_push_task": {"queue": "push"},
+    "core.tasks.previews.render_pdf_previews_task": {"queue": "previews"},
+    "core.tasks.previews.render_zoom_preview_task": {"queue": "previews"},
+    "core.tasks.pdf.render_pdf_task": {"queue": "pdf"},
     "tasks.run_kompas_scraper": {"queue": "scrape"},
 }
 # === Celery beat ===
@@ -199,6 +203,21 @@ if not DEBUG:
             "schedule": crontab(minute=0, hour=1),
             "options": {"queue": "default"},
         },
+        "roster_housekeeping_daily_0005": {
+            "task": "core.tasks.beat.cleanup.roster_housekeeping_task",
+            "schedule": crontab(minute=5, hour=0),
+            "options": {"queue": "default"},
+        },
+        "cleanup_unreferenced_blobs_hourly": {
+            "task": "core.tasks.beat.cleanup.cleanup_unreferenced_blobs_task",
+            "schedule": crontab(minute=15),
+            "options": {"queue": "default"},
+        },
+        "cleanup_pdf_cache_hourly": {
+            "task": "core.tasks.beat.cleanup.cleanup_pdf_cache_task",
+            "schedule": crontab(minute=25),
+            "options": {"queue": "default"},
+        },
         "weekly_fill_availability_monday_0003": {
             "task": "core.tasks.beat.fill.weekly_fill_availability_task",
             "schedule": crontab(minute=3, hour=0, day_of_week="mon"),
@@ -293,6 +312,17 @@ else:
         "CacheControl": "max-age=31536000, public",
     }
 
+    # Grote uploads/downloads (PDF's) in delen i.p.v. één bytes object in geheugen:
+    # multipart vanaf 8 MB, en S3 reads spoolen naar disk boven 8 MB.
+    from boto3.s3.transfer import TransferConfig
+
+    AWS_S3_TRANSFER_CONFIG = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=4,
+    )
+    AWS_S3_MAX_MEMORY_SIZE = 8 * 1024 * 1024
+
     MEDIA_ROOT = BASE_DIR / "media"
     MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
@@ -334,6 +364,18 @@ USE_HTTPS_IN_EMAIL_LINKS = not DEBUG
 VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY")
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY")
 VAPID_SUB = os.getenv("VAPID_SUB")
+# Dienstwijzigingen: per user/week gebundeld, push pas na X sec zonder nieuwe publicatie (max Y sec wachten)
+SHIFT_PUSH_DEBOUNCE_SECONDS = 5 * 60
+SHIFT_PUSH_MAX_DELAY_SECONDS = 30 * 60
+
+# === PDF exports (core/utils/pdf_export.py) ===
+# True: webrequests laten de layout doen door de workers op de "pdf" queue
+PDF_RENDER_SERVICE = os.getenv("PDF_RENDER_SERVICE", "False") == "True"
+PDF_RENDER_TIMEOUT = 25  # seconden wachten op de pdf worker, ruim onder de gunicorn timeout (60s)
+# Gerenderde PDF's (alleen in Redis), op hash van de HTML
+PDF_CACHE_ENABLED = True
+PDF_CACHE_TTL = 60 * 60 * 24          # seconden zonder gebruik
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
 # === Custom constants ===
 APOTHEEK_JANSEN_ORG_ID = 1